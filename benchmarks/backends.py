@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Compare segmentation backends on the same frames.
+
+Each backend is given as ``name`` or ``name:option=value,...`` with the
+options of ``create_backend`` (model_path, intra_op_threads,
+inter_op_threads, int8). For every backend two numbers are measured:
+
+- latency: submit() to result() for one frame at a time
+- throughput: frames per second when the next frame is prepared
+  (resized, colour-converted) while the previous one is being inferred,
+  as the engine does
+
+Masks are compared with the first backend's by IoU.
+
+Usage:
+    python -m benchmarks.backends talk.mp4 legacy onnx:intra_op_threads=2 dnn:intra_op_threads=4
+    python -m benchmarks.backends synthetic tasks onnx onnx:int8=True --output backends.json
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+from benchmarks.evaluate import mask_iou, parse_config, read_frames
+from src.core.segmentation import create_backend
+
+
+def parse_backend(spec: str) -> Tuple[str, Dict]:
+    name, _, options = spec.partition(':')
+    return name, parse_config(options)
+
+
+def percentiles(values: List[float]) -> Dict:
+    values = np.array(values)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+    }
+
+
+def bench_backend(name: str, options: Dict, frames: List[np.ndarray],
+                  size: Tuple[int, int]) -> Tuple[Dict, List[Optional[np.ndarray]]]:
+    backend = create_backend(name, **options)
+    timestamp = 0
+
+    def prepare(frame):
+        return cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB)
+
+    # Warm up: first runs include lazy allocation and graph initialization
+    for frame in frames[:3]:
+        timestamp += 1
+        backend.segment(prepare(frame), timestamp)
+
+    latencies, masks = [], []
+    for frame in frames:
+        frame_rgb = prepare(frame)
+        timestamp += 1
+        start = time.perf_counter()
+        backend.submit(frame_rgb, timestamp)
+        mask = backend.result(timestamp)
+        latencies.append((time.perf_counter() - start) * 1000)
+        masks.append(None if mask is None else cv2.resize(mask, size))
+
+    dropped = 0
+    start = time.perf_counter()
+    frame_rgb = prepare(frames[0])
+    for i in range(len(frames)):
+        timestamp += 1
+        backend.submit(frame_rgb, timestamp)
+        frame_rgb = prepare(frames[(i + 1) % len(frames)])
+        if backend.result(timestamp) is None:
+            dropped += 1
+    elapsed = time.perf_counter() - start
+    backend.close()
+
+    return {
+        'backend': name,
+        'options': options,
+        'latency_ms': percentiles(latencies),
+        'fps': len(frames) / elapsed,
+        'dropped': dropped,
+    }, masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Video file, image directory, .vmrec or 'synthetic'")
+    parser.add_argument('backends', nargs='+', help='Backends to compare; the first is the reference')
+    parser.add_argument('--frames', type=int, default=100, help='Frames to process (default 100)')
+    parser.add_argument('--resolution', default='1280x720', help='Frame size before inference (default 1280x720)')
+    parser.add_argument('--output', help='Write JSON results here')
+    args = parser.parse_args()
+
+    frames = read_frames(args.input, args.frames)
+    size = tuple(int(v) for v in args.resolution.split('x'))
+
+    results = []
+    reference_masks = None
+    for spec in args.backends:
+        name, options = parse_backend(spec)
+        try:
+            result, masks = bench_backend(name, options, frames, size)
+        except (ImportError, RuntimeError) as e:
+            print(f"{spec:<40} skipped: {e}", file=sys.stderr)
+            continue
+        if reference_masks is None:
+            reference_masks = masks
+        else:
+            ious = [mask_iou(ref, mask) for ref, mask in zip(reference_masks, masks)
+                    if ref is not None and mask is not None]
+            result['iou'] = float(np.mean(ious)) if ious else None
+        result['spec'] = spec
+        results.append(result)
+        iou = f"  IoU {result['iou']:.3f}" if result.get('iou') is not None else ''
+        print(f"{spec:<40} {result['fps']:7.1f} fps  latency p50 {result['latency_ms']['p50']:7.2f} ms"
+              f"  p95 {result['latency_ms']['p95']:7.2f} ms{iou}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'input': args.input, 'frames': len(frames), 'resolution': args.resolution,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
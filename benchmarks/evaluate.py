@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Compare a candidate Processor configuration against a reference one.
+
+Both configurations process the same frames. For every frame the
+candidate's segmentation mask and output are compared with the
+reference's, giving mask IoU, boundary F-score, output PSNR and SSIM,
+plus the speedup of the candidate over the reference.
+
+Configurations are comma-separated Processor settings, e.g.
+``scale=0.5,smooth_kernel=11`` or ``resolution=640x360``.
+
+Usage:
+    python -m benchmarks.evaluate talk.mp4 --candidate resolution=640x360
+    python -m benchmarks.evaluate synthetic --frames 60 --candidate smooth_kernel=5 --output eval.json
+"""
+import argparse
+import ast
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+import cv2
+import numpy as np
+
+from src.core.sources import open_source, parse_size
+
+
+def parse_config(text: str) -> Dict:
+    """'key=value,key=value' into a settings dict"""
+    config = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = item.partition('=')
+        if key == 'resolution':
+            config[key] = parse_size(value)
+            continue
+        try:
+            config[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            config[key] = value
+    return config
+
+
+def read_frames(spec: str, count: int) -> List[np.ndarray]:
+    """The first count frames of an input, held in memory so both runs see the same data"""
+    source = open_source(spec, paced=False)
+    source.loop = False
+    source.start()
+    frames = []
+    while len(frames) < count:
+        frame = source.read_frame()
+        if frame is None:
+            break
+        frames.append(np.array(frame))
+    source.stop()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {spec}")
+    return frames
+
+
+def configure(processor, config: Dict, resolution: Tuple[int, int], background: np.ndarray):
+    """Apply a settings dict to a Processor"""
+    processor.show_preview = False
+    processor.set_resolution(*config.get('resolution', resolution))
+    processor.set_scale(config.get('scale', processor.scale))
+    processor.set_smoothing(config.get('smooth_kernel', processor.smooth_kernel),
+                            config.get('smooth_sigma', processor.smooth_sigma))
+    for key, value in config.items():
+        if key in ('resolution', 'scale', 'smooth_kernel', 'smooth_sigma'):
+            continue
+        if not hasattr(processor, key):
+            raise ValueError(f"Unknown Processor setting: {key}")
+        setattr(processor, key, value)
+    width = int(processor.resolution[0] * processor.scale)
+    height = int(processor.resolution[1] * processor.scale)
+    processor.background_image = cv2.resize(background, (width, height))
+
+
+def run_config(config: Dict, frames: List[np.ndarray], background: np.ndarray):
+    """Process all frames, returning outputs, masks and ms per frame"""
+    from src.core.processor import Processor
+    processor = Processor()
+    height, width = frames[0].shape[:2]
+    configure(processor, config, (width, height), background)
+    processor.process_frame(frames[0])  # warm up
+
+    outputs, masks, timings = [], [], []
+    for frame in frames:
+        start = time.perf_counter()
+        output = processor.process_frame(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+        outputs.append(output)
+        masks.append(processor.last_mask)
+    processor.cleanup()
+    return outputs, masks, timings
+
+
+def mask_iou(reference: np.ndarray, candidate: np.ndarray) -> float:
+    ref = reference > 0.5
+    cand = candidate > 0.5
+    union = np.logical_or(ref, cand).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(ref, cand).sum() / union)
+
+
+def boundary(mask: np.ndarray) -> np.ndarray:
+    binary = (mask > 0.5).astype(np.uint8)
+    return cv2.morphologyEx(binary, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8)) > 0
+
+
+def boundary_f_score(reference: np.ndarray, candidate: np.ndarray, tolerance: float = 0.0075) -> float:
+    """F-measure of boundary pixels matched within tolerance * image diagonal"""
+    ref = boundary(reference)
+    cand = boundary(candidate)
+    if not ref.any() and not cand.any():
+        return 1.0
+    if not ref.any() or not cand.any():
+        return 0.0
+    radius = max(1, int(round(tolerance * np.hypot(*ref.shape))))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    ref_zone = cv2.dilate(ref.astype(np.uint8), kernel) > 0
+    cand_zone = cv2.dilate(cand.astype(np.uint8), kernel) > 0
+    precision = np.logical_and(cand, ref_zone).sum() / cand.sum()
+    recall = np.logical_and(ref, cand_zone).sum() / ref.sum()
+    if precision + recall == 0:
+        return 0.0
+    return float(2 * precision * recall / (precision + recall))
+
+
+def ssim(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Mean structural similarity of the grayscale images (Gaussian window, sigma 1.5)"""
+    x = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    y = cv2.cvtColor(candidate, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(image):
+        return cv2.GaussianBlur(image, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    var_x = blur(x * x) - mu_x ** 2
+    var_y = blur(y * y) - mu_y ** 2
+    cov = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+
+def compare_frame(ref_output, ref_mask, cand_output, cand_mask) -> Dict:
+    height, width = ref_output.shape[:2]
+    # Candidates may run at another resolution; compare at the reference's
+    if cand_output.shape[:2] != (height, width):
+        cand_output = cv2.resize(cand_output, (width, height))
+    result = {'psnr': min(cv2.PSNR(ref_output, cand_output), 100.0), 'ssim': ssim(ref_output, cand_output)}
+    if ref_mask is not None and cand_mask is not None:
+        if cand_mask.shape != ref_mask.shape:
+            cand_mask = cv2.resize(cand_mask, (ref_mask.shape[1], ref_mask.shape[0]))
+        result['iou'] = mask_iou(ref_mask, cand_mask)
+        result['boundary_f'] = boundary_f_score(ref_mask, cand_mask)
+    return result
+
+
+def evaluate(frames: List[np.ndarray], reference: Dict, candidate: Dict, background: np.ndarray) -> Dict:
+    ref_outputs, ref_masks, ref_ms = run_config(reference, frames, background)
+    cand_outputs, cand_masks, cand_ms = run_config(candidate, frames, background)
+    per_frame = [compare_frame(*values) for values in zip(ref_outputs, ref_masks, cand_outputs, cand_masks)]
+
+    quality = {}
+    for key in ('iou', 'boundary_f', 'psnr', 'ssim'):
+        values = np.array([frame[key] for frame in per_frame if key in frame])
+        if len(values):
+            quality[key] = {'mean': float(values.mean()), 'min': float(values.min())}
+    return {
+        'frames': len(frames),
+        'reference': {'config': reference, 'ms_mean': float(np.mean(ref_ms)), 'ms_p95': float(np.percentile(ref_ms, 95))},
+        'candidate': {'config': candidate, 'ms_mean': float(np.mean(cand_ms)), 'ms_p95': float(np.percentile(cand_ms, 95))},
+        'speedup': float(np.mean(ref_ms) / np.mean(cand_ms)),
+        'quality': quality,
+    }
+
+
+def print_table(report: Dict):
+    print(f"{'metric':<16} {'mean':>10} {'worst':>10}")
+    for key, label in (('iou', 'mask IoU'), ('boundary_f', 'boundary F'), ('psnr', 'PSNR (dB)'), ('ssim', 'SSIM')):
+        if key in report['quality']:
+            values = report['quality'][key]
+            print(f"{label:<16} {values['mean']:>10.4f} {values['min']:>10.4f}")
+    print(f"{'reference ms':<16} {report['reference']['ms_mean']:>10.2f} {report['reference']['ms_p95']:>10.2f}")
+    print(f"{'candidate ms':<16} {report['candidate']['ms_mean']:>10.2f} {report['candidate']['ms_p95']:>10.2f}")
+    print(f"{'speedup':<16} {report['speedup']:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Clip, image directory, .vmrec session or 'synthetic[:WxH]'")
+    parser.add_argument('--reference', default='', help='Reference settings (default: Processor defaults)')
+    parser.add_argument('--candidate', required=True, help='Candidate settings')
+    parser.add_argument('--frames', type=int, default=100, help='Number of frames to evaluate')
+    parser.add_argument('--background', help='Background image (default: generated gradient)')
+    parser.add_argument('--output', help='Write the report as JSON here')
+    args = parser.parse_args()
+
+    frames = read_frames(args.input, args.frames)
+    height, width = frames[0].shape[:2]
+    background = cv2.imread(args.background) if args.background else None
+    if background is None:
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        background = cv2.applyColorMap(np.tile(gradient, (height, 1)), cv2.COLORMAP_OCEAN)
+
+    try:
+        report = evaluate(frames, parse_config(args.reference), parse_config(args.candidate), background)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    print_table(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Compare full MJPEG decoding (what Camera.read_frame does) with reduced-scale decoding.
+
+Usage:
+    python -m benchmarks.mjpeg_decode [--resolution 1920x1080] [--frames 200]
+    python -m benchmarks.mjpeg_decode --device "/dev/video0"
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+from src.core.camera import Camera
+from src.core.mjpeg import MjpegFrame, decode_mjpeg, pick_reduction
+
+
+def synthetic_jpeg(width: int, height: int) -> np.ndarray:
+    """Encode a textured test frame the way a webcam would send it"""
+    rng = np.random.default_rng(0)
+    frame = cv2.resize(
+        rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8),
+        (width, height),
+        interpolation=cv2.INTER_CUBIC
+    )
+    ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        raise RuntimeError("Could not encode test frame")
+    return data
+
+
+def timed(label: str, frames: int, func) -> float:
+    """Run func frames times and print ms/frame"""
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(frames):
+        func()
+    ms = (time.perf_counter() - start) * 1000 / frames
+    print(f"{label:<40} {ms:8.2f} ms/frame")
+    return ms
+
+
+def bench_synthetic(width: int, height: int, frames: int):
+    data = synthetic_jpeg(width, height)
+    reduction = pick_reduction((width, height))
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    print(f"Synthetic {width}x{height} MJPEG, inference decode at 1/{reduction}")
+    full = timed("full decode + resize to 256 (current)", frames,
+                 lambda: cv2.resize(decode_mjpeg(data), (256, 144)))
+    reduced = timed(f"reduced decode 1/{reduction}", frames,
+                    lambda: decode_mjpeg(data, reduction))
+
+    # As in the engine, a frame's full decode is collected one frame later,
+    # so it overlaps the next frame's reduced decode
+    in_flight = []
+
+    def split():
+        mjpeg_frame = MjpegFrame(data)
+        mjpeg_frame.decode_full_async(executor)
+        mjpeg_frame.reduced(reduction)
+        in_flight.append(mjpeg_frame)
+        if len(in_flight) > 1:
+            return in_flight.pop(0).full()
+
+    timed("reduced + full decode on worker thread", frames, split)
+    for mjpeg_frame in in_flight:
+        mjpeg_frame.full()
+
+    # V4L2 raw mode delivers the bitstream as a 1xN Mat
+    raw_mode = MjpegFrame(data.reshape(1, -1))
+    expected = decode_mjpeg(data, reduction)
+    if not np.array_equal(raw_mode.reduced(reduction), expected):
+        raise RuntimeError("1xN MJPEG buffer was not decoded like a flat one")
+    print(f"Inference input ready {full / reduced:.1f}x sooner")
+    executor.shutdown()
+
+
+def bench_camera(device: str, resolution: str, frames: int):
+    for raw in (False, True):
+        camera = Camera()
+        camera.set_input_device(device)
+        camera.set_resolution(resolution)
+        camera.set_raw_mjpeg(raw)
+        camera.start()
+        reduction = pick_reduction(camera.get_current_resolution())
+        try:
+            if raw:
+                label = f"raw read + 1/{reduction} decode"
+                timed(label, frames, lambda: MjpegFrame(camera.read_frame()).reduced(reduction))
+            else:
+                timed("Camera.read_frame (decoded)", frames, camera.read_frame)
+        finally:
+            camera.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolution', default='1920x1080', help='WIDTHxHEIGHT')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--device', help='Also benchmark a real camera, e.g. /dev/video0')
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.split('x'))
+    bench_synthetic(width, height, args.frames)
+    if args.device:
+        # Camera.set_input_device expects the "Name (/dev/videoN)" form
+        bench_camera(f"Camera ({args.device})", args.resolution, args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Replay a recorded session (.vmrec) through the processing pipeline.
+
+Frames and settings changes are applied in recorded order, so two runs
+over the same session process identical input and can be compared.
+
+Usage:
+    python -m benchmarks.replay session.vmrec [--realtime] [--background bg.jpg] [--output stats.json]
+"""
+import argparse
+import json
+import sys
+import cv2
+import numpy as np
+
+from src.core.compositor import composite_person, smooth_mask
+from src.core.metrics import PipelineMetrics
+from src.core.mjpeg import MjpegFrame, is_encoded
+from src.core.recording import ReplaySource
+from src.core.segmentation import create_backend
+
+DEFAULT_SETTINGS = {
+    'scale': 1.0,
+    'x_offset': 0.5,
+    'y_offset': 0.5,
+    'flip_h': False,
+    'flip_v': False,
+    'smooth_kernel': 21,
+    'smooth_sigma': 10.0,
+    'background_path': '',
+}
+
+
+def load_background(path: str, size) -> np.ndarray:
+    image = cv2.imread(path) if path else None
+    if image is None:
+        # Recorded background may not exist on this machine
+        image = np.full((size[1], size[0], 3), 128, dtype=np.uint8)
+    return cv2.resize(image, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('session', help='Path to a .vmrec session')
+    parser.add_argument('--realtime', action='store_true', help='Replay on the recorded schedule')
+    parser.add_argument('--background', help='Override the recorded background image')
+    parser.add_argument('--output', help='Write timing summary JSON here')
+    parser.add_argument('--backend', default='auto', choices=['auto', 'tasks', 'legacy', 'onnx', 'dnn'],
+                        help='Segmentation backend (default: auto)')
+    args = parser.parse_args()
+
+    segmentation = create_backend(args.backend)
+
+    settings = dict(DEFAULT_SETTINGS)
+    source = ReplaySource(args.session, realtime=args.realtime, on_settings=settings.update)
+    source.start()
+    width, height = source.resolution
+    metrics = PipelineMetrics(window=max(1, len(source.session)), enabled=True)
+    background_path = None
+
+    while True:
+        metrics.begin_frame()
+        frame = source.read_frame()
+        if frame is None:
+            break
+        if is_encoded(frame):
+            frame = MjpegFrame(frame).full()
+            width, height = frame.shape[1], frame.shape[0]
+        metrics.mark('capture')
+
+        wanted = args.background or settings['background_path']
+        if wanted != background_path:
+            background = load_background(wanted, (width, height))
+            background_path = wanted
+
+        frame = cv2.resize(frame, (width, height))
+        metrics.mark('resize')
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        metrics.mark('color_convert')
+        mask = segmentation.segment(frame_rgb, source.frame_index)
+        metrics.mark('inference')
+        if mask is None:
+            continue
+        mask = smooth_mask(cv2.resize(mask, (width, height)), settings['smooth_kernel'], settings['smooth_sigma'])
+        metrics.mark('mask_smoothing')
+        composite_person(
+            frame, mask, background,
+            scale=settings['scale'], x_offset=settings['x_offset'], y_offset=settings['y_offset'],
+            flip_h=settings['flip_h'], flip_v=settings['flip_v']
+        )
+        metrics.mark('composite')
+        metrics.end_frame()
+
+    segmentation.close()
+    summary = metrics.summary()
+    print(f"Replayed {summary['frames']} frames at {summary['fps']:.1f} fps, "
+          f"p50 {summary['frame_ms'].get('p50', 0):.2f} ms", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Benchmark suite for Processor.process_frame and the compositing path.
+
+Runs headless on a CPU-only machine: input is either synthetic frames or a
+short clip, and no camera or virtual device is needed. Results are written
+as JSON and can be compared against a saved baseline.
+
+Usage:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --quick --output results.json
+    python -m benchmarks.suite --clip talk.mp4 --output results.json
+    python -m benchmarks.suite --compare baseline.json results.json
+"""
+import argparse
+import json
+import platform
+import queue
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+import cv2
+import numpy as np
+
+from src.core.compositor import composite_person, smooth_mask
+from src.core.sources import SyntheticSource, VideoFileSource
+from src.version import VERSION
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+# Baseline case; every other case changes one parameter from it
+BASELINE = {
+    'resolution': '720p',
+    'kernel': 21,
+    'scale': 1.0,
+    'x_offset': 0.5,
+    'y_offset': 0.5,
+    'preview': True,
+}
+
+VARIATIONS = {
+    'resolution': ['480p', '720p', '1080p', '4k'],
+    'kernel': [5, 21, 51],
+    'scale': [0.5, 1.0, 1.5],
+    'x_offset': [0.5, 0.2],
+    'y_offset': [0.5, 0.8],
+    'preview': [True, False],
+}
+
+
+def synthetic_frames(width: int, height: int, count: int = 30) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Frames with a moving person-like shape, and the shape's exact masks"""
+    source = SyntheticSource((width, height), paced=False)
+    frames = [source.frame_at(i) for i in range(count)]
+    masks = [source.person_mask(i) for i in range(count)]
+    return frames, masks
+
+
+def clip_frames(path: str, width: int, height: int, count: int = 60) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """First frames of a video clip, resized to the benchmark resolution"""
+    source = VideoFileSource(path, paced=False, loop=False)
+    source.start()
+    frames = []
+    while len(frames) < count:
+        frame = source.read_frame()
+        if frame is None:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    source.stop()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {path}")
+    # No ground truth for real footage; an elliptical stand-in mask is enough for timing
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(mask, (width // 2, height), (width // 4, height * 2 // 3), 0, 180, 360, 255, -1)
+    return frames, [mask.astype(np.float32) / 255.0] * len(frames)
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 1024.0 ** 2
+    except OSError:
+        # No /proc: the process-wide peak is the best available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class PeakRss:
+    """Highest resident set size while the block runs, sampled on a thread.
+
+    ru_maxrss is the peak over the whole process, so after the largest
+    case every later case would report that case's peak.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self.done = threading.Event()
+
+    def _sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def cases(quick: bool) -> Iterator[Dict]:
+    """One-parameter-at-a-time variations around BASELINE"""
+    seen = set()
+    for key, values in VARIATIONS.items():
+        if quick and key == 'resolution':
+            values = ['480p', '720p']
+        for value in values:
+            case = dict(BASELINE, **{key: value})
+            marker = tuple(sorted(case.items()))
+            if marker not in seen:
+                seen.add(marker)
+                yield case
+
+
+def case_name(component: str, case: Dict) -> str:
+    return (f"{component}/{case['resolution']}/k{case['kernel']}/s{case['scale']}"
+            f"/x{case['x_offset']}y{case['y_offset']}/{'preview' if case['preview'] else 'nopreview'}")
+
+
+def time_frames(frames: List[np.ndarray], iterations: int, step) -> List[float]:
+    """Call step(frame) for each iteration, returning ms per call"""
+    step(frames[0])  # warm up
+    timings = []
+    for i in range(iterations):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        step(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_composite(case: Dict, frames: List[np.ndarray], mask_list: List[np.ndarray],
+                    iterations: int) -> List[float]:
+    """The camera loop's mask smoothing, compositing and preview handoff"""
+    height, width = frames[0].shape[:2]
+    background = cv2.resize(frames[-1][::-1].copy(), (width, height))
+    masks = {id(frame): mask for frame, mask in zip(frames, mask_list)}
+    preview_queue = queue.Queue(maxsize=2)
+
+    def step(frame):
+        mask = smooth_mask(masks[id(frame)], case['kernel'], 10.0)
+        output = composite_person(
+            frame, mask, background,
+            scale=case['scale'], x_offset=case['x_offset'], y_offset=case['y_offset']
+        )
+        if case['preview']:
+            try:
+                preview_queue.put_nowait(output)
+            except queue.Full:
+                preview_queue.get_nowait()
+
+    return time_frames(frames, iterations, step)
+
+
+def bench_processor(case: Dict, frames: List[np.ndarray], iterations: int, processor) -> List[float]:
+    """Processor.process_frame including MediaPipe inference"""
+    height, width = frames[0].shape[:2]
+    processor.resolution = (width, height)
+    processor.scale = case['scale']
+    processor.set_smoothing(case['kernel'], 10.0)
+    processor.show_preview = case['preview']
+    background = frames[-1][::-1].copy()
+    processor.background_image = cv2.resize(
+        background, (int(width * case['scale']), int(height * case['scale']))
+    )
+
+    def step(frame):
+        processor.process_frame(frame)
+        processor.get_preview_frame()
+
+    return time_frames(frames, iterations, step)
+
+
+def summarize(name: str, component: str, case: Dict, timings: List[float], peak_rss: float) -> Dict:
+    values = np.array(timings)
+    return {
+        'name': name,
+        'component': component,
+        **case,
+        'frames': len(timings),
+        'fps': 1000.0 / values.mean(),
+        'ms': {
+            'mean': float(values.mean()),
+            'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)),
+        },
+        'peak_rss_mb': peak_rss,
+    }
+
+
+def load_processor():
+    """Processor needs MediaPipe or a model file; the compositing benchmarks don't"""
+    try:
+        from src.core.processor import Processor
+        return Processor()
+    except (ImportError, RuntimeError) as e:
+        print(f"Skipping Processor benchmarks: {e}", file=sys.stderr)
+        return None
+
+
+def run(args) -> Dict:
+    processor = None if args.composite_only else load_processor()
+    results = []
+    frame_cache = {}
+    for case in cases(args.quick):
+        size = RESOLUTIONS[case['resolution']]
+        if size not in frame_cache:
+            frame_cache.clear()
+            frame_cache[size] = (clip_frames(args.clip, *size) if args.clip
+                                 else synthetic_frames(*size))
+        frames, masks = frame_cache[size]
+
+        runs = [('composite', lambda: bench_composite(case, frames, masks, args.iterations))]
+        if processor is not None:
+            runs.append(('processor', lambda: bench_processor(case, frames, args.iterations, processor)))
+        for component, bench in runs:
+            name = case_name(component, case)
+            with PeakRss() as rss:
+                timings = bench()
+            result = summarize(name, component, case, timings, rss.peak)
+            results.append(result)
+            print(f"{name:<55} {result['fps']:8.1f} fps  p50 {result['ms']['p50']:7.2f} ms"
+                  f"  p95 {result['ms']['p95']:7.2f} ms", file=sys.stderr)
+
+    if processor is not None:
+        processor.cleanup()
+    return {
+        'meta': {
+            'version': VERSION,
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'input': args.clip or 'synthetic',
+            'iterations': args.iterations,
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Cases whose p50 frame time got slower than baseline by more than threshold"""
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        change = result['ms']['p50'] / before['ms']['p50'] - 1
+        status = 'REGRESSION' if change > threshold else 'ok'
+        print(f"{result['name']:<55} {before['ms']['p50']:7.2f} -> {result['ms']['p50']:7.2f} ms"
+              f"  {change:+6.1%}  {status}")
+        if change > threshold:
+            regressions.append(result['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Write JSON results here (default: stdout)')
+    parser.add_argument('--clip', help='Use frames from this video instead of synthetic ones')
+    parser.add_argument('--iterations', type=int, default=100, help='Frames per case')
+    parser.add_argument('--quick', action='store_true', help='Skip 1080p and 4K')
+    parser.add_argument('--composite-only', action='store_true', help='Skip Processor (MediaPipe) cases')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative p50 slowdown flagged as regression (default 0.10)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Command-line interface for running the pipeline without the GUI.
+
+Nothing here imports tkinter, PIL.ImageTk or src.gui, so it works on
+machines without a display and starts faster than the GUI.
+
+Usage:
+    vidmask run --input /dev/video0 --output /dev/video2 --background bg.jpg
+    vidmask run --input talk.mp4 --output out.mp4 --background bg.jpg
+    vidmask run --settings exported.json
+    vidmask run --stream /dev/video0,/dev/video4 --stream /dev/video1,/dev/video5,15 --background bg.jpg
+    vidmask process --input talk.mp4 --output out.mp4 --background bg.jpg --jobs 8
+    vidmask daemon --settings exported.json --grace 30
+    vidmask serve --socket /tmp/vidmask.sock    # pipeline process for the GUI
+    vidmask ctl status --socket /tmp/vidmask.sock
+    vidmask calibrate --fps 30                  # time the segmentation models
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Optional
+from .core.calibration import calibration_results, select_model
+from .core.daemon import PipelineDaemon
+from .core.engine import DEFAULT_SETTINGS, PipelineEngine, device_path
+from .core.ipc import ControlClient, default_socket_path
+from .core.metrics_server import MetricsServer, metrics_server_from_env
+from .core.multistream import MultiStreamSession
+from .core.offline import CHUNK_FRAMES, Progress, process_file
+from .core.segmentation import MODELS
+from .core.service import PipelineService
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='vidmask', description='Virtual camera background replacement')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Pipeline settings shared by all commands
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--settings', help='Settings file exported from the GUI')
+    common.add_argument('--input', help='Camera (/dev/videoN), video file, image directory, .vmrec or synthetic')
+    common.add_argument('--output', help='v4l2loopback device (/dev/videoN) or output video file')
+    common.add_argument('--extra-output', dest='extra_outputs', action='append', metavar='PATH[:WxH][:PIX_FMT]',
+                        help='Also send the processed stream here, optionally at another size or pixel format '
+                             '(repeatable)')
+    common.add_argument('--pix-fmt', help="Pixel format of --output (default yuv420p)")
+    common.add_argument('--background', help='Background image')
+    common.add_argument('--resolution', help='Capture resolution, e.g. 1280x720')
+    common.add_argument('--fps', type=float)
+    common.add_argument('--scale', type=float)
+    common.add_argument('--x-offset', type=float)
+    common.add_argument('--y-offset', type=float)
+    common.add_argument('--flip-h', action='store_true', default=None)
+    common.add_argument('--flip-v', action='store_true', default=None)
+    common.add_argument('--smooth-kernel', type=int)
+    common.add_argument('--smooth-sigma', type=float)
+    common.add_argument('--buffer-size', type=int)
+    common.add_argument('--fast-decode', action='store_true', default=None)
+    common.add_argument('--backend', choices=['auto', 'tasks', 'legacy', 'onnx', 'dnn'],
+                        help='Segmentation backend (default: the most accurate model that keeps up, '
+                             'see calibrate)')
+    common.add_argument('--model', help='Segmentation model file or name in the model directories')
+    common.add_argument('--threads', type=int, help='Inference threads per operator (onnx/dnn; 0 = auto)')
+    common.add_argument('--inter-threads', type=int, help='Inference threads across operators (onnx; 0 = auto)')
+    common.add_argument('--int8', action='store_true', default=None, help='Use an int8-quantized model (onnx/dnn)')
+    common.add_argument('--fixed-quality', dest='adaptive_quality', action='store_false', default=None,
+                        help="Don't lower quality automatically when frames take too long")
+    common.add_argument('-v', '--verbose', action='store_true')
+
+    run = commands.add_parser('run', parents=[common], help='Run background replacement without the GUI')
+    run.add_argument('--offline', action='store_true',
+                     help='Process every input frame as fast as possible (default for file outputs)')
+    run.add_argument('--record-output', metavar='FILE',
+                     help='Also record the processed output to a video file; frames the encoder '
+                          "can't keep up with are left out of the recording only")
+    run.add_argument('--stream', dest='streams', action='append', metavar='INPUT,OUTPUT[,FPS]',
+                     help='Run several input/output pairs sharing one segmentation model (repeatable; '
+                          'replaces --input/--output)')
+
+    process = commands.add_parser('process', parents=[common],
+                                  help='Process a video file on all cores, as fast as possible')
+    process.add_argument('--jobs', type=int, default=0, help='Worker processes (default: one per core)')
+    process.add_argument('--chunk-frames', type=int, default=CHUNK_FRAMES,
+                         help=f'Frames per work unit (default {CHUNK_FRAMES})')
+
+    daemon = commands.add_parser('daemon', parents=[common],
+                                 help='Run only while an application reads the virtual camera')
+    daemon.add_argument('--grace', type=float, default=10.0,
+                        help='Seconds to keep running after the last consumer leaves (default 10)')
+    daemon.add_argument('--startup-timeout', type=float, default=5.0,
+                        help='Seconds allowed from activation to the first frame (default 5)')
+
+    serve = commands.add_parser('serve', parents=[common],
+                                help='Run the pipeline process controlled over a Unix socket')
+    serve.add_argument('--socket', help='Control socket path (default: $XDG_RUNTIME_DIR/vidmask.sock)')
+
+    calibrate = commands.add_parser('calibrate', help='Time the segmentation models on this machine')
+    calibrate.add_argument('--fps', type=float, default=DEFAULT_SETTINGS['fps'],
+                           help='Show which model would be chosen at this fps')
+    calibrate.add_argument('--force', action='store_true', help='Re-run even if results are cached')
+    calibrate.add_argument('-v', '--verbose', action='store_true')
+
+    ctl = commands.add_parser('ctl', help='Send a command to a running pipeline process')
+    ctl.add_argument('action', choices=['status', 'start', 'stop', 'metrics', 'shutdown'])
+    ctl.add_argument('--socket', help='Control socket path (default: $XDG_RUNTIME_DIR/vidmask.sock)')
+    return parser
+
+
+def load_settings(args) -> dict:
+    """Defaults, then the settings file, then command-line options"""
+    settings = dict(DEFAULT_SETTINGS)
+    if args.settings:
+        with open(args.settings) as f:
+            settings.update({k: v for k, v in json.load(f).items() if k in DEFAULT_SETTINGS})
+    options = {
+        'input_device': args.input,
+        'output_device': args.output,
+        'background_path': args.background,
+        'resolution': args.resolution,
+        'fps': args.fps,
+        'scale': args.scale,
+        'x_offset': args.x_offset,
+        'y_offset': args.y_offset,
+        'flip_h': args.flip_h,
+        'flip_v': args.flip_v,
+        'smooth_kernel': args.smooth_kernel,
+        'smooth_sigma': args.smooth_sigma,
+        'buffer_size': args.buffer_size,
+        'fast_decode': args.fast_decode,
+        'segmentation_backend': args.backend,
+        'segmentation_model': args.model,
+        'intra_op_threads': args.threads,
+        'inter_op_threads': args.inter_threads,
+        'quantize_int8': args.int8,
+        'adaptive_quality': args.adaptive_quality,
+        'output_pix_fmt': args.pix_fmt,
+        'extra_outputs': args.extra_outputs,
+    }
+    settings.update({k: v for k, v in options.items() if v is not None})
+    return settings
+
+
+def check_settings(settings: dict) -> bool:
+    for key, option in (('input_device', '--input'), ('output_device', '--output'),
+                        ('background_path', '--background')):
+        if not settings[key]:
+            print(f"No {option} given (on the command line or in --settings)", file=sys.stderr)
+            return False
+    return True
+
+
+def start_metrics_server() -> Optional[MetricsServer]:
+    """The metrics endpoint if VIDMASK_METRICS_ADDR is set; pipelines are added as they are created"""
+    server = metrics_server_from_env()
+    if server is None:
+        return None
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Error starting metrics endpoint: {e}", file=sys.stderr)
+        return None
+    return server
+
+
+def parse_stream(spec: str) -> dict:
+    """'INPUT,OUTPUT[,FPS]' into settings overrides"""
+    parts = spec.split(',')
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Expected INPUT,OUTPUT[,FPS]: {spec}")
+    stream = {'input_device': parts[0], 'output_device': parts[1]}
+    if len(parts) == 3:
+        stream['fps'] = float(parts[2])
+    return stream
+
+
+def run_streams(args, settings: dict) -> int:
+    try:
+        streams = [parse_stream(spec) for spec in args.streams]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not settings['background_path']:
+        print("No --background given (on the command line or in --settings)", file=sys.stderr)
+        return 2
+
+    offline = args.offline or not all(device_path(s['output_device']).startswith('/dev/') for s in streams)
+    session = MultiStreamSession(settings, streams, realtime=not offline)
+    metrics_server = start_metrics_server()
+    errors = []
+    for i, (stream, engine) in enumerate(zip(streams, session.engines)):
+        engine.on_error = errors.append
+        if metrics_server is not None:
+            metrics_server.add_source(f"{i}:{stream['input_device']}", engine.metrics)
+    signal.signal(signal.SIGTERM, lambda *_: session.stop())
+    session.start()
+    try:
+        while session.running:
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    session.stop(wait=True)
+    session.close()
+    if metrics_server is not None:
+        metrics_server.stop()
+
+    for stream, engine in zip(streams, session.engines):
+        summary = engine.metrics.summary()
+        print(f"{stream['input_device']}: {summary['frames']} frames, "
+              f"{summary['frame_ms'].get('p50', 0):.1f} ms/frame (p50)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def run(args) -> int:
+    settings = load_settings(args)
+    if args.streams:
+        return run_streams(args, settings)
+    if not check_settings(settings):
+        return 2
+
+    offline = args.offline or not device_path(settings['output_device']).startswith('/dev/')
+    engine = PipelineEngine(settings, realtime=not offline)
+    if args.record_output:
+        engine.start_output_recording(args.record_output)
+    errors = []
+    engine.on_error = errors.append
+    metrics_server = start_metrics_server()
+    if metrics_server is not None:
+        metrics_server.add_source('main', engine.metrics)
+    signal.signal(signal.SIGTERM, lambda *_: engine.stop())
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+    engine.close()
+    if metrics_server is not None:
+        metrics_server.stop()
+
+    summary = engine.metrics.summary()
+    if summary['frames']:
+        print(f"Processed {summary['frames']} frames, "
+              f"{summary['frame_ms'].get('p50', 0):.1f} ms/frame (p50)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def print_progress(progress: Progress):
+    percent = f"{progress.frames / progress.total:4.0%}" if progress.total else ''
+    print(f"\r{percent} {progress.frames}/{progress.total} frames  {progress.fps:6.1f} fps",
+          end='', file=sys.stderr, flush=True)
+
+
+def process(args) -> int:
+    settings = load_settings(args)
+    if not check_settings(settings):
+        return 2
+    if not os.path.isfile(settings['input_device']):
+        print(f"process needs a video file --input: {settings['input_device']}", file=sys.stderr)
+        return 2
+    try:
+        progress = process_file(settings['input_device'], settings['output_device'], settings,
+                                jobs=args.jobs, chunk_frames=args.chunk_frames, on_progress=print_progress)
+    except KeyboardInterrupt:
+        print(file=sys.stderr)
+        return 1
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"\n{e}", file=sys.stderr)
+        return 1
+    print(f"\nProcessed {progress.frames} frames in {progress.seconds:.1f}s ({progress.fps:.1f} fps)",
+          file=sys.stderr)
+    return 0
+
+
+def daemon(args) -> int:
+    settings = load_settings(args)
+    if not check_settings(settings):
+        return 2
+    if not device_path(settings['output_device']).startswith('/dev/'):
+        print("daemon needs a v4l2loopback --output device", file=sys.stderr)
+        return 2
+
+    metrics_server = start_metrics_server()
+
+    def create_engine(engine_settings: dict) -> PipelineEngine:
+        engine = PipelineEngine(engine_settings)
+        if metrics_server is not None:
+            metrics_server.add_source('main', engine.metrics)
+        return engine
+
+    pipeline_daemon = PipelineDaemon(settings, grace_period=args.grace,
+                                     startup_timeout=args.startup_timeout, engine_factory=create_engine)
+    signal.signal(signal.SIGTERM, lambda *_: pipeline_daemon.stop())
+    try:
+        pipeline_daemon.run()
+    except KeyboardInterrupt:
+        pipeline_daemon.stop()
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+    return 0
+
+
+def serve(args) -> int:
+    try:
+        service = PipelineService(load_settings(args), args.socket)
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    signal.signal(signal.SIGTERM, lambda *_: service.cmd_shutdown({}))
+    try:
+        service.serve()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def calibrate(args) -> int:
+    try:
+        results = calibration_results(force=args.force)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    selected = select_model(results, args.fps)
+    for spec in MODELS:
+        if spec.name in results:
+            marker = '*' if spec == selected else ' '
+            print(f"{marker} {spec.name:<22} {spec.backend:<7} {results[spec.name]:7.1f} ms")
+        else:
+            print(f"  {spec.name:<22} {spec.backend:<7} unavailable")
+    return 0
+
+
+def ctl(args) -> int:
+    try:
+        client = ControlClient(args.socket or default_socket_path())
+        reply = client.request(args.action)
+    except (OSError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(reply, indent=2))
+    client.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if getattr(args, 'verbose', False) else logging.WARNING,
+        format='%(levelname)s %(name)s: %(message)s'
+    )
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'process':
+        return process(args)
+    if args.command == 'daemon':
+        return daemon(args)
+    if args.command == 'serve':
+        return serve(args)
+    if args.command == 'calibrate':
+        return calibrate(args)
+    if args.command == 'ctl':
+        return ctl(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import platform
+import threading
+import time
+import cv2
+import numpy as np
+from .segmentation import MODELS, ModelSpec, find_model
+from .sources import SyntheticSource
+from src.version import VERSION
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.path.expanduser('~/.cache/vidmask/calibration.json')
+
+# Share of the frame time inference may use; decode, blur and compositing need the rest
+INFERENCE_BUDGET = 0.6
+
+CALIBRATION_SIZE = (1280, 720)
+CALIBRATION_FRAMES = 20
+WARMUP_FRAMES = 3
+
+# One calibration at a time; callers arriving meanwhile wait and read its results
+_calibration_lock = threading.Lock()
+
+
+def machine_key() -> Dict:
+    """What calibration results depend on; any change invalidates them"""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    except OSError:
+        pass
+    versions = {'vidmask': VERSION, 'opencv': cv2.__version__}
+    for module in ('mediapipe', 'onnxruntime'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    # Installing or replacing a model file changes what can run and how fast
+    model_files = {}
+    for spec in MODELS:
+        if spec.model is not None and spec.model not in model_files:
+            path = find_model(spec.model)
+            model_files[spec.model] = [path, os.path.getmtime(path)] if path else None
+    return {
+        'machine': platform.machine(),
+        'cpu': cpu,
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'models': {spec.name: spec._asdict() for spec in MODELS},
+        'model_files': model_files,
+    }
+
+
+def benchmark_model(spec: ModelSpec, frames: List[np.ndarray]) -> Optional[float]:
+    """Median ms per inference, or None if the model can't run here"""
+    try:
+        backend = spec.create()
+    except (ImportError, RuntimeError, ValueError, OSError) as e:
+        logger.info(f"Calibration: {spec.name} unavailable ({e})")
+        return None
+    try:
+        timings = []
+        for i in range(WARMUP_FRAMES + CALIBRATION_FRAMES):
+            frame = frames[i % len(frames)]
+            start = time.perf_counter()
+            backend.segment(frame, i + 1)
+            if i >= WARMUP_FRAMES:
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        backend.close()
+    return float(np.median(timings))
+
+
+def calibrate() -> Dict[str, float]:
+    """Time every available model on synthetic frames; ms per inference by model name"""
+    source = SyntheticSource(CALIBRATION_SIZE, paced=False)
+    frames = [cv2.cvtColor(source.frame_at(i * 5), cv2.COLOR_BGR2RGB) for i in range(5)]
+    results = {}
+    for spec in MODELS:
+        ms = benchmark_model(spec, frames)
+        if ms is not None:
+            results[spec.name] = ms
+            logger.info(f"Calibration: {spec.name} {ms:.1f} ms")
+    return results
+
+
+def load_calibration(path: str = CACHE_PATH) -> Optional[Dict[str, float]]:
+    """Cached results, or None if missing or made on another machine/version"""
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('key') != json.loads(json.dumps(machine_key())):
+        return None
+    return cached['results']
+
+
+def save_calibration(results: Dict[str, float], path: str = CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'key': machine_key(), 'timestamp': time.time(), 'results': results}, f, indent=2)
+
+
+def calibration_results(force: bool = False, path: str = CACHE_PATH) -> Dict[str, float]:
+    """Cached calibration, running it first if needed"""
+    with _calibration_lock:
+        results = None if force else load_calibration(path)
+        if results is None:
+            logger.info("Calibrating segmentation models for this machine")
+            results = calibrate()
+            if not results:
+                raise RuntimeError("No segmentation backend is available (install MediaPipe or a model)")
+            save_calibration(results, path)
+        return results
+
+
+def select_model(results: Dict[str, float], fps: float) -> ModelSpec:
+    """Most accurate model whose inference fits the frame budget, else the fastest"""
+    budget = 1000.0 / fps * INFERENCE_BUDGET
+    timed = [(spec, results[spec.name]) for spec in MODELS if spec.name in results]
+    fitting = [(spec, ms) for spec, ms in timed if ms <= budget]
+    if fitting:
+        spec, ms = max(fitting, key=lambda item: (item[0].accuracy, -item[1]))
+    else:
+        spec, ms = min(timed, key=lambda item: item[1])
+        logger.warning(f"No model fits {budget:.1f} ms at {fps:g} fps; using the fastest")
+    logger.info(f"Selected {spec.name} ({ms:.1f} ms, budget {budget:.1f} ms at {fps:g} fps)")
+    return spec
+
+
+def lighter_model(spec: ModelSpec, results: Optional[Dict[str, float]] = None) -> Optional[ModelSpec]:
+    """Most accurate calibrated model faster than spec, or None"""
+    results = results if results is not None else load_calibration()
+    if not results or spec.name not in results:
+        return None
+    faster = [other for other in MODELS
+              if other.name in results and results[other.name] < results[spec.name]]
+    if not faster:
+        return None
+    return max(faster, key=lambda other: (other.accuracy, -results[other.name]))
+
+
+def auto_model(fps: float) -> ModelSpec:
+    """Model for the 'auto' backend at the given fps"""
+    return select_model(calibration_results(), fps)
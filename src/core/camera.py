@@ -5,6 +5,10 @@ import cv2
 import numpy as np
 import os
 import logging
+import threading
+import time
+import zlib
+from .mjpeg import is_encoded
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +21,8 @@ class Camera:
         self.running = False
         self.resolution = (1280, 720)
         self.fps = 20.0
+        self.buffer_size = 1
+        self.raw_mjpeg = False
 
     def get_available_cameras(self) -> List[str]:
         """Get list of available camera devices"""
@@ -112,6 +118,22 @@ class Camera:
         except ValueError as e:
             raise ValueError(f"Invalid FPS value: {fps}") from e
 
+    def set_buffer_size(self, count: int):
+        """Set number of V4L2 capture buffers"""
+        try:
+            count = int(count)
+            if count < 1:
+                raise ValueError("Buffer count must be at least 1")
+            if count > 32:  # V4L2 drivers rarely allocate more
+                raise ValueError("Buffer count too high")
+            self.buffer_size = count
+        except ValueError as e:
+            raise ValueError(f"Invalid buffer count: {count}") from e
+
+    def set_raw_mjpeg(self, enabled: bool):
+        """Deliver undecoded MJPEG buffers instead of BGR frames"""
+        self.raw_mjpeg = bool(enabled)
+
     def start(self):
         """Start camera capture"""
         if not self.running:
@@ -134,19 +156,7 @@ class Camera:
                     logger.error(f"Failed to open camera: {self.input_device}")
                     raise RuntimeError(f"Failed to open camera: {self.input_device}")
 
-                # Set camera properties
-                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
-                self.cap.set(cv2.CAP_PROP_FPS, self.fps)
-
-                # Verify settings
-                actual_width = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-                actual_height = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-                actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
-
-                logger.info(f"Camera initialized with resolution: {actual_width}x{actual_height} @ {actual_fps}fps")
-                
+                self._apply_format()
                 self.running = True
                 
             except Exception as e:
@@ -156,6 +166,43 @@ class Camera:
                     self.cap = None
                 raise RuntimeError(f"Failed to initialize camera: {str(e)}")
 
+    def _apply_format(self):
+        """Set format, size, rate and buffering on the open capture"""
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver queue short so frames don't go stale
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        if self.raw_mjpeg:
+            # Skip the decode in read(); callers decode at the size they need
+            if not self.cap.set(cv2.CAP_PROP_FORMAT, -1):
+                logger.warning("Camera backend does not support raw MJPEG, frames will be decoded")
+        else:
+            # Undo raw mode when reconfiguring an open capture
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+
+        # Verify settings
+        actual_width = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        actual_height = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
+
+        logger.info(f"Camera initialized with resolution: {actual_width}x{actual_height} @ {actual_fps}fps")
+
+    def reconfigure(self, resolution: str, fps: float, buffer_size: int, raw_mjpeg: bool):
+        """Renegotiate the capture format without closing the device.
+
+        The driver restarts streaming with the new format, which takes a
+        few frame periods instead of the seconds a full reopen costs.
+        Nothing may be reading from the camera meanwhile.
+        """
+        self.set_resolution(resolution)
+        self.set_fps(fps)
+        self.set_buffer_size(buffer_size)
+        self.set_raw_mjpeg(raw_mjpeg)
+        if self.running and self.cap is not None:
+            self._apply_format()
+
     def stop(self):
         """Stop camera capture"""
         self.running = False
@@ -178,3 +225,175 @@ class Camera:
             height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             return (width, height)
         return self.resolution
+
+
+def frame_fingerprint(frame: np.ndarray) -> int:
+    """Cheap fingerprint used to spot frames the camera sent twice"""
+    if is_encoded(frame):
+        # Raw MJPEG buffer: identical frames have identical bitstreams
+        return zlib.crc32(frame.ravel())
+    # Nearest-neighbour thumbnail touches only a few thousand pixels
+    thumbnail = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_NEAREST)
+    return zlib.crc32(thumbnail)
+
+
+class LatestFrameReader:
+    """Drain a started Camera in a background thread, keeping only the newest frame.
+
+    Any source with the Camera interface (see ``sources.py``) works too.
+
+    The driver is read continuously, so ``read()`` always returns the most
+    recent frame instead of the oldest one queued while we were busy.
+    Frames that were replaced before anyone read them are counted in
+    ``skipped_frames``.
+
+    With ``detect_duplicates`` enabled, frames the camera repeated (same
+    buffer timestamp, or without timestamps the same low-resolution
+    fingerprint) are flagged so
+    the consumer can reuse its previous output instead of reprocessing.
+    They are counted in ``duplicate_frames``.
+    """
+
+    def __init__(self, camera: Camera, detect_duplicates: bool = True):
+        self.camera = camera
+        self.detect_duplicates = detect_duplicates
+        self.running = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+        # Single frame slot
+        self.frame = None
+        self.frame_time = 0.0
+        self.sequence = 0
+        self.last_read_sequence = 0
+        self.frame_is_duplicate = False
+        self.last_read_duplicate = False
+        self.last_read_time = 0.0
+
+        # Optional TraceRecorder for grab/retrieve spans
+        self.tracer = None
+
+        # Duplicate detection state
+        self.last_timestamp = None
+        self.last_fingerprint = None
+
+        # Statistics
+        self.frames_captured = 0
+        self.skipped_frames = 0
+        self.duplicate_frames = 0
+
+    def start(self):
+        """Start camera (if needed) and the reader thread"""
+        if self.running:
+            return
+        if not self.camera.running:
+            self.camera.start()
+        self.running = True
+        self.thread = threading.Thread(target=self._reader_loop, name='vidmask-capture', daemon=True)
+        self.thread.start()
+
+    def stop(self, release: bool = True):
+        """Stop the reader thread and release the camera (or leave it open)"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        stuck = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+            stuck = self.thread.is_alive()
+        self.thread = None
+        if release and stuck:
+            # Releasing the capture under a grab() in progress can crash the backend
+            logger.warning("Capture thread did not stop within 2s; leaving the camera open")
+        elif release:
+            self.camera.stop()
+        logger.info(
+            f"Capture stats: {self.frames_captured} captured, "
+            f"{self.skipped_frames} skipped, {self.duplicate_frames} duplicates"
+        )
+
+    def _capture(self) -> Tuple[bool, Optional[np.ndarray], float]:
+        """Get the next frame as (ok, frame, driver timestamp in ms or 0)"""
+        cap = getattr(self.camera, 'cap', None)
+        if not isinstance(self.camera, Camera):
+            # File and synthetic sources only offer read_frame()
+            start = time.perf_counter()
+            frame = self.camera.read_frame()
+            if self.tracer is not None:
+                self.tracer.record('read', start, time.perf_counter())
+            # Every read is a new frame; the index stands in for a driver timestamp
+            return frame is not None, frame, float(getattr(self.camera, 'frame_index', 0))
+        if cap is None:
+            return False, None, 0.0
+
+        # grab() dequeues the buffer, retrieve() decodes it
+        grab_start = time.perf_counter()
+        if not cap.grab():
+            return False, None, 0.0
+        grab_end = time.perf_counter()
+        ret, frame = cap.retrieve()
+        if self.tracer is not None:
+            self.tracer.record('grab', grab_start, grab_end)
+            self.tracer.record('retrieve', grab_end, time.perf_counter())
+        return True, frame if ret else None, cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def _reader_loop(self):
+        while self.running:
+            ok, frame, timestamp = self._capture()
+            if not ok:
+                logger.error("Input stopped delivering frames")
+                break
+            if frame is None:
+                continue
+            duplicate = self.detect_duplicates and self._is_duplicate(timestamp, frame)
+            with self.condition:
+                self.frames_captured += 1
+                if duplicate:
+                    self.duplicate_frames += 1
+                    if self.sequence > self.last_read_sequence:
+                        # The unread frame has the same content, keep it
+                        continue
+                elif self.sequence > self.last_read_sequence:
+                    self.skipped_frames += 1
+                self.frame = frame
+                self.frame_is_duplicate = duplicate
+                self.frame_time = time.monotonic()
+                self.sequence += 1
+                self.condition.notify_all()
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def read(self, timeout: Optional[float] = 1.0) -> Optional[np.ndarray]:
+        """Return the newest frame not returned before, waiting up to timeout"""
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.sequence > self.last_read_sequence or not self.running,
+                timeout=timeout
+            ):
+                return None
+            if self.sequence <= self.last_read_sequence:
+                return None
+            self.last_read_sequence = self.sequence
+            self.last_read_duplicate = self.frame_is_duplicate
+            self.last_read_time = self.frame_time
+            return self.frame
+
+    def _is_duplicate(self, timestamp: float, frame: np.ndarray) -> bool:
+        # V4L2 reports the buffer timestamp; a repeat means the same buffer,
+        # a new one a new frame even if it looks the same
+        if timestamp > 0:
+            duplicate = timestamp == self.last_timestamp
+            self.last_timestamp = timestamp
+            return duplicate
+
+        # No timestamp: fall back to comparing content
+        fingerprint = frame_fingerprint(frame)
+        duplicate = fingerprint == self.last_fingerprint
+        self.last_fingerprint = fingerprint
+        return duplicate
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        """Camera-compatible read of the freshest frame"""
+        return self.read()
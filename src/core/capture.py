@@ -0,0 +1,227 @@
+from typing import Callable, Dict, Optional, Tuple
+import logging
+import threading
+import time
+import numpy as np
+from .camera import Camera, LatestFrameReader
+from .recording import ReplaySource
+from .sources import VideoFileSource, is_video_file, open_source
+
+logger = logging.getLogger(__name__)
+
+# Settings that determine the input; a change to any of them reconfigures it
+INPUT_SETTINGS = ('input_device', 'resolution', 'fps', 'buffer_size', 'fast_decode')
+
+
+class CaptureSession:
+    """The engine's input: the open source, its reader, and cached camera handles.
+
+    ``update()`` applies changed input settings while the pipeline runs.
+    A new size, rate or buffer count on the same camera is renegotiated on
+    the open device. A different input is opened on a background thread;
+    until it delivers, ``switching`` is set and ``read()`` returns no
+    frame, so the caller can keep its output alive. Cameras switched away
+    from stay open for ``cache_seconds``, making a switch back immediate.
+
+    A ``.vmrec`` replay is read directly, never through a LatestFrameReader,
+    so every recorded frame reaches the pipeline, and its recorded settings
+    changes are passed to ``on_settings`` just before the frame they apply to.
+    """
+
+    def __init__(self, realtime: bool = True, cache_seconds: float = 30.0):
+        self.realtime = realtime
+        self.cache_seconds = cache_seconds
+        self.source = None
+        self.frame_reader: Optional[LatestFrameReader] = None
+        self.config: Optional[Dict] = None
+        # Settings the open source was opened with; config differs after a failed switch
+        self.source_config: Optional[Dict] = None
+        self.cache: Dict[str, Tuple[Camera, float]] = {}
+        self.switching = False
+        self.switch_thread = None
+        self.lock = threading.Lock()
+        # Incremented whenever the source or its format changes
+        self.generation = 0
+        self.tracer = None
+        self.on_error: Optional[Callable[[str], None]] = None
+        self.on_settings: Optional[Callable[[Dict], None]] = None
+
+    @staticmethod
+    def input_config(settings) -> Dict:
+        return {key: settings[key] for key in INPUT_SETTINGS}
+
+    @property
+    def fps(self) -> Optional[float]:
+        """The input's own frame rate for video files and recordings, else None"""
+        source = self.source
+        if isinstance(source, ReplaySource) or (isinstance(source, VideoFileSource) and source.use_file_fps):
+            return source.fps
+        return None
+
+    @property
+    def raw_mjpeg(self) -> bool:
+        return isinstance(self.source, (Camera, ReplaySource)) and self.source.raw_mjpeg
+
+    def open(self, settings):
+        """Open the configured input and start reading from it"""
+        config = self.input_config(settings)
+        source = self._open_source(config)
+        with self.lock:
+            self.config = config
+            self._start(source, config)
+
+    def _open_source(self, config: Dict):
+        """Source for config, reusing a cached camera handle if there is one"""
+        cached = self.cache.pop(config['input_device'], None)
+        if cached is not None:
+            camera = cached[0]
+            logger.info(f"Reusing open camera {config['input_device']}")
+            camera.reconfigure(config['resolution'], config['fps'], config['buffer_size'], config['fast_decode'])
+            return camera
+
+        width, height = map(int, config['resolution'].split('x'))
+        # Video files play at the rate they were made at, not the configured one
+        fps = None if is_video_file(config['input_device']) else config['fps']
+        source = open_source(config['input_device'], fps, paced=self.realtime, resolution=(width, height),
+                             on_settings=self._replay_settings)
+        if isinstance(source, Camera):
+            source.set_buffer_size(config['buffer_size'])
+            source.set_raw_mjpeg(config['fast_decode'])
+        elif not isinstance(source, ReplaySource):
+            source.loop = self.realtime
+        if not self.realtime or isinstance(source, ReplaySource):
+            source.start()
+        return source
+
+    def _replay_settings(self, changes: Dict):
+        # The replay is the input; the recorded input and output settings don't apply
+        changes = {k: v for k, v in changes.items() if k not in INPUT_SETTINGS and k != 'output_device'}
+        if changes and self.on_settings is not None:
+            self.on_settings(changes)
+
+    def _start(self, source, config: Dict):
+        if self.realtime and not isinstance(source, ReplaySource):
+            # The reader drains the driver so we always process the newest
+            # frame instead of a stale queued one
+            self.frame_reader = LatestFrameReader(source)
+            self.frame_reader.tracer = self.tracer
+            self.frame_reader.start()
+        else:
+            self.frame_reader = None
+        self.source = source
+        self.source_config = config
+        self.generation += 1
+
+    def _detach(self, keep: bool):
+        """Stop reading the current source; cameras are cached if keep is set"""
+        source = self.source
+        keep = keep and isinstance(source, Camera) and source.running
+        if self.frame_reader is not None:
+            self.frame_reader.stop(release=not keep)
+        elif source is not None and not keep:
+            source.stop()
+        if keep:
+            self.cache[self.source_config['input_device']] = (source, time.monotonic())
+        self.source = None
+        self.source_config = None
+        self.frame_reader = None
+
+    def update(self, settings):
+        """Apply changed input settings without stopping the pipeline.
+
+        Ignored while a switch is in progress; the caller calls again once
+        ``generation`` changes.
+        """
+        config = self.input_config(settings)
+        if config == self.config or self.switching:
+            return
+        previous = self.source_config
+        if isinstance(self.source, Camera) and config['input_device'] == previous['input_device']:
+            started = time.monotonic()
+            with self.lock:
+                # The reader must not touch the capture while the format changes
+                if self.frame_reader is not None:
+                    self.frame_reader.stop(release=False)
+                self.source.reconfigure(config['resolution'], config['fps'],
+                                        config['buffer_size'], config['fast_decode'])
+                self.config = config
+                self._start(self.source, config)
+            logger.info(f"Renegotiated {config['input_device']} as {config['resolution']} "
+                        f"@ {config['fps']}fps in {time.monotonic() - started:.2f}s")
+            return
+
+        self.switching = True
+        self.switch_thread = threading.Thread(target=self._switch, args=(config, previous),
+                                              name='vidmask-input-switch', daemon=True)
+        self.switch_thread.start()
+
+    def _switch(self, config: Dict, previous: Optional[Dict]):
+        started = time.monotonic()
+        with self.lock:
+            self._detach(keep=True)
+            opened = config
+            try:
+                source = self._open_source(config)
+                self.config = config
+                logger.info(f"Switched input to {config['input_device']} in {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                logger.error(f"Could not switch to {config['input_device']}: {e}")
+                if self.on_error is not None:
+                    self.on_error(str(e))
+                # Go back to the previous input; the failed settings are kept
+                # so the switch isn't retried until they change again
+                self.config = config
+                opened = previous
+                source = None
+                if previous is not None:
+                    try:
+                        source = self._open_source(previous)
+                    except Exception as e:
+                        logger.error(f"Could not reopen {previous['input_device']}: {e}")
+            if source is not None:
+                self._start(source, opened)
+            self.switching = False
+
+    def read(self) -> Tuple[Optional[np.ndarray], float, bool]:
+        """Next input frame with its capture time and duplicate flag"""
+        self.prune()
+        if self.switching:
+            return None, time.monotonic(), False
+        with self.lock:
+            if self.source is None:
+                return None, time.monotonic(), False
+            if self.frame_reader is not None:
+                reader = self.frame_reader
+            else:
+                return self.source.read_frame(), time.monotonic(), False
+        frame = reader.read()
+        return frame, reader.last_read_time, reader.last_read_duplicate
+
+    @property
+    def running(self) -> bool:
+        if self.switching:
+            return True
+        reader = self.frame_reader or self.source
+        return reader is not None and reader.running
+
+    def prune(self):
+        """Release cached cameras that haven't been used for cache_seconds"""
+        if not self.cache or self.switching:
+            return
+        now = time.monotonic()
+        for device, (camera, since) in list(self.cache.items()):
+            if now - since > self.cache_seconds:
+                logger.info(f"Closing cached camera {device}")
+                camera.stop()
+                del self.cache[device]
+
+    def close(self):
+        """Stop reading and release every handle"""
+        if self.switch_thread is not None:
+            self.switch_thread.join()
+            self.switch_thread = None
+        with self.lock:
+            self._detach(keep=False)
+            for camera, _ in self.cache.values():
+                camera.stop()
+            self.cache.clear()
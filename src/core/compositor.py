@@ -0,0 +1,125 @@
+from typing import NamedTuple, Optional, Tuple
+import cv2
+import numpy as np
+
+
+class Placement(NamedTuple):
+    """Where the scaled person goes on the background, in pixels"""
+    scaled_width: int
+    scaled_height: int
+    y_start: int
+    y_end: int
+    x_start: int
+    x_end: int
+    src_y_start: int
+    src_x_start: int
+
+
+def odd_kernel(kernel_size: int) -> int:
+    """Gaussian kernels must be odd and at least 3"""
+    kernel_size = max(3, int(kernel_size))
+    if kernel_size % 2 == 0:
+        kernel_size += 1
+    return kernel_size
+
+
+def smooth_mask(mask: np.ndarray, kernel_size: int, sigma: float) -> np.ndarray:
+    """Blur the segmentation mask to soften the person's edges"""
+    kernel_size = odd_kernel(kernel_size)
+    return blur_mask(mask, (kernel_size, kernel_size), float(sigma))
+
+
+def blur_mask(mask: np.ndarray, kernel: Tuple[int, int], sigma: float) -> np.ndarray:
+    """smooth_mask with an already validated (odd, odd) kernel"""
+    return cv2.GaussianBlur(mask.astype(np.float32), kernel, sigmaX=sigma, sigmaY=sigma)
+
+
+def person_placement(width: int, height: int, scale: float = 1.0,
+                     x_offset: float = 0.5, y_offset: float = 0.5) -> Placement:
+    """Scaled size and clipped position of the person on a width x height background"""
+    # Get current scale and position
+    scaled_width = int(width * scale)
+    scaled_height = int(height * scale)
+
+    # Calculate position based on offset settings
+    x_pos = int((width * (x_offset * 2 - 1)))
+    y_pos = int((height * (y_offset * 2 - 1)))
+
+    # Ensure we don't exceed image boundaries
+    y_start = max(0, y_pos)
+    y_end = min(height, y_pos + scaled_height)
+    x_start = max(0, x_pos)
+    x_end = min(width, x_pos + scaled_width)
+
+    # Calculate source region for person
+    src_y_start = max(0, -y_pos)
+    src_x_start = max(0, -x_pos)
+    return Placement(scaled_width, scaled_height, y_start, y_end, x_start, x_end, src_y_start, src_x_start)
+
+
+def composite_person(frame: np.ndarray, mask: np.ndarray, background: np.ndarray,
+                     scale: float = 1.0, x_offset: float = 0.5, y_offset: float = 0.5,
+                     flip_h: bool = False, flip_v: bool = False,
+                     placement: Optional[Placement] = None, hard_edge: bool = False) -> np.ndarray:
+    """Place the masked person over the background.
+
+    The person is flipped, scaled and moved by the offsets (0.5 = centred)
+    before being blended with the background using the mask as alpha.
+    A precomputed ``placement`` replaces scale and offsets. With
+    ``hard_edge`` person pixels (mask > 0.5) are copied without blending,
+    which is much cheaper.
+    """
+    height, width = background.shape[:2]
+
+    # Extract person and apply flips before positioning
+    person_only = frame
+    if flip_h:
+        person_only = cv2.flip(person_only, 1)
+        mask = cv2.flip(mask, 1)  # Also flip the mask
+    if flip_v:
+        person_only = cv2.flip(person_only, 0)
+        mask = cv2.flip(mask, 0)  # Also flip the mask
+
+    if placement is None:
+        placement = person_placement(width, height, scale, x_offset, y_offset)
+    (scaled_width, scaled_height, y_start, y_end,
+     x_start, x_end, src_y_start, src_x_start) = placement
+
+    # Create output frame with background
+    output_frame = background.copy()
+
+    if hard_edge:
+        if (scaled_width, scaled_height) != (width, height):
+            person_only = cv2.resize(person_only, (scaled_width, scaled_height), interpolation=cv2.INTER_NEAREST)
+            mask = cv2.resize(mask, (scaled_width, scaled_height), interpolation=cv2.INTER_NEAREST)
+        rows = slice(src_y_start, src_y_start + (y_end - y_start))
+        cols = slice(src_x_start, src_x_start + (x_end - x_start))
+        np.copyto(output_frame[y_start:y_end, x_start:x_end], person_only[rows, cols],
+                  where=(mask[rows, cols] > 0.5)[:, :, np.newaxis])
+        return output_frame
+
+    # Scale person and mask if needed
+    if (scaled_width, scaled_height) != (width, height):
+        scaled_person = cv2.resize(person_only, (scaled_width, scaled_height))
+        scaled_mask = cv2.resize(mask, (scaled_width, scaled_height))
+    else:
+        scaled_person = person_only
+        scaled_mask = mask
+
+    # Create a full-size mask with the person at offset position
+    full_mask = np.zeros((height, width))
+
+    # Place person and mask
+    full_mask[y_start:y_end, x_start:x_end] = \
+        scaled_mask[src_y_start:src_y_start + (y_end - y_start),
+                    src_x_start:src_x_start + (x_end - x_start)]
+    output_frame[y_start:y_end, x_start:x_end] = \
+        scaled_person[src_y_start:src_y_start + (y_end - y_start),
+                      src_x_start:src_x_start + (x_end - x_start)]
+
+    # Stack mask for final composition
+    full_mask = np.stack((full_mask,) * 3, axis=-1)
+
+    # Combine with background
+    return (output_frame * full_mask +
+            background * (1 - full_mask)).astype(np.uint8)
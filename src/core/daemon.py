@@ -0,0 +1,204 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Set
+import logging
+import os
+import subprocess
+import time
+import cv2
+from .engine import PipelineEngine
+from .outputs import device_path, output_command
+
+logger = logging.getLogger(__name__)
+
+
+class ConsumerDetector(ABC):
+    """Tells whether anything other than us is reading the output device"""
+
+    @abstractmethod
+    def has_consumer(self) -> bool:
+        """True while another process has the device open"""
+
+
+class ProcConsumerDetector(ConsumerDetector):
+    """Look for other processes holding the device open via /proc/<pid>/fd.
+
+    Works for any path, so a regular file held open by e.g. ``tail -f``
+    can stand in for a v4l2loopback device when testing. Our own process
+    and its children (the ffmpeg writer) are not counted.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.realpath(path)
+
+    def _own_pids(self) -> Set[int]:
+        own = os.getpid()
+        pids = {own}
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f'/proc/{name}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == own:
+                pids.add(int(name))
+        return pids
+
+    def has_consumer(self) -> bool:
+        own_pids = self._own_pids()
+        for name in os.listdir('/proc'):
+            if not name.isdigit() or int(name) in own_pids:
+                continue
+            fd_dir = f'/proc/{name}/fd'
+            try:
+                fds = os.listdir(fd_dir)
+            except OSError:
+                # Gone, or another user's process we may not inspect
+                continue
+            for fd in fds:
+                try:
+                    if os.readlink(os.path.join(fd_dir, fd)) == self.path:
+                        return True
+                except OSError:
+                    continue
+        return False
+
+
+class ManualConsumerDetector(ConsumerDetector):
+    """Consumer state set from code, for tests and external triggers"""
+
+    def __init__(self, present: bool = False):
+        self.present = present
+
+    def has_consumer(self) -> bool:
+        return self.present
+
+
+class PipelineDaemon:
+    """Run the pipeline only while someone is watching the virtual camera.
+
+    While idle the camera is closed and no inference runs; the background
+    image is written to the output once a second so the loopback device
+    stays visible to applications. The engine and its inference session
+    persist across activations, so activation only waits for the camera.
+    When a consumer opens the device the
+    engine is started and must deliver its first frame within
+    ``startup_timeout`` seconds. After the last consumer goes away the
+    engine keeps running for ``grace_period`` seconds, then goes idle.
+    """
+
+    IDLE_FPS = 1.0
+
+    def __init__(self, settings: Dict, detector: Optional[ConsumerDetector] = None,
+                 grace_period: float = 10.0, startup_timeout: float = 5.0,
+                 poll_interval: float = 0.5,
+                 engine_factory: Optional[Callable[[Dict], PipelineEngine]] = None):
+        self.settings = settings
+        self.output = device_path(settings['output_device'])
+        self.detector = detector or ProcConsumerDetector(self.output)
+        self.grace_period = grace_period
+        self.startup_timeout = startup_timeout
+        self.poll_interval = poll_interval
+        self.engine_factory = engine_factory or PipelineEngine
+        self.engine = None
+        self.idle_process = None
+        self.idle_frame = None
+        self.running = False
+        self.activations = 0
+
+    def run(self):
+        """Alternate between idle and active until stop() is called"""
+        self.running = True
+        logger.info(f"Daemon watching {self.output}")
+        self.engine = self.engine_factory(self.settings)
+        self.engine.prewarm()
+        try:
+            while self.running:
+                self.idle()
+                if self.running:
+                    self.active()
+        finally:
+            self.stop_idle_output()
+            self.engine.stop(wait=True)
+            self.engine.close()
+            logger.info("Daemon stopped")
+
+    def stop(self):
+        self.running = False
+
+    def idle(self):
+        """Write the placeholder frame until a consumer appears"""
+        logger.info("Idle: waiting for a consumer")
+        self.start_idle_output()
+        next_write = 0.0
+        while self.running and not self.detector.has_consumer():
+            now = time.monotonic()
+            if now >= next_write:
+                self.write_idle_frame()
+                next_write = now + 1.0 / self.IDLE_FPS
+            time.sleep(self.poll_interval)
+        self.stop_idle_output()
+
+    def active(self):
+        """Run the engine until the consumer has been gone for the grace period"""
+        self.activations += 1
+        activated = time.monotonic()
+        self.engine.start()
+
+        # Bounded startup: give up and go back to idle if no frame arrives
+        while self.engine.running and self.engine.frames_output == 0:
+            if time.monotonic() - activated > self.startup_timeout:
+                logger.error(f"Pipeline did not start within {self.startup_timeout:.1f}s")
+                break
+            time.sleep(0.01)
+        if self.engine.frames_output:
+            logger.info(f"Active: first frame after {time.monotonic() - activated:.2f}s")
+        else:
+            # Don't restart in a tight loop while the consumer is still there
+            self.engine.stop(wait=True)
+            deadline = time.monotonic() + self.startup_timeout
+            while self.running and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+            return
+
+        last_seen = time.monotonic()
+        while self.running and self.engine.running:
+            if self.detector.has_consumer():
+                last_seen = time.monotonic()
+            elif time.monotonic() - last_seen > self.grace_period:
+                logger.info(f"No consumer for {self.grace_period:g}s, going idle")
+                break
+            time.sleep(self.poll_interval)
+
+        self.engine.stop(wait=True)
+
+    def start_idle_output(self):
+        if self.idle_frame is None:
+            width, height = map(int, self.settings['resolution'].split('x'))
+            background = cv2.imread(self.settings['background_path'])
+            if background is None:
+                raise RuntimeError(f"Could not load background image: {self.settings['background_path']}")
+            self.idle_frame = cv2.resize(background, (width, height))
+        height, width = self.idle_frame.shape[:2]
+        self.idle_process = subprocess.Popen(
+            output_command(self.output, width, height, self.IDLE_FPS), stdin=subprocess.PIPE
+        )
+
+    def write_idle_frame(self):
+        try:
+            self.idle_process.stdin.write(self.idle_frame.tobytes())
+            self.idle_process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            logger.warning(f"Idle output failed: {e}")
+            self.stop_idle_output()
+            self.start_idle_output()
+
+    def stop_idle_output(self):
+        if self.idle_process is not None:
+            try:
+                self.idle_process.stdin.close()
+            except OSError:
+                pass
+            self.idle_process.wait()
+            self.idle_process = None
@@ -0,0 +1,636 @@
+from typing import Callable, Dict, Optional, Union
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2
+import numpy as np
+from .capture import CaptureSession
+from .compositor import blur_mask, composite_person, odd_kernel, person_placement
+from .metrics import PipelineMetrics
+from .mjpeg import MjpegFrame, pick_reduction
+from .outputs import OutputFanout, OutputSink, RecordingSink, device_path, parse_output
+from .recording import SessionRecorder
+from .calibration import auto_model, lighter_model
+from .governor import QualityGovernor
+from .segmentation import ModelSpec, SegmentationBackend, create_backend
+from .settings import SettingsSnapshot, SettingsStore
+from .tracing import TraceRecorder
+
+logger = logging.getLogger(__name__)
+
+# Settings the engine reads; the GUI's exported settings use the same keys
+DEFAULT_SETTINGS = {
+    'input_device': '',
+    'output_device': '',
+    'background_path': '',
+    'resolution': '1280x720',
+    'fps': 20.0,
+    'buffer_size': 1,
+    'fast_decode': False,
+    'scale': 1.0,
+    'smooth_kernel': 21,
+    'smooth_sigma': 10.0,
+    'x_offset': 0.5,
+    'y_offset': 0.5,
+    'flip_h': False,
+    'flip_v': False,
+    'segmentation_backend': 'auto',
+    'segmentation_model': '',
+    'intra_op_threads': 0,
+    'inter_op_threads': 0,
+    'quantize_int8': False,
+    'adaptive_quality': True,
+    'output_pix_fmt': 'yuv420p',
+    # More outputs of the same stream, as 'PATH[:WIDTHxHEIGHT][:PIX_FMT]'
+    'extra_outputs': [],
+}
+
+
+def segmentation_model(settings) -> Optional[ModelSpec]:
+    """Registry model for the 'auto' backend (calibrated to fit the fps), else None"""
+    if settings['segmentation_backend'] == 'auto' and not settings['segmentation_model']:
+        return auto_model(settings['fps'])
+    return None
+
+
+def create_segmentation(settings, model: Optional[ModelSpec] = None) -> SegmentationBackend:
+    """Backend for the settings, or for a registry model with the settings' thread options"""
+    options = (settings['intra_op_threads'], settings['inter_op_threads'], settings['quantize_int8'])
+    if model is not None:
+        return model.create(*options)
+    return create_backend(settings['segmentation_backend'], settings['segmentation_model'] or None, *options)
+
+
+def close_unused_session(future: Future):
+    """Close the session of a model swap the pipeline didn't take"""
+    if future.exception() is None:
+        segmentation = future.result()[1]
+        if segmentation is not None:
+            segmentation.close()
+
+
+class InFlightFrame:
+    """An input frame whose mask may still be being inferred"""
+
+    __slots__ = ('frame', 'mjpeg_frame', 'capture_time', 'segmentation', 'timestamp_ms', 'mask')
+
+    def __init__(self, frame: np.ndarray, mjpeg_frame: Optional[MjpegFrame], capture_time: float,
+                 segmentation: Optional[SegmentationBackend] = None, timestamp_ms: Optional[int] = None):
+        self.frame = frame
+        self.mjpeg_frame = mjpeg_frame
+        self.capture_time = capture_time
+        self.segmentation = segmentation
+        self.timestamp_ms = timestamp_ms
+        self.mask = None
+
+    @property
+    def inferred(self) -> bool:
+        return self.timestamp_ms is not None
+
+    def collect(self) -> Optional[np.ndarray]:
+        """The frame's mask, waiting for inference the first time"""
+        if self.segmentation is not None:
+            self.mask = self.segmentation.result(self.timestamp_ms)
+            self.segmentation = None
+        return self.mask
+
+
+class PipelineEngine:
+    """Capture, segmentation, compositing and output, without any UI.
+
+    ``settings`` is a dict or a SettingsStore; with a store a front end can
+    change settings while the engine runs, and the engine picks up the
+    latest snapshot once per frame. Missing keys fall back to
+    DEFAULT_SETTINGS. Output frames are also offered to ``preview_queue``
+    if one is set.
+
+    Live inputs go through a LatestFrameReader so the newest frame is
+    always processed. Unpaced file inputs (``realtime=False``) are read
+    directly so no frame is dropped.
+    """
+
+    def __init__(self, settings: Union[Dict, SettingsStore], realtime: bool = True):
+        if not isinstance(settings, SettingsStore):
+            settings = SettingsStore(dict(DEFAULT_SETTINGS, **settings))
+        else:
+            current = settings.snapshot().values
+            settings.update({k: v for k, v in DEFAULT_SETTINGS.items() if k not in current})
+        self.settings_store = settings
+        self.realtime = realtime
+        self.metrics = PipelineMetrics()
+        self.tracer = TraceRecorder()
+        self.metrics.tracer = self.tracer
+        self.governor = QualityGovernor()
+        self.preview_queue: Optional[queue.Queue] = None
+        self.session_recorder = None
+        self.running = False
+        self.thread = None
+        self.capture = CaptureSession(realtime)
+        self.capture.tracer = self.tracer
+        self.outputs: Optional[OutputFanout] = None
+        # Processed output being recorded, and the file asked for (None to stop)
+        self.output_recorder: Optional[RecordingSink] = None
+        self.output_recording_path: Optional[str] = None
+        self.frames_output = 0
+
+        # Inference session, kept warm across start/stop while the settings it
+        # was created for don't change
+        self.segmentation: Optional[SegmentationBackend] = None
+        self.segmentation_key = None
+        self.segmentation_lock = threading.Lock()
+        # Set by MultiStreamSession: inference shared with other streams
+        self.shared_segmentation: Optional[SegmentationBackend] = None
+        self.last_timestamp = -1
+        self.first_frame_seconds: Optional[float] = None
+
+        # Called from the pipeline thread when the loop ends
+        self.on_error: Optional[Callable[[str], None]] = None
+        self.on_stopped: Optional[Callable[[], None]] = None
+
+    def settings(self) -> SettingsSnapshot:
+        """Current settings snapshot"""
+        return self.settings_store.snapshot()
+
+    def update_settings(self, changes: Dict):
+        """Apply settings changes; the pipeline picks them up with its next frame"""
+        self.settings_store.update(changes)
+
+    def next_timestamp(self, capture_time: float) -> int:
+        """Inference timestamp in ms, strictly increasing over the session's lifetime"""
+        self.last_timestamp = max(int(capture_time * 1000), self.last_timestamp + 1)
+        return self.last_timestamp
+
+    def segmentation_for(self, settings, model: Optional[ModelSpec] = None) -> SegmentationBackend:
+        """The warm inference session for these settings, replaced only if they changed.
+
+        ``model`` overrides the registry model the settings would pick.
+        """
+        if self.shared_segmentation is not None:
+            return self.shared_segmentation
+        model = model or segmentation_model(settings)
+        key = self.segmentation_key_for(settings, model)
+        with self.segmentation_lock:
+            if self.segmentation is not None and self.segmentation_key == key:
+                return self.segmentation
+            if self.segmentation is not None:
+                self.segmentation.close()
+                self.segmentation = None
+            segmentation = self.build_segmentation(settings, model)
+            self.segmentation = segmentation
+            self.segmentation_key = key
+            return segmentation
+
+    @staticmethod
+    def segmentation_key_for(settings, model: Optional[ModelSpec]) -> tuple:
+        return (model, settings['segmentation_backend'], settings['segmentation_model'],
+                settings['intra_op_threads'], settings['inter_op_threads'], settings['quantize_int8'])
+
+    def build_segmentation(self, settings, model: Optional[ModelSpec]) -> SegmentationBackend:
+        """A new inference session, warmed up"""
+        started = time.monotonic()
+        segmentation = create_segmentation(settings, model)
+        # The first inference builds the graph and allocates buffers
+        width, height = map(int, settings['resolution'].split('x'))
+        segmentation.segment(np.zeros((height, width, 3), dtype=np.uint8),
+                             self.next_timestamp(time.monotonic()))
+        logger.info(f"Segmentation ready in {time.monotonic() - started:.2f}s")
+        return segmentation
+
+    def prepare_model_swap(self, settings, model: ModelSpec, light: bool, current: ModelSpec) -> Future:
+        """Build the session for a quality-level model swap on a background thread.
+
+        The future holds (model, session): the calibrated lighter model if
+        light is set and there is one, else model. The session is None if
+        that is the current model.
+        """
+        future = Future()
+
+        def build():
+            try:
+                wanted = (lighter_model(model) or model) if light else model
+                segmentation = self.build_segmentation(settings, wanted) if wanted != current else None
+                future.set_result((wanted, segmentation))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=build, name='vidmask-model-swap', daemon=True).start()
+        return future
+
+    def swap_segmentation(self, settings, model: ModelSpec, segmentation: SegmentationBackend):
+        """Make a session from prepare_model_swap() the warm one, closing the previous"""
+        with self.segmentation_lock:
+            if self.segmentation is not None:
+                self.segmentation.close()
+            self.segmentation = segmentation
+            self.segmentation_key = self.segmentation_key_for(settings, model)
+
+    def prewarm(self) -> threading.Thread:
+        """Create and warm up the inference session on a background thread"""
+        def warm():
+            try:
+                self.segmentation_for(self.settings())
+            except Exception as e:
+                # Reported properly when the pipeline starts
+                logger.warning(f"Could not prepare segmentation: {e}")
+
+        thread = threading.Thread(target=warm, name='vidmask-prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Release the inference session (the engine must be stopped)"""
+        with self.segmentation_lock:
+            if self.segmentation is not None:
+                self.segmentation.close()
+                self.segmentation = None
+                self.segmentation_key = None
+
+    def start(self):
+        """Run the pipeline on a background thread"""
+        if self.running:
+            return
+        self.running = True
+        self.frames_output = 0
+        self.thread = threading.Thread(target=self.run, name='vidmask-pipeline', daemon=True)
+        self.thread.start()
+
+    def stop(self, wait: bool = False):
+        """Ask the pipeline to stop after the current frame"""
+        self.running = False
+        if wait and self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def read_preview(self):
+        """Latest output frame for a preview, or None if there is no new one"""
+        if self.preview_queue is None:
+            return None
+        try:
+            return self.preview_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def start_recording(self, path: str, settings: Optional[Dict] = None):
+        """Start recording raw input and settings changes to a .vmrec session"""
+        recorder = SessionRecorder(path, settings)
+        recorder.start()
+        self.session_recorder = recorder
+
+    def stop_recording(self):
+        recorder = self.session_recorder
+        if recorder is not None:
+            self.session_recorder = None
+            recorder.stop()
+
+    def start_output_recording(self, path: str):
+        """Record the processed output to a video file; starts with the next frame"""
+        self.output_recording_path = path
+
+    def stop_output_recording(self):
+        self.output_recording_path = None
+
+    def update_output_recording(self, width: int, height: int, fps: float, pix_fmt: str):
+        """Open or close the recording sink to match output_recording_path"""
+        path = self.output_recording_path
+        recorder = self.output_recorder
+        if recorder is not None and recorder.path == path:
+            return
+        if recorder is not None:
+            self.output_recorder = None
+            recorder.close()
+        if path is not None:
+            self.output_recorder = RecordingSink(path, (width, height), fps, pix_fmt)
+
+    def record_settings(self, changes: Dict):
+        """Add a settings change to the session being recorded, if any"""
+        recorder = self.session_recorder
+        if recorder is not None:
+            recorder.record_settings(changes)
+
+    def open_input(self, settings: SettingsSnapshot):
+        """Open the configured input and start reading from it"""
+        self.capture.on_error = self.on_error
+        self.capture.on_settings = self.update_settings
+        self.capture.open(settings)
+
+    def read(self):
+        """Next input frame with its capture time and duplicate flag"""
+        return self.capture.read()
+
+    def input_running(self) -> bool:
+        return self.capture.running
+
+    def close_input(self):
+        self.capture.close()
+
+    def write_output(self, frame):
+        self.outputs.write(frame)
+        self.frames_output += 1
+        # After the live outputs; the recording gets the same array, not a copy
+        if self.output_recorder is not None:
+            self.output_recorder.submit(frame)
+
+    def open_output(self, output: str, width: int, height: int, fps: float,
+                    pix_fmt: str = 'yuv420p', extra_outputs=()):
+        """Start the main output at the run size plus any extra outputs"""
+        sinks = [OutputSink(output, (width, height), fps, pix_fmt, realtime=self.realtime)]
+        for spec in extra_outputs:
+            path, size, extra_pix_fmt = parse_output(spec)
+            sinks.append(OutputSink(device_path(path), size or (width, height), fps,
+                                    extra_pix_fmt, realtime=self.realtime))
+            logger.info(f"Extra output {sinks[-1].path} at {sinks[-1].size[0]}x{sinks[-1].size[1]} "
+                        f"{extra_pix_fmt}")
+        self.outputs = OutputFanout(sinks)
+
+    def close_output(self):
+        if self.outputs is not None:
+            self.outputs.close()
+            self.outputs = None
+
+    def run(self):
+        """Run the pipeline in the calling thread until stopped or input ends"""
+        self.running = True
+        self.frames_output = 0
+        self.first_frame_seconds = None
+        started = time.monotonic()
+        decode_executor = None
+        # Session being built for a model swap, and whether it is the light one
+        swap: Optional[Future] = None
+        swap_light = False
+        try:
+            settings = self.settings()
+            # Prepare inference while the camera opens; no-op if already warm
+            self.prewarm()
+
+            output = device_path(settings['output_device'])
+
+            # Load and store original background at original resolution
+            background_path = settings['background_path']
+            original_background = cv2.imread(background_path)
+            if original_background is None:
+                raise RuntimeError(f"Could not load background image: {background_path}")
+
+            self.open_input(settings)
+            input_seconds = time.monotonic() - started
+            # A shared model is chosen once for all streams
+            model = segmentation_model(settings) if self.shared_segmentation is None else None
+            segmentation = self.segmentation_for(settings, model)
+            active_model = model
+            light_active = False
+            # Output size is fixed for the run; later input changes are scaled to it
+            width, height = self.capture.source.resolution
+            input_generation = None
+
+            last_fps = self.capture.fps or settings['fps']
+            output_config = (settings['output_pix_fmt'], tuple(settings['extra_outputs']))
+            self.open_output(output, width, height, last_fps, *output_config)
+
+            background_image = cv2.resize(original_background, (width, height))
+
+            output_frame = None
+            last_mask = None
+            derived_version = None
+            governor = self.governor
+            governor.reset()
+            quality = None
+            frame_index = 0
+            metrics = self.metrics
+            metrics.reset()
+            metrics.register_thread('pipeline')
+
+            # Inference is pipelined one frame deep: a frame's mask is
+            # collected, and the frame composited, after the next frame has
+            # been submitted, so inference overlaps compositing and capture
+            in_flight: Optional[InFlightFrame] = None
+            while self.running or in_flight is not None:
+                metrics.begin_frame()
+                self.update_output_recording(width, height, last_fps, settings['output_pix_fmt'])
+                if self.running:
+                    frame, capture_time, duplicate = self.read()
+                else:
+                    frame, capture_time, duplicate = None, time.monotonic(), False
+                if frame is None and in_flight is None:
+                    if not self.running:
+                        break
+                    if self.capture.switching:
+                        # Keep consumers fed while another input opens
+                        self.write_output(output_frame if output_frame is not None else background_image)
+                        metrics.count('held_frames')
+                        time.sleep(1.0 / last_fps)
+                        continue
+                    if not self.input_running():
+                        break
+                    continue
+                processing_start = time.monotonic()
+
+                # Without a new frame only the one in flight is finished
+                if frame is not None:
+                    capture = self.capture
+                    if capture.generation != input_generation:
+                        # New input or format; decode setup depends on it
+                        input_generation = capture.generation
+                        fast_decode = capture.raw_mjpeg
+                        reduction = pick_reduction(capture.source.get_current_resolution())
+                        if fast_decode and decode_executor is None:
+                            decode_executor = ThreadPoolExecutor(max_workers=1)
+                        if capture.frame_reader is not None:
+                            metrics.register_thread('capture', capture.frame_reader.thread.native_id)
+                        # Input changes made during a switch were ignored; re-apply the settings
+                        derived_version = None
+
+                    settings = self.settings()
+                    if not settings['adaptive_quality'] and governor.index:
+                        governor.reset()
+                    if settings.version != derived_version or governor.level is not quality:
+                        # Settings or quality level changed; recompute what depends on them
+                        quality = governor.level
+                        kernel = (odd_kernel(max(1, int(settings['smooth_kernel'] * quality.feather))),) * 2
+                        sigma = float(settings['smooth_sigma']) * quality.feather
+                        placement = person_placement(width, height, settings['scale'],
+                                                     settings['x_offset'], settings['y_offset'])
+                        derived_version = settings.version
+                        metrics.set_gauge('quality_level', governor.index)
+                        capture.update(settings)
+
+                    # Lightest level: swap in a faster model, and back on recovery.
+                    # The new session is built in the background while this one runs
+                    light = quality.light_model and model is not None
+                    if swap is None and light != light_active:
+                        swap = self.prepare_model_swap(settings, model, light, active_model)
+                        swap_light = light
+                    if swap is not None and swap.done():
+                        done, swap = swap, None
+                        light_active = swap_light
+                        try:
+                            wanted, swapped = done.result()
+                        except Exception as e:
+                            logger.warning(f"Could not swap segmentation model: {e}")
+                        else:
+                            if swapped is not None:
+                                if in_flight is not None:
+                                    # Its session is closed by the swap
+                                    in_flight.collect()
+                                self.swap_segmentation(settings, wanted, swapped)
+                                segmentation = swapped
+                                active_model = wanted
+                                last_mask = None
+
+                    # Keep the raw input (before any decode) for later replay
+                    recorder = self.session_recorder
+                    if recorder is not None:
+                        recorder.record_frame(frame, capture_time)
+
+                    # Camera repeated its last frame; resend the previous output
+                    if duplicate and output_frame is not None:
+                        self.write_output(output_frame)
+                        metrics.mark('output_write')
+                        metrics.count('duplicates_reused')
+                        metrics.end_frame()
+                        continue
+
+                    # Under load, infer on some frames only and reuse the mask in between
+                    frame_index += 1
+                    infer = last_mask is None or frame_index % quality.mask_interval == 0
+
+                    if fast_decode:
+                        # Decode full size on another thread while inference
+                        # runs on a DCT-scaled copy of the same JPEG
+                        mjpeg_frame = MjpegFrame(frame)
+                        mjpeg_frame.decode_full_async(decode_executor)
+                        if infer:
+                            inference_frame = mjpeg_frame.reduced(reduction)
+                            if inference_frame is None:
+                                continue
+                    else:
+                        mjpeg_frame = None
+                        inference_frame = frame
+                    # Lower quality levels shrink the inference input further
+                    if infer and quality.inference_scale != 1.0:
+                        inference_frame = cv2.resize(inference_frame, None, fx=quality.inference_scale,
+                                                     fy=quality.inference_scale, interpolation=cv2.INTER_AREA)
+                    metrics.mark('capture')
+                    if infer:
+                        frame_rgb = cv2.cvtColor(inference_frame, cv2.COLOR_BGR2RGB)
+                        metrics.mark('color_convert')
+
+                # Collect the previous frame's mask, then start inference on this one
+                previous = in_flight
+                if previous is not None:
+                    previous.collect()
+                    metrics.mark('inference')
+                in_flight = None
+                if frame is not None:
+                    if infer:
+                        timestamp_ms = self.next_timestamp(capture_time)
+                        segmentation.submit(frame_rgb, timestamp_ms)
+                        in_flight = InFlightFrame(frame, mjpeg_frame, capture_time, segmentation, timestamp_ms)
+                    else:
+                        in_flight = InFlightFrame(frame, mjpeg_frame, capture_time)
+                if previous is None:
+                    continue
+
+                # The rest composites the previous frame while this one is inferred
+                frame = previous.frame
+                if previous.mjpeg_frame is not None:
+                    frame = previous.mjpeg_frame.full()
+                    if frame is None:
+                        continue
+                # Ensure frame matches target dimensions
+                frame = cv2.resize(frame, (width, height))
+                metrics.mark('resize')
+
+                if previous.inferred:
+                    mask = previous.mask
+                else:
+                    mask = last_mask
+                    metrics.count('masks_reused')
+                if mask is None:
+                    # Segmenter skipped this frame; reuse the previous mask
+                    metrics.count('inference_drops')
+                    mask = last_mask
+                    if mask is None:
+                        continue
+                last_mask = mask
+
+                # Smooth the mask at output size
+                if mask.shape[:2] != (height, width):
+                    mask = cv2.resize(mask, (width, height))
+                if not quality.hard_edge:
+                    mask = blur_mask(mask, kernel, sigma)
+                metrics.mark('mask_smoothing')
+
+                # Restart the outputs if the rate or the set of outputs changed
+                config = (settings['output_pix_fmt'], tuple(settings['extra_outputs']))
+                fps = self.capture.fps or settings['fps']
+                if fps != last_fps or config != output_config:
+                    self.close_output()
+                    last_fps = fps
+                    output_config = config
+                    self.open_output(output, width, height, last_fps, *output_config)
+                metrics.mark('output_restart')
+
+                # Flip, scale and position the person over the background
+                output_frame = composite_person(
+                    frame,
+                    mask,
+                    background_image,
+                    flip_h=settings['flip_h'],
+                    flip_v=settings['flip_v'],
+                    placement=placement,
+                    hard_edge=quality.hard_edge
+                )
+                metrics.mark('composite')
+
+                self.write_output(output_frame)
+                if self.first_frame_seconds is None:
+                    self.first_frame_seconds = time.monotonic() - started
+                    metrics.set_gauge('first_frame_ms', int(self.first_frame_seconds * 1000))
+                    metrics.set_gauge('input_open_ms', int(input_seconds * 1000))
+                    logger.info(f"First frame {self.first_frame_seconds:.2f}s after start "
+                                f"(input opened in {input_seconds:.2f}s)")
+                metrics.mark('output_write')
+                # Each output's writer thread counts its own stalls and drops
+                for name, value in self.outputs.counters().items():
+                    metrics.set_counter(name, value)
+                if self.output_recorder is not None:
+                    metrics.set_gauge('recording_drops', self.output_recorder.dropped)
+                metrics.record_latency(time.monotonic() - previous.capture_time)
+                if settings['adaptive_quality'] and self.realtime:
+                    governor.update(time.monotonic() - processing_start, last_fps)
+
+                if self.preview_queue is not None:
+                    try:
+                        self.preview_queue.put_nowait(output_frame)
+                    except queue.Full:
+                        metrics.count('preview_drops')
+                metrics.mark('preview_handoff')
+                if capture.frame_reader is not None:
+                    metrics.set_gauge('capture_skipped', capture.frame_reader.skipped_frames)
+                    metrics.set_gauge('capture_duplicates', capture.frame_reader.duplicate_frames)
+                metrics.end_frame()
+
+        except Exception as e:
+            logger.exception("Pipeline failed")
+            self.metrics.count('errors')
+            if self.on_error is not None:
+                self.on_error(str(e))
+        finally:
+            self.running = False
+            self.close_input()
+            if decode_executor is not None:
+                decode_executor.shutdown(wait=False)
+            if swap is not None:
+                # Not wanted any more; closed once it is built
+                swap.add_done_callback(close_unused_session)
+            try:
+                self.close_output()
+            except (BrokenPipeError, OSError) as e:
+                logger.warning(f"Error closing output: {e}")
+            if self.output_recorder is not None:
+                # A later start records to the same file again only if asked to
+                self.output_recorder.close()
+                self.output_recorder = None
+                self.output_recording_path = None
+            if self.on_stopped is not None:
+                self.on_stopped()
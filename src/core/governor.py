@@ -0,0 +1,105 @@
+from typing import NamedTuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QualityLevel(NamedTuple):
+    """Settings overrides for one step of the quality ladder"""
+    name: str
+    inference_scale: float  # Inference input size relative to the frame
+    mask_interval: int      # Run inference on every Nth frame, reuse the mask in between
+    feather: float          # Blur kernel and sigma relative to the configured ones
+    hard_edge: bool         # Binary mask, no blending
+    light_model: bool       # Switch to a faster segmentation model
+
+
+# Cheapest last; each level keeps the reductions of the ones before it
+LEVELS = (
+    QualityLevel('full', 1.0, 1, 1.0, False, False),
+    QualityLevel('inference_resolution', 0.5, 1, 1.0, False, False),
+    QualityLevel('mask_reuse', 0.5, 2, 1.0, False, False),
+    QualityLevel('feather', 0.5, 2, 0.5, False, False),
+    QualityLevel('hard_edge', 0.5, 2, 0.0, True, False),
+    QualityLevel('light_model', 0.5, 2, 0.0, True, True),
+)
+
+
+class QualityGovernor:
+    """Keeps frame processing within the frame budget by trading quality.
+
+    ``update()`` is called with each frame's processing time. Load is the
+    smoothed processing time as a fraction of the frame period. After
+    ``down_after`` consecutive frames above ``overload`` the governor
+    moves one level down the ladder; after ``up_after`` frames below
+    ``headroom`` it moves one level back up. No change is made for
+    ``hold`` frames after the previous one, so the new level's cost is
+    measured before deciding again. A recovery that has to be undone soon
+    after doubles the wait before the next recovery attempt, so an
+    overloaded machine doesn't keep flipping between two levels.
+    """
+
+    MAX_BACKOFF = 16
+
+    def __init__(self, overload: float = 0.9, headroom: float = 0.6, smoothing: float = 0.1,
+                 down_after: int = 10, up_after: int = 60, hold: int = 30):
+        self.overload = overload
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.down_after = down_after
+        self.up_after = up_after
+        self.hold = hold
+        self.reset()
+
+    def reset(self):
+        self.index = 0
+        self.load = 0.0
+        self.over = 0
+        self.under = 0
+        self.since_change = 0
+        self.backoff = 1
+        self.last_step_up = None
+
+    @property
+    def level(self) -> QualityLevel:
+        return LEVELS[self.index]
+
+    def update(self, frame_seconds: float, fps: float) -> bool:
+        """Account for one processed frame; True if the level changed"""
+        load = frame_seconds * fps
+        self.load = load if self.load == 0.0 else self.load + self.smoothing * (load - self.load)
+        self.since_change += 1
+        if self.load > self.overload:
+            self.over += 1
+            self.under = 0
+        elif self.load < self.headroom:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+        if self.since_change < self.hold:
+            return False
+        if self.last_step_up is not None and self.since_change >= self.up_after * self.backoff:
+            # The last recovery held
+            self.last_step_up = None
+            self.backoff = 1
+
+        if self.over >= self.down_after and self.index < len(LEVELS) - 1:
+            if self.last_step_up is not None and self.since_change < self.up_after * self.backoff:
+                # The level we recovered to is still too expensive; wait longer next time
+                self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+            self.last_step_up = None
+            self.change(self.index + 1)
+            return True
+        if self.under >= self.up_after * self.backoff and self.index > 0:
+            self.last_step_up = self.index
+            self.change(self.index - 1)
+            return True
+        return False
+
+    def change(self, index: int):
+        logger.info(f"Quality {LEVELS[self.index].name} -> {LEVELS[index].name} "
+                    f"(load {self.load:.0%} of frame time)")
+        self.index = index
+        self.over = self.under = 0
+        self.since_change = 0
@@ -0,0 +1,200 @@
+from typing import Callable, Dict, Optional, Tuple
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import cv2
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+logger = logging.getLogger(__name__)
+
+# Preview frames larger than this are scaled down before publishing
+PREVIEW_MAX_SIZE = (1280, 720)
+
+# seq (u64), height, width, channels (u32 each), padded to 64 bytes
+_HEADER_SIZE = 64
+
+
+def default_socket_path() -> str:
+    """Per-user control socket, in XDG_RUNTIME_DIR when available"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'vidmask.sock')
+    return f'/tmp/vidmask-{os.getuid()}.sock'
+
+
+class PreviewSlot:
+    """Single latest-frame slot in shared memory, guarded by a sequence counter.
+
+    The writer makes the counter odd while it copies a frame in and even
+    again when done, and never waits for readers. A reader copies the frame
+    out and retries later if the counter moved meanwhile, so a stalled
+    reader can't hold up the pipeline and never sees a torn frame.
+    """
+
+    def __init__(self, name: Optional[str] = None, create: bool = False,
+                 max_size: Tuple[int, int] = PREVIEW_MAX_SIZE):
+        self.max_size = max_size
+        if create:
+            size = _HEADER_SIZE + max_size[0] * max_size[1] * 3
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self.owner = create
+        self.seq = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        self.shape = np.ndarray((3,), dtype=np.uint32, buffer=self.shm.buf, offset=8)
+        self.data = np.ndarray((self.shm.size - _HEADER_SIZE,), dtype=np.uint8,
+                               buffer=self.shm.buf, offset=_HEADER_SIZE)
+        self.last_seq = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def put_nowait(self, frame: np.ndarray):
+        """Publish a frame (same call as the engine's preview queue; never blocks)"""
+        height, width = frame.shape[:2]
+        if width > self.max_size[0] or height > self.max_size[1]:
+            factor = min(self.max_size[0] / width, self.max_size[1] / height)
+            frame = cv2.resize(frame, (int(width * factor), int(height * factor)),
+                               interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        self.seq[0] += 1
+        self.shape[:] = (height, width, channels)
+        self.data[:frame.nbytes] = frame.reshape(-1)
+        self.seq[0] += 1
+
+    def read(self) -> Optional[np.ndarray]:
+        """Copy of the newest frame, or None if there's no new complete one"""
+        seq = int(self.seq[0])
+        if seq == self.last_seq or seq % 2:
+            return None
+        height, width, channels = (int(v) for v in self.shape)
+        frame = self.data[:height * width * channels].copy()
+        if int(self.seq[0]) != seq:
+            return None  # Overwritten while copying; take the next one
+        self.last_seq = seq
+        return frame.reshape(height, width, channels)
+
+    def close(self):
+        # Drop the numpy views first, the mapping can't close while exported
+        self.seq = self.shape = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without adopting it for cleanup"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 the resource tracker would unlink the owner's
+        # segment when this process exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON reply per line"""
+
+    def handle(self):
+        server = self.server
+        server.client_connected(+1)
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    reply = server.dispatch(request)
+                except Exception as e:
+                    logger.exception("Control request failed")
+                    reply = {'ok': False, 'error': str(e)}
+                self.wfile.write(json.dumps(reply).encode() + b'\n')
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            server.client_connected(-1)
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server mapping {"cmd": name, ...} requests to handlers.
+
+    Each handler receives the request dict and returns a reply dict;
+    ``ok`` is added to replies automatically.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[[Dict], Dict]]):
+        if os.path.exists(path):
+            if _socket_alive(path):
+                raise OSError(f"Another pipeline is already listening on {path}")
+            os.unlink(path)
+        super().__init__(path, _ControlHandler)
+        os.chmod(path, 0o600)
+        self.path = path
+        self.handlers = handlers
+        self.clients = 0
+        self._clients_lock = threading.Lock()
+
+    def client_connected(self, change: int):
+        with self._clients_lock:
+            self.clients += change
+
+    def dispatch(self, request: Dict) -> Dict:
+        handler = self.handlers.get(request.get('cmd'))
+        if handler is None:
+            return {'ok': False, 'error': f"Unknown command: {request.get('cmd')}"}
+        reply = handler(request) or {}
+        reply.setdefault('ok', True)
+        return reply
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _socket_alive(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class ControlClient:
+    """Persistent connection to a ControlServer"""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile('rb')
+        self.lock = threading.Lock()
+
+    def request(self, cmd: str, **kwargs) -> Dict:
+        """Send a command and wait for its reply; raises RuntimeError if it failed"""
+        with self.lock:
+            self.sock.sendall(json.dumps(dict(kwargs, cmd=cmd)).encode() + b'\n')
+            line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Pipeline process closed the connection")
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error', f"{cmd} failed"))
+        return reply
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
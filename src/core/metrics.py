@@ -0,0 +1,242 @@
+from typing import Dict, Optional
+import os
+import threading
+import time
+import numpy as np
+
+# Pipeline stages in the order a frame passes through them
+STAGES = (
+    'capture',
+    'resize',
+    'color_convert',
+    'inference',
+    'mask_smoothing',
+    'output_restart',
+    'composite',
+    'output_write',
+    'preview_handoff',
+)
+
+PERCENTILES = (50, 95, 99)
+
+# Histogram bucket upper bounds in seconds (Prometheus-style, +Inf implied)
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 1.0)
+
+
+def metrics_enabled_by_default() -> bool:
+    """Instrumentation is on unless VIDMASK_METRICS=0"""
+    return os.environ.get('VIDMASK_METRICS', '1') != '0'
+
+
+class PipelineMetrics:
+    """Per-stage frame timings kept in a preallocated ring buffer.
+
+    The pipeline thread is the only writer: it calls ``begin_frame()``,
+    then ``mark(stage)`` after each stage and ``end_frame()`` at the end.
+    A mark costs one ``perf_counter()`` call and one array store, so the
+    overhead stays far below 1% of a frame. Readers call ``summary()``
+    from any thread; they copy the arrays without locking and may see at
+    most one partially written row, which doesn't matter for percentiles.
+    With ``enabled=False`` nothing is measured; ``mark()`` still records
+    trace spans if the attached tracer is recording.
+    """
+
+    def __init__(self, window: int = 512, enabled: Optional[bool] = None):
+        self.enabled = metrics_enabled_by_default() if enabled is None else enabled
+        self.window = window
+        self.stage_index = {stage: i for i, stage in enumerate(STAGES)}
+
+        # Ring buffers: one row per frame
+        self.stage_times = np.zeros((window, len(STAGES)), dtype=np.float64)
+        self.frame_times = np.zeros(window, dtype=np.float64)
+        self.frame_ends = np.zeros(window, dtype=np.float64)
+        self.frames = 0
+
+        # Cumulative histograms since reset: one row per stage plus whole frame
+        self.histogram = np.zeros((len(STAGES) + 1, len(HISTOGRAM_BUCKETS) + 1), dtype=np.int64)
+        self.histogram_sums = np.zeros(len(STAGES) + 1, dtype=np.float64)
+        self._histogram_rows = np.arange(len(STAGES) + 1)
+        self._bucket_bounds = np.array(HISTOGRAM_BUCKETS)
+
+        # Capture-to-output latency of each frame
+        self.latencies = np.zeros(window, dtype=np.float64)
+
+        # Native ids of the threads doing pipeline work, for CPU sampling,
+        # and the process they run in (None: this one)
+        self.thread_ids: Dict[str, int] = {}
+        self.pid = None
+
+        # Monotonic counters (drops, errors, skipped work, ...)
+        self.counters: Dict[str, int] = {}
+        # Current values that can go down (quality level, startup times, ...)
+        self.gauges: Dict[str, float] = {}
+
+        # Optional TraceRecorder receiving every stage span
+        self.tracer = None
+
+        self._row = 0
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+
+    def reset(self):
+        """Clear all recorded timings and counters"""
+        self.stage_times.fill(0)
+        self.frame_times.fill(0)
+        self.frame_ends.fill(0)
+        self.latencies.fill(0)
+        self.histogram.fill(0)
+        self.histogram_sums.fill(0)
+        self.frames = 0
+        self.counters = {}
+        self.gauges = {}
+        self.thread_ids = {}
+
+    def register_thread(self, name: str, native_id: Optional[int] = None):
+        """Register a pipeline thread (the calling one by default)"""
+        self.thread_ids[name] = threading.get_native_id() if native_id is None else native_id
+
+    def _tracing(self) -> bool:
+        return self.tracer is not None and self.tracer.enabled
+
+    def begin_frame(self):
+        """Start timing a new frame"""
+        if not self.enabled:
+            if self._tracing():
+                # Stage spans are still traced when metrics are off
+                self._last_mark = time.perf_counter()
+            return
+        self._row = self.frames % self.window
+        self.stage_times[self._row] = 0
+        self._frame_start = self._last_mark = time.perf_counter()
+
+    def mark(self, stage: str) -> float:
+        """Attribute the time since the previous mark to stage, returning it"""
+        if not self.enabled:
+            if not self._tracing():
+                return 0.0
+            now = time.perf_counter()
+            elapsed = now - self._last_mark
+            self.tracer.record(stage, self._last_mark, now)
+            self._last_mark = now
+            return elapsed
+        now = time.perf_counter()
+        elapsed = now - self._last_mark
+        self.stage_times[self._row, self.stage_index[stage]] += elapsed
+        if self.tracer is not None:
+            self.tracer.record(stage, self._last_mark, now)
+        self._last_mark = now
+        return elapsed
+
+    def record_latency(self, seconds: float):
+        """Record capture-to-output latency for the current frame"""
+        if not self.enabled:
+            return
+        self.latencies[self._row] = seconds
+
+    def end_frame(self):
+        """Finish the current frame and publish its row"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame_times[self._row] = now - self._frame_start
+        self.frame_ends[self._row] = now
+
+        values = np.append(self.stage_times[self._row], self.frame_times[self._row])
+        buckets = np.searchsorted(self._bucket_bounds, values)
+        self.histogram[self._histogram_rows, buckets] += 1
+        self.histogram_sums += values
+
+        self.frames += 1
+
+    def count(self, name: str, amount: int = 1):
+        """Increment a named counter"""
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_counter(self, name: str, value: int):
+        """Set a counter that is tracked elsewhere (e.g. reader skips)"""
+        if not self.enabled:
+            return
+        self.counters[name] = value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a value that can go up or down"""
+        if not self.enabled:
+            return
+        self.gauges[name] = value
+
+    def summary(self) -> dict:
+        """Rolling percentiles (ms), achieved fps, counters and gauges"""
+        frames = self.frames
+        valid = min(frames, self.window)
+        result = {
+            'enabled': self.enabled,
+            'frames': frames,
+            'fps': 0.0,
+            'stages': {},
+            'frame_ms': {},
+            'latency_ms': {},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+        if not self.enabled or valid == 0:
+            return result
+
+        stage_times = self.stage_times[:valid].copy() * 1000
+        frame_times = self.frame_times[:valid].copy() * 1000
+        frame_ends = self.frame_ends[:valid].copy()
+        latencies = self.latencies[:valid].copy() * 1000
+
+        for i, stage in enumerate(STAGES):
+            values = np.percentile(stage_times[:, i], PERCENTILES)
+            result['stages'][stage] = {f'p{p}': float(v) for p, v in zip(PERCENTILES, values)}
+        values = np.percentile(frame_times, PERCENTILES)
+        result['frame_ms'] = {f'p{p}': float(v) for p, v in zip(PERCENTILES, values)}
+        values = np.percentile(latencies, PERCENTILES)
+        result['latency_ms'] = {f'p{p}': float(v) for p, v in zip(PERCENTILES, values)}
+
+        if valid > 1:
+            span = frame_ends.max() - frame_ends.min()
+            if span > 0:
+                result['fps'] = (valid - 1) / span
+        return result
+
+
+class ThreadCpuSampler:
+    """CPU usage of pipeline threads, read from /proc/self/task (Linux only)"""
+
+    def __init__(self):
+        self.clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self.last_ticks: Dict[int, int] = {}
+        self.last_time = None
+
+    def _thread_ticks(self, native_id: int, pid: Optional[int] = None) -> Optional[int]:
+        try:
+            with open(f'/proc/{pid or "self"}/task/{native_id}/stat') as f:
+                # Fields after the command name: utime and stime are 12th and 13th
+                fields = f.read().rsplit(')', 1)[1].split()
+            return int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def sample(self, thread_ids: Dict[str, int], pid: Optional[int] = None) -> Dict[str, float]:
+        """CPU% per thread since the previous call (100% = one full core).
+
+        Threads belong to this process unless another pid is given.
+        """
+        now = time.monotonic()
+        elapsed = now - self.last_time if self.last_time is not None else 0.0
+        usage = {}
+        ticks_now = {}
+        for name, native_id in list(thread_ids.items()):
+            ticks = self._thread_ticks(native_id, pid)
+            if ticks is None:
+                continue
+            ticks_now[native_id] = ticks
+            previous = self.last_ticks.get(native_id)
+            if previous is not None and elapsed > 0:
+                usage[name] = (ticks - previous) / self.clock_ticks / elapsed * 100
+        self.last_ticks = ticks_now
+        self.last_time = now
+        return usage
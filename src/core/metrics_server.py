@@ -0,0 +1,160 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+import logging
+import os
+import re
+import socketserver
+import threading
+from .metrics import HISTOGRAM_BUCKETS, STAGES, PipelineMetrics
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def render_prometheus(sources: Dict[str, PipelineMetrics]) -> str:
+    """Render pipeline metrics in the Prometheus text exposition format"""
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header('vidmask_frames_total', 'counter', 'Frames processed by the pipeline')
+    for pipeline, metrics in sources.items():
+        lines.append(f'vidmask_frames_total{{pipeline="{pipeline}"}} {metrics.frames}')
+
+    header('vidmask_fps', 'gauge', 'Achieved frames per second over the rolling window')
+    summaries = {pipeline: metrics.summary() for pipeline, metrics in sources.items()}
+    for pipeline, summary in summaries.items():
+        lines.append(f'vidmask_fps{{pipeline="{pipeline}"}} {summary["fps"]:.3f}')
+
+    # Counters: drops, duplicates (skipped inference), output stalls, errors
+    counter_names = sorted({name for s in summaries.values() for name in s['counters']})
+    for name in counter_names:
+        metric = f'vidmask_{_metric_name(name)}_total'
+        header(metric, 'counter', f'Pipeline event counter "{name}"')
+        for pipeline, summary in summaries.items():
+            lines.append(f'{metric}{{pipeline="{pipeline}"}} {summary["counters"].get(name, 0)}')
+
+    # Gauges: quality level, startup times, counts that restart with their source
+    gauge_names = sorted({name for s in summaries.values() for name in s['gauges']})
+    for name in gauge_names:
+        metric = f'vidmask_{_metric_name(name)}'
+        header(metric, 'gauge', f'Pipeline value "{name}"')
+        for pipeline, summary in summaries.items():
+            if name in summary['gauges']:
+                lines.append(f'{metric}{{pipeline="{pipeline}"}} {summary["gauges"][name]}')
+
+    header('vidmask_stage_seconds', 'histogram', 'Time spent per frame in each pipeline stage')
+    labels = list(STAGES) + ['frame']
+    for pipeline, metrics in sources.items():
+        histogram = metrics.histogram.copy()
+        sums = metrics.histogram_sums.copy()
+        for row, stage in enumerate(labels):
+            base = f'pipeline="{pipeline}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS, histogram[row]):
+                cumulative += int(count)
+                lines.append(f'vidmask_stage_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += int(histogram[row, -1])
+            lines.append(f'vidmask_stage_seconds_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f'vidmask_stage_seconds_sum{{{base}}} {sums[row]:.6f}')
+            lines.append(f'vidmask_stage_seconds_count{{{base}}} {cumulative}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_prometheus(self.server.sources).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+class MetricsServer:
+    """Optional local endpoint serving pipeline metrics for Prometheus.
+
+    ``address`` is either ``host:port`` for TCP or ``unix:/path/to.sock``.
+    Nothing is started (and no port is opened) unless ``start()`` is called.
+    """
+
+    def __init__(self, address: str, sources: Optional[Dict[str, PipelineMetrics]] = None):
+        self.address = address
+        self.sources = sources if sources is not None else {}
+        self.server = None
+        self.thread = None
+
+    def add_source(self, name: str, metrics: PipelineMetrics):
+        """Expose another pipeline under the given label"""
+        self.sources[name] = metrics
+
+    def start(self):
+        """Bind the endpoint and serve in a background thread"""
+        if self.server is not None:
+            return
+        if self.address.startswith('unix:'):
+            path = self.address[len('unix:'):]
+            if os.path.exists(path):
+                os.unlink(path)
+            self.server = _UnixHTTPServer(path, _MetricsHandler)
+        else:
+            host, _, port = self.address.rpartition(':')
+            self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _MetricsHandler)
+            self.server.daemon_threads = True
+        self.server.sources = self.sources
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Metrics endpoint listening on {self.url}")
+
+    @property
+    def url(self) -> str:
+        if self.server is None:
+            return ''
+        if self.address.startswith('unix:'):
+            return self.address
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def stop(self):
+        """Shut down the endpoint"""
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        if self.address.startswith('unix:'):
+            path = self.address[len('unix:'):]
+            if os.path.exists(path):
+                os.unlink(path)
+        self.server = None
+        self.thread = None
+
+
+def metrics_server_from_env(sources: Optional[Dict[str, PipelineMetrics]] = None) -> Optional[MetricsServer]:
+    """Create a server if VIDMASK_METRICS_ADDR is set, e.g. 127.0.0.1:9464"""
+    address = os.environ.get('VIDMASK_METRICS_ADDR')
+    if not address:
+        return None
+    return MetricsServer(address, sources)
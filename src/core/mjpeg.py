@@ -0,0 +1,88 @@
+from concurrent.futures import Executor, Future
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+# libjpeg can scale during the IDCT, which is much cheaper than decoding
+# the full image and resizing it afterwards
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def is_encoded(frame: np.ndarray) -> bool:
+    """Check whether a captured frame is a raw MJPEG bitstream.
+
+    OpenCV's V4L2 backend returns the buffer as a 1xN Mat in raw mode,
+    other paths as a flat array.
+    """
+    return (frame is not None and frame.dtype == np.uint8
+            and (frame.ndim == 1 or (frame.ndim == 2 and frame.shape[0] == 1)))
+
+
+def decode_mjpeg(data: np.ndarray, reduction: int = 1) -> Optional[np.ndarray]:
+    """Decode a JPEG bitstream, optionally at 1/2, 1/4 or 1/8 scale"""
+    if reduction not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f"Unsupported JPEG reduction: {reduction}")
+    return cv2.imdecode(data.ravel(), REDUCED_DECODE_FLAGS[reduction])
+
+
+def pick_reduction(frame_size: Tuple[int, int], target_size: int = 256) -> int:
+    """Pick the largest reduction that keeps the short side >= target_size"""
+    short_side = min(frame_size)
+    for reduction in (8, 4, 2):
+        if short_side // reduction >= target_size:
+            return reduction
+    return 1
+
+
+class MjpegFrame:
+    """A captured frame that is decoded lazily and only at the sizes needed.
+
+    Inference only needs a small image, so it gets a DCT-scaled decode.
+    The full-resolution decode is done once, on demand, for compositing and
+    can be started on another thread while inference runs.
+    """
+
+    def __init__(self, data: np.ndarray):
+        encoded = is_encoded(data)
+        self.data = data.ravel() if encoded else data
+        self._full = None if encoded else data
+        self._full_future = None
+        self._reduced = {}
+
+    def reduced(self, reduction: int) -> Optional[np.ndarray]:
+        """Get the frame decoded at 1/reduction scale"""
+        if reduction == 1:
+            return self.full()
+        if not is_encoded(self.data):
+            # Backend ignored raw mode and already decoded the frame
+            height, width = self._full.shape[:2]
+            return cv2.resize(
+                self._full,
+                (width // reduction, height // reduction),
+                interpolation=cv2.INTER_AREA
+            )
+        if reduction not in self._reduced:
+            self._reduced[reduction] = decode_mjpeg(self.data, reduction)
+        return self._reduced[reduction]
+
+    def decode_full_async(self, executor: Executor) -> Future:
+        """Start the full-resolution decode on an executor"""
+        if self._full_future is None:
+            self._full_future = executor.submit(self._decode_full)
+        return self._full_future
+
+    def _decode_full(self) -> Optional[np.ndarray]:
+        if self._full is None:
+            self._full = decode_mjpeg(self.data)
+        return self._full
+
+    def full(self) -> Optional[np.ndarray]:
+        """Get the frame decoded at full resolution"""
+        if self._full_future is not None:
+            return self._full_future.result()
+        return self._decode_full()
@@ -0,0 +1,223 @@
+from typing import Callable, Dict, List, Optional
+import logging
+import threading
+import time
+import numpy as np
+from .engine import DEFAULT_SETTINGS, PipelineEngine, create_segmentation, segmentation_model
+from .segmentation import SegmentationBackend
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceRequest:
+    __slots__ = ('frame_rgb', 'timestamp_ms', 'submitted')
+
+    def __init__(self, frame_rgb: np.ndarray, timestamp_ms: int, submitted: float):
+        self.frame_rgb = frame_rgb
+        self.timestamp_ms = timestamp_ms
+        self.submitted = submitted
+
+
+class StreamSegmentation(SegmentationBackend):
+    """One stream's handle on a SharedSegmentation worker.
+
+    Looks like any other backend to the stream's engine: ``submit()``
+    queues the frame for the shared worker and ``result()`` waits for its
+    mask. None means the scheduler dropped the frame and the engine reuses
+    its previous mask.
+    """
+
+    name = 'shared'
+
+    def __init__(self, worker: 'SharedSegmentation', stream: str, fps: Callable[[], float]):
+        self.worker = worker
+        self.stream = stream
+        self.fps = fps
+        self.pending: Optional[InferenceRequest] = None
+        self.results: Dict[int, Optional[np.ndarray]] = {}
+        # Time by which the stream is next entitled to an inference
+        self.due = 0.0
+        self.served = 0
+        self.dropped = 0
+
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        self.worker.enqueue(self, InferenceRequest(frame_rgb, timestamp_ms, time.monotonic()))
+
+    def result(self, timestamp_ms: int, timeout: float = 1.0) -> Optional[np.ndarray]:
+        return self.worker.wait(self, timestamp_ms, timeout)
+
+    def close(self):
+        self.worker.remove(self)
+
+
+class SharedSegmentation:
+    """One segmentation model serving several camera streams.
+
+    A single worker thread runs every stream's inference. Each pass takes
+    up to ``backend.max_batch`` waiting frames, one per stream, and runs
+    them as one batch if the backend supports it. When fewer streams are
+    waiting than could be batched, the worker holds on for up to
+    ``batch_window`` seconds for the rest to arrive.
+
+    Streams are served earliest-due first. A stream is due one frame
+    period (at its own fps) after it was last served, so a fast camera
+    can't starve a slow one. A stream submitting more than one frame ahead
+    of its fps has the frame dropped instead of queued, which holds each
+    stream to its target and leaves the model's time to the others.
+    """
+
+    def __init__(self, backend: SegmentationBackend, batch_window: float = 0.004):
+        self.backend = backend
+        self.batch_window = batch_window
+        self.streams: List[StreamSegmentation] = []
+        self.condition = threading.Condition()
+        self.closing = False
+        self.timestamp = 1
+        self.batches = 0
+        self.batched_frames = 0
+        self.thread = threading.Thread(target=self._worker_loop, name='vidmask-shared-inference', daemon=True)
+        self.thread.start()
+
+    def stream(self, name: str, fps: Callable[[], float]) -> StreamSegmentation:
+        """Handle for a new stream running at fps() frames per second"""
+        client = StreamSegmentation(self, name, fps)
+        with self.condition:
+            self.streams.append(client)
+        return client
+
+    def remove(self, client: StreamSegmentation):
+        with self.condition:
+            if client in self.streams:
+                self.streams.remove(client)
+            client.pending = None
+            self.condition.notify_all()
+
+    def enqueue(self, client: StreamSegmentation, request: InferenceRequest):
+        period = 1.0 / client.fps()
+        with self.condition:
+            if client.pending is not None:
+                # Replaced before it was served
+                client.results[client.pending.timestamp_ms] = None
+                client.dropped += 1
+            if client.due - request.submitted > period:
+                # Over its fps target while inference is the bottleneck
+                client.results[request.timestamp_ms] = None
+                client.pending = None
+                client.dropped += 1
+            else:
+                client.pending = request
+            self.condition.notify_all()
+
+    def wait(self, client: StreamSegmentation, timestamp_ms: int, timeout: float) -> Optional[np.ndarray]:
+        with self.condition:
+            if not self.condition.wait_for(lambda: timestamp_ms in client.results or self.closing, timeout):
+                return None
+            mask = client.results.pop(timestamp_ms, None)
+            # Results nobody will ask for any more
+            for stale in [t for t in client.results if t < timestamp_ms]:
+                del client.results[stale]
+            return mask
+
+    def _next_batch(self) -> List[StreamSegmentation]:
+        waiting = [client for client in self.streams if client.pending is not None]
+        return sorted(waiting, key=lambda client: client.due)[:self.backend.max_batch]
+
+    def _worker_loop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closing or any(c.pending is not None for c in self.streams))
+                if self.closing:
+                    return
+                wanted = min(self.backend.max_batch, len(self.streams))
+                if wanted > 1:
+                    self.condition.wait_for(
+                        lambda: self.closing or sum(c.pending is not None for c in self.streams) >= wanted,
+                        self.batch_window)
+                batch = self._next_batch()
+                requests = [client.pending for client in batch]
+                for client in batch:
+                    client.pending = None
+            if not batch:
+                continue
+
+            # The backend sees its own increasing timestamps; streams' clocks may overlap
+            timestamps = []
+            for _ in requests:
+                self.timestamp += 1
+                timestamps.append(self.timestamp)
+            try:
+                masks = self.backend.segment_batch([r.frame_rgb for r in requests], timestamps)
+            except Exception as e:
+                logger.error(f"Shared inference failed: {e}")
+                masks = [None] * len(requests)
+
+            with self.condition:
+                self.batches += 1
+                self.batched_frames += len(batch)
+                for client, request, mask in zip(batch, requests, masks):
+                    client.results[request.timestamp_ms] = mask
+                    client.served += 1
+                    client.due = max(client.due, request.submitted) + 1.0 / client.fps()
+                self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {
+                'batches': self.batches,
+                'mean_batch': self.batched_frames / self.batches if self.batches else 0.0,
+                'streams': {c.stream: {'served': c.served, 'dropped': c.dropped} for c in self.streams},
+            }
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.backend.close()
+
+
+class MultiStreamSession:
+    """Several input/output pairs in one process, sharing one segmentation model.
+
+    ``streams`` holds per-stream settings overrides (at least input_device
+    and output_device) on top of ``settings``. Each stream gets its own
+    PipelineEngine, so capture, compositing and output run on the stream's
+    own thread at its own fps. Only inference is shared, through a
+    SharedSegmentation created from the base settings.
+    """
+
+    def __init__(self, settings: Dict, streams: List[Dict], realtime: bool = True):
+        settings = dict(DEFAULT_SETTINGS, **settings)
+        self.backend = create_segmentation(settings, segmentation_model(settings))
+        # The first inference builds the graph and allocates buffers
+        width, height = map(int, settings['resolution'].split('x'))
+        self.backend.segment(np.zeros((height, width, 3), dtype=np.uint8), 0)
+        self.shared = SharedSegmentation(self.backend)
+        self.engines: List[PipelineEngine] = []
+        for i, overrides in enumerate(streams):
+            engine = PipelineEngine(dict(settings, **overrides), realtime=realtime)
+            name = f"{i}:{overrides.get('input_device', '')}"
+            engine.shared_segmentation = self.shared.stream(name, lambda e=engine: e.settings()['fps'])
+            self.engines.append(engine)
+
+    def start(self):
+        for engine in self.engines:
+            engine.start()
+
+    @property
+    def running(self) -> bool:
+        return any(engine.running for engine in self.engines)
+
+    def stop(self, wait: bool = False):
+        for engine in self.engines:
+            engine.stop(wait)
+
+    def close(self):
+        """Release the shared model (the streams must be stopped)"""
+        stats = self.shared.stats()
+        logger.info(f"Shared inference: {stats['batches']} batches of {stats['mean_batch']:.2f} frames; "
+                    + ', '.join(f"{name} {s['served']} served, {s['dropped']} dropped"
+                                for name, s in stats['streams'].items()))
+        for engine in self.engines:
+            engine.shared_segmentation.close()
+        self.shared.close()
@@ -0,0 +1,202 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import logging
+import os
+import subprocess
+import tempfile
+import time
+import cv2
+from .compositor import blur_mask, composite_person, odd_kernel, person_placement
+from .engine import DEFAULT_SETTINGS, create_segmentation, segmentation_model
+from .outputs import frame_bytes, output_command
+from .segmentation import ModelSpec
+
+logger = logging.getLogger(__name__)
+
+# Frames per chunk; long enough that seeking and model start-up are a small share
+CHUNK_FRAMES = 120
+
+
+class Chunk(NamedTuple):
+    index: int
+    start: int
+    count: Optional[int]  # None: to the end of the file
+
+
+class Progress(NamedTuple):
+    frames: int
+    total: int
+    seconds: float
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+
+def video_info(path: str) -> Tuple[int, float, Tuple[int, int]]:
+    """Frame count (0 if unknown), fps and size of a video file"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video file: {path}")
+    try:
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_SETTINGS['fps']
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    finally:
+        cap.release()
+    return max(count, 0), fps, size
+
+
+def split_chunks(frame_count: int, chunk_frames: int = CHUNK_FRAMES) -> List[Chunk]:
+    """Consecutive chunks covering the file; the last one reads to the end.
+
+    Frame counts from container headers can be off, so the last chunk
+    isn't limited to the count.
+    """
+    if frame_count <= chunk_frames:
+        return [Chunk(0, 0, None)]
+    starts = range(0, frame_count, chunk_frames)
+    chunks = [Chunk(i, start, chunk_frames) for i, start in enumerate(starts)]
+    chunks[-1] = chunks[-1]._replace(count=None)
+    return chunks
+
+
+def concat_command(list_path: str, input_path: str, output: str) -> list:
+    """ffmpeg command joining the listed chunk files, with the input's audio, without re-encoding"""
+    command = ['ffmpeg', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+               '-i', input_path, '-map', '0:v', '-map', '1:a?', '-c', 'copy']
+    if output == '-':
+        return command + ['-f', 'matroska', '-']
+    return command + ['-y', output]
+
+
+# State of a pool worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(settings: Dict, model: Optional[ModelSpec], size: Tuple[int, int]):
+    # The pool provides the parallelism; threads inside each worker would
+    # only compete with the other workers for the same cores
+    cv2.setNumThreads(1)
+    settings = dict(settings, intra_op_threads=settings['intra_op_threads'] or 1,
+                    inter_op_threads=settings['inter_op_threads'] or 1)
+    width, height = size
+    background = cv2.imread(settings['background_path'])
+    if background is None:
+        raise RuntimeError(f"Could not load background image: {settings['background_path']}")
+    _worker.update(
+        settings=settings,
+        size=size,
+        segmentation=create_segmentation(settings, model),
+        background=cv2.resize(background, size),
+        placement=person_placement(width, height, settings['scale'], settings['x_offset'], settings['y_offset']),
+        kernel=(odd_kernel(settings['smooth_kernel']),) * 2,
+        timestamp=0,
+    )
+
+
+def _process_chunk(path: str, chunk: Chunk, chunk_path: str, fps: float) -> Tuple[int, int, float]:
+    """Process one chunk into chunk_path; (chunk index, frames, seconds)"""
+    started = time.monotonic()
+    settings = _worker['settings']
+    segmentation = _worker['segmentation']
+    background = _worker['background']
+    width, height = _worker['size']
+    sigma = float(settings['smooth_sigma'])
+
+    cap = cv2.VideoCapture(path)
+    if chunk.start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, chunk.start)
+    # One encoder thread per worker, like the rest of the worker
+    encoder = subprocess.Popen(
+        output_command(chunk_path, width, height, fps, settings['output_pix_fmt'], threads=1),
+        stdin=subprocess.PIPE
+    )
+    frames = 0
+    last_mask = None
+    try:
+        while chunk.count is None or frames < chunk.count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            _worker['timestamp'] += 1
+            mask = segmentation.segment(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), _worker['timestamp'])
+            mask = last_mask if mask is None else mask
+            if mask is None:
+                output_frame = background
+            else:
+                last_mask = mask
+                if mask.shape[:2] != (height, width):
+                    mask = cv2.resize(mask, (width, height))
+                output_frame = composite_person(
+                    frame, blur_mask(mask, _worker['kernel'], sigma), background,
+                    flip_h=settings['flip_h'], flip_v=settings['flip_v'], placement=_worker['placement']
+                )
+            encoder.stdin.write(frame_bytes(output_frame))
+            frames += 1
+    finally:
+        cap.release()
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode != 0:
+        raise RuntimeError(f"Encoding chunk {chunk.index} failed (ffmpeg exit {encoder.returncode})")
+    return chunk.index, frames, time.monotonic() - started
+
+
+def process_file(input_path: str, output: str, settings: Dict, jobs: int = 0,
+                 chunk_frames: int = CHUNK_FRAMES,
+                 on_progress: Optional[Callable[[Progress], None]] = None) -> Progress:
+    """Background replacement for a whole video file using a process pool.
+
+    The file is split into chunks of ``chunk_frames``. Each worker process
+    has its own segmentation instance, seeks to its chunk, and encodes it
+    to a temporary file. The chunks are then joined in order into
+    ``output`` (a file, or '-' for Matroska on stdout) without re-encoding.
+    Nothing is paced, so throughput is bounded by the CPU, not by the
+    video's fps. ``on_progress`` is called as chunks finish.
+    """
+    settings = dict(DEFAULT_SETTINGS, **settings)
+    if cv2.imread(settings['background_path']) is None:
+        raise RuntimeError(f"Could not load background image: {settings['background_path']}")
+    jobs = jobs or os.cpu_count() or 1
+    frame_count, fps, size = video_info(input_path)
+    chunks = split_chunks(frame_count, chunk_frames)
+    # Choose once here so workers don't each calibrate
+    model = segmentation_model(settings)
+    logger.info(f"Processing {input_path}: {frame_count} frames in {len(chunks)} chunks on {jobs} workers")
+
+    started = time.monotonic()
+    done = 0
+    extension = (os.path.splitext(output)[1] if output != '-' else '') or '.mkv'
+    with tempfile.TemporaryDirectory(prefix='vidmask-') as tmpdir:
+        chunk_paths = [os.path.join(tmpdir, f'chunk_{chunk.index:05d}{extension}') for chunk in chunks]
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), initializer=_init_worker,
+                                 initargs=(settings, model, size)) as pool:
+            pending = {pool.submit(_process_chunk, input_path, chunk, chunk_paths[chunk.index], fps)
+                       for chunk in chunks}
+            try:
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index, frames, seconds = future.result()
+                        done += frames
+                        logger.info(f"Chunk {index}: {frames} frames at {frames / seconds:.1f} fps")
+                        if on_progress is not None:
+                            on_progress(Progress(done, max(frame_count, done), time.monotonic() - started))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        list_path = os.path.join(tmpdir, 'chunks.txt')
+        with open(list_path, 'w') as f:
+            f.writelines(f"file '{path}'\n" for path in chunk_paths if os.path.getsize(path))
+        subprocess.run(concat_command(list_path, input_path, output), check=True)
+        if output != '-':
+            logger.info(f"Wrote {output}")
+
+    progress = Progress(done, done, time.monotonic() - started)
+    logger.info(f"Processed {done} frames in {progress.seconds:.1f}s ({progress.fps:.1f} fps)")
+    return progress
@@ -0,0 +1,283 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import queue
+import re
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIX_FMT = 'yuv420p'
+
+# Pixel formats offered on the command line; anything ffmpeg knows is accepted
+PIXEL_FORMATS = ('yuv420p', 'yuyv422', 'nv12', 'uyvy422', 'rgb24', 'bgr24', 'gray')
+
+
+def device_path(device: str) -> str:
+    """'/dev/videoN' from a GUI device name like 'Dummy video device (/dev/video2)'"""
+    match = re.search(r"\((/dev/video\d+)\)", device)
+    return match.group(1) if match else device
+
+
+def frame_bytes(frame: np.ndarray):
+    """The frame's pixels for a pipe write; a view, not a copy, when it is contiguous"""
+    return memoryview(frame).cast('B') if frame.flags.c_contiguous else frame.tobytes()
+
+
+def output_command(output: str, width: int, height: int, fps: float,
+                   pix_fmt: str = DEFAULT_PIX_FMT, threads: int = 0) -> list:
+    """ffmpeg command reading raw BGR frames on stdin and writing to output.
+
+    ``threads`` limits the encoder's threads (0: ffmpeg's default).
+    """
+    command = [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'bgr24',
+        '-s', f'{width}x{height}',
+        '-r', str(fps),
+        '-i', '-',
+    ]
+    if threads:
+        command += ['-threads', str(threads)]
+    if output.startswith('/dev/video'):
+        return command + ['-f', 'v4l2', '-pix_fmt', pix_fmt, output]
+    return command + ['-pix_fmt', pix_fmt, '-y', output]
+
+
+def recording_command(path: str, width: int, height: int, fps: float,
+                      pix_fmt: str = DEFAULT_PIX_FMT) -> list:
+    """ffmpeg command encoding raw BGR frames to a file at a constant rate.
+
+    Frames are timestamped when ffmpeg reads them, and gaps left by
+    dropped frames are filled by repeating the previous one, so the
+    recording keeps real time.
+    """
+    return [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-use_wallclock_as_timestamps', '1',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'bgr24',
+        '-s', f'{width}x{height}',
+        '-i', '-',
+        '-vsync', 'cfr',
+        '-r', str(fps),
+        '-pix_fmt', pix_fmt,
+        '-y', path,
+    ]
+
+
+def parse_output(spec: str) -> Tuple[str, Optional[Tuple[int, int]], str]:
+    """'PATH[:WIDTHxHEIGHT][:PIX_FMT]' into (path, size or None, pixel format)"""
+    parts = spec.split(':')
+    size = None
+    pix_fmt = DEFAULT_PIX_FMT
+    while len(parts) > 1:
+        if re.fullmatch(r'\d+x\d+', parts[-1]):
+            size = tuple(map(int, parts.pop().split('x')))
+        elif re.fullmatch(r'[a-z0-9]+', parts[-1]) and parts[-1] in PIXEL_FORMATS:
+            pix_fmt = parts.pop()
+        else:
+            break
+    return ':'.join(parts), size, pix_fmt
+
+
+def pyramid(frame: np.ndarray, sizes: List[Tuple[int, int]]) -> Dict[Tuple[int, int], np.ndarray]:
+    """The frame at each size, each derived from the smallest larger one.
+
+    Halvings use cv2.pyrDown, and only the last step is an INTER_AREA
+    resize, so a 360p output made from 1080p costs about as much as
+    reading the 1080p frame once.
+    """
+    height, width = frame.shape[:2]
+    levels = {(width, height): frame}
+    for size in sorted(set(sizes), key=lambda s: s[0] * s[1], reverse=True):
+        if size in levels:
+            continue
+        larger = [level for level in levels if level[0] >= size[0] and level[1] >= size[1]]
+        if not larger:
+            levels[size] = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+            continue
+        image = levels[min(larger, key=lambda s: s[0] * s[1])]
+        while image.shape[1] >= size[0] * 2 and image.shape[0] >= size[1] * 2:
+            image = cv2.pyrDown(image)
+        if (image.shape[1], image.shape[0]) != size:
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        levels[size] = image
+    return levels
+
+
+class OutputSink:
+    """One ffmpeg output fed by its own writer thread.
+
+    ``submit()`` puts the frame in a single slot and returns at once; the
+    writer empties the slot when it takes the frame. In realtime mode a
+    frame still in the slot is replaced by the next one (counted in
+    ``dropped``), so a consumer that stalls this sink holds up neither the
+    pipeline nor the other sinks. Otherwise ``submit()`` waits for the
+    slot to empty, so file outputs get every frame.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int], fps: float,
+                 pix_fmt: str = DEFAULT_PIX_FMT, realtime: bool = True):
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.realtime = realtime
+        self.condition = threading.Condition()
+        self.frame = None
+        self.closing = False
+        self.written = 0
+        self.dropped = 0
+        self.stalls = 0
+        self.error = None
+        self.process = subprocess.Popen(
+            output_command(path, size[0], size[1], fps, pix_fmt), stdin=subprocess.PIPE
+        )
+        self.thread = threading.Thread(target=self._writer_loop, name=f'vidmask-output-{path}', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame: np.ndarray):
+        with self.condition:
+            if self.frame is not None:
+                if self.realtime:
+                    self.dropped += 1
+                else:
+                    self.condition.wait_for(lambda: self.frame is None or self.error is not None)
+            if self.error is not None:
+                raise self.error
+            self.frame = frame
+            self.condition.notify_all()
+
+    def _writer_loop(self):
+        period = 1.0 / self.fps
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.frame is not None or self.closing)
+                frame = self.frame
+                if frame is None:
+                    return
+                self.frame = None
+                self.condition.notify_all()
+            start = time.monotonic()
+            try:
+                self.process.stdin.write(frame_bytes(frame))
+            except (BrokenPipeError, OSError) as e:
+                logger.error(f"Output {self.path} failed: {e}")
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                return
+            if time.monotonic() - start > period:
+                # The consumer couldn't take the frame within one frame period
+                self.stalls += 1
+            self.written += 1
+
+    def close(self):
+        """Write the pending frame, then stop ffmpeg"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+class OutputFanout:
+    """The composited stream sent to several sinks, each at its own size and format"""
+
+    def __init__(self, sinks: List[OutputSink]):
+        self.sinks = sinks
+        self.sizes = [sink.size for sink in sinks]
+
+    def write(self, frame: np.ndarray):
+        levels = pyramid(frame, self.sizes)
+        for sink in self.sinks:
+            sink.submit(levels[sink.size])
+
+    def counters(self) -> Dict[str, int]:
+        return {
+            'output_drops': sum(sink.dropped for sink in self.sinks),
+            'output_stalls': sum(sink.stalls for sink in self.sinks),
+        }
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class RecordingSink:
+    """The processed stream encoded to a file next to the live outputs.
+
+    ``submit()`` never blocks: frames wait in a queue of ``queue_frames``
+    for a writer thread feeding a niced ffmpeg. If the encoder falls
+    behind and the queue is full, the frame is dropped from the recording
+    only, and the drop is written to ``<path>.drops.log``. The queue holds
+    the same arrays that were sent to the live outputs. Compositing
+    creates a new array for every frame, so no copy is needed.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int], fps: float,
+                 pix_fmt: str = DEFAULT_PIX_FMT, queue_frames: int = 30):
+        self.path = path
+        self.size = size
+        self.queue = queue.Queue(maxsize=queue_frames)
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.started = time.monotonic()
+        self.drop_log = open(f'{path}.drops.log', 'w')
+        # Niced so the live outputs come first when the CPU is short
+        self.process = subprocess.Popen(
+            ['nice', '-n', '10'] + recording_command(path, size[0], size[1], fps, pix_fmt), stdin=subprocess.PIPE
+        )
+        self.thread = threading.Thread(target=self._writer_loop, name='vidmask-recording', daemon=True)
+        self.thread.start()
+        logger.info(f"Recording output to {path}")
+
+    def submit(self, frame: np.ndarray):
+        index = self.submitted
+        self.submitted += 1
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            self.drop_log.write(f"{time.monotonic() - self.started:.3f}s frame {index}: "
+                                f"encoder queue full ({self.queue.maxsize} frames)\n")
+
+    def _writer_loop(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            try:
+                self.process.stdin.write(frame_bytes(frame))
+            except (BrokenPipeError, OSError) as e:
+                logger.error(f"Recording to {self.path} failed: {e}")
+                # Keep draining so submit() drops instead of the queue filling for good
+                while self.queue.get() is not None:
+                    pass
+                return
+            self.written += 1
+
+    def close(self):
+        """Encode what is queued, then finish the file"""
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        self.drop_log.write(f"{self.submitted} frames, {self.written} recorded, {self.dropped} dropped\n")
+        self.drop_log.close()
+        logger.info(f"Recorded {self.written} frames to {self.path} ({self.dropped} dropped)")
@@ -1,14 +1,20 @@
 import cv2
 import numpy as np
-import mediapipe as mp
 from typing import Optional, Tuple
 import queue
+import logging
+from .metrics import PipelineMetrics
+from .segmentation import create_backend
+
+logger = logging.getLogger(__name__)
 
 class Processor:
-    def __init__(self):
-        # MediaPipe components
-        self.mp_selfie_segmentation = mp.solutions.selfie_segmentation
-        self.selfie_segmentation = self.mp_selfie_segmentation.SelfieSegmentation(model_selection=1)
+    def __init__(self, backend: str = 'auto', **backend_options):
+        # Segmentation backend (see core.segmentation)
+        self.backend_name = backend
+        self.backend_options = backend_options
+        self.segmentation = create_backend(backend, **backend_options)
+        self.frame_timestamp = 0
         
         # Processing settings
         self.fps = 20.0
@@ -25,17 +31,22 @@ class Processor:
         self.preview_queue = queue.Queue(maxsize=2)
         self.show_preview = True
 
+        # Per-stage timings
+        self.metrics = PipelineMetrics()
+
+        # Segmentation mask of the last processed frame, before smoothing
+        self.last_mask = None
+
     def initialize(self):
-        """Initialize MediaPipe segmentation"""
-        if self.selfie_segmentation is None:
-            self.selfie_segmentation = self.mp_selfie_segmentation.SelfieSegmentation(model_selection=1)
+        """Initialize segmentation"""
+        if self.segmentation is None:
+            self.segmentation = create_backend(self.backend_name, **self.backend_options)
 
     def cleanup(self):
         """Clean up resources"""
-        if self.selfie_segmentation:
-            self.selfie_segmentation.close()
-            self.selfie_segmentation = None
-            self.mp_selfie_segmentation = None
+        if self.segmentation:
+            self.segmentation.close()
+            self.segmentation = None
 
     def set_background(self, path: str) -> bool:
         """Load and set background image"""
@@ -52,7 +63,7 @@ class Processor:
                     return True
             return False
         except Exception as e:
-            print(f"Error loading background: {e}")
+            logger.error(f"Error loading background: {e}")
             return False
 
     def set_resolution(self, width: int, height: int):
@@ -74,30 +85,40 @@ class Processor:
 
     def process_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
         """Process a single frame"""
-        if self.selfie_segmentation is None or self.background_image is None:
+        if self.segmentation is None or self.background_image is None:
             return frame
 
+        metrics = self.metrics
+        metrics.begin_frame()
         try:
             # Resize frame
             width = int(self.resolution[0] * self.scale)
             height = int(self.resolution[1] * self.scale)
             frame = cv2.resize(frame, (width, height))
+            metrics.mark('resize')
 
             # Convert to RGB for MediaPipe
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.selfie_segmentation.process(frame_rgb)
-
-            if results.segmentation_mask is None:
+            metrics.mark('color_convert')
+            self.frame_timestamp += 1
+            mask = self.segmentation.segment(frame_rgb, self.frame_timestamp)
+            metrics.mark('inference')
+            self.last_mask = mask
+
+            if mask is None:
+                metrics.count('empty_masks')
                 return frame
 
-            # Create and smooth mask
-            mask = results.segmentation_mask
+            # Smooth mask
+            if mask.shape[:2] != (height, width):
+                mask = cv2.resize(mask, (width, height))
             mask = cv2.GaussianBlur(
                 mask,
                 (self.smooth_kernel, self.smooth_kernel),
                 sigmaX=self.smooth_sigma,
                 sigmaY=self.smooth_sigma
             )
+            metrics.mark('mask_smoothing')
 
             # Stack mask for BGR image
             mask = np.stack((mask,) * 3, axis=-1)
@@ -105,18 +126,22 @@ class Processor:
             # Combine foreground and background
             output_frame = (frame * mask + 
                           self.background_image * (1 - mask)).astype(np.uint8)
+            metrics.mark('composite')
 
             # Add to preview queue if enabled
             if self.show_preview:
                 try:
                     self.preview_queue.put_nowait(output_frame.copy())
                 except queue.Full:
-                    pass
+                    metrics.count('preview_drops')
+            metrics.mark('preview_handoff')
+            metrics.end_frame()
 
             return output_frame
 
         except Exception as e:
-            print(f"Error processing frame: {e}")
+            logger.error(f"Error processing frame: {e}")
+            metrics.count('errors')
             return frame
 
     def get_preview_frame(self) -> Optional[np.ndarray]:
@@ -0,0 +1,227 @@
+from typing import Callable, Dict, List, Optional
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+from .mjpeg import is_encoded
+from .sources import FrameSource, parse_size
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# One row per recorded frame; channels == 0 marks an undecoded MJPEG buffer
+INDEX_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('offset', '<i8'),
+    ('length', '<i8'),
+    ('height', '<i4'),
+    ('width', '<i4'),
+    ('channels', '<i4'),
+])
+
+
+class SessionRecorder:
+    """Record raw input frames and settings changes into a session directory.
+
+    Layout of ``<name>.vmrec/``:
+      - ``frames.bin``: frame payloads back to back (raw BGR pixels, or the
+        camera's MJPEG bitstream when capturing in raw mode)
+      - ``index.npy``: per-frame time, offset, length and shape
+      - ``session.json``: initial settings and the timeline of changes
+
+    Frames can be recorded from the pipeline thread while settings changes
+    come from the GUI thread. ``record_frame()`` never blocks: frames wait
+    in a queue of ``queue_frames`` for a writer thread, and are dropped
+    from the recording (counted in ``dropped``) if the disk falls behind.
+    """
+
+    def __init__(self, path: str, settings: Optional[Dict] = None, max_bytes: int = 4 * 1024 ** 3,
+                 queue_frames: int = 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.initial_settings = dict(settings or {})
+        self.settings_changes: List[Dict] = []
+        self.index: List[tuple] = []
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=queue_frames)
+        self.thread = None
+        # Frames accepted into the queue, and their size
+        self.frames_queued = 0
+        self.bytes_queued = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.start_time = None
+        self.frames_file = None
+        self.full = False
+
+    def start(self):
+        """Create the session directory and start accepting frames"""
+        os.makedirs(self.path, exist_ok=True)
+        self.frames_file = open(os.path.join(self.path, 'frames.bin'), 'wb')
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self._writer_loop, name='vidmask-session-recording', daemon=True)
+        self.thread.start()
+        logger.info(f"Recording session to {self.path}")
+
+    @property
+    def recording(self) -> bool:
+        return self.frames_file is not None
+
+    def record_frame(self, frame: np.ndarray, timestamp: Optional[float] = None):
+        """Append a raw input frame; timestamp is time.monotonic()"""
+        if self.frames_file is None or self.full:
+            return
+        if is_encoded(frame):
+            frame = frame.ravel()
+        data = np.ascontiguousarray(frame)
+        if self.bytes_queued + data.nbytes > self.max_bytes:
+            logger.warning(f"Session recording reached {self.max_bytes} bytes, no longer recording frames")
+            self.full = True
+            return
+        with self.lock:
+            if self.frames_file is None:
+                return
+            try:
+                self.queue.put_nowait((data, (timestamp or time.monotonic()) - self.start_time))
+            except queue.Full:
+                self.dropped += 1
+                return
+            self.frames_queued += 1
+            self.bytes_queued += data.nbytes
+
+    def _writer_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            data, elapsed = item
+            if data.ndim == 1:
+                height, width, channels = 0, 0, 0
+            else:
+                height, width = data.shape[:2]
+                channels = data.shape[2] if data.ndim == 3 else 1
+            self.frames_file.write(memoryview(data).cast('B'))
+            self.index.append((elapsed, self.bytes_written, data.nbytes, height, width, channels))
+            self.bytes_written += data.nbytes
+
+    def record_settings(self, changes: Dict):
+        """Record settings that take effect from the next recorded frame"""
+        if self.frames_file is None:
+            return
+        with self.lock:
+            if self.frames_file is None:
+                return
+            self.settings_changes.append({
+                'frame': self.frames_queued,
+                'time': time.monotonic() - self.start_time,
+                'changes': dict(changes),
+            })
+
+    def stop(self):
+        """Finish the recording and write the index"""
+        if self.frames_file is None:
+            return
+        with self.lock:
+            # Write what is queued; record_frame() adds nothing once the lock is released
+            self.queue.put(None)
+            self.thread.join()
+            self.frames_file.close()
+            self.frames_file = None
+            np.save(os.path.join(self.path, 'index.npy'), np.array(self.index, dtype=INDEX_DTYPE))
+            with open(os.path.join(self.path, 'session.json'), 'w') as f:
+                json.dump({
+                    'version': FORMAT_VERSION,
+                    'frames': len(self.index),
+                    'settings': self.initial_settings,
+                    'settings_changes': self.settings_changes,
+                }, f, indent=4)
+        logger.info(f"Recorded {len(self.index)} frames ({self.bytes_written / 1024 ** 2:.1f} MB) to {self.path}"
+                    + (f", {self.dropped} dropped" if self.dropped else ""))
+
+
+class Session:
+    """A recorded session opened for reading, with frames memory-mapped"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'session.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format: {meta.get('version')}")
+        self.settings = meta.get('settings', {})
+        self.settings_changes = meta.get('settings_changes', [])
+        self.index = np.load(os.path.join(path, 'index.npy'))
+        frames_path = os.path.join(path, 'frames.bin')
+        self.data = np.memmap(frames_path, dtype=np.uint8, mode='r') if os.path.getsize(frames_path) else None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def frame(self, i: int) -> np.ndarray:
+        """Frame i as a read-only view into the mapped file"""
+        entry = self.index[i]
+        data = self.data[entry['offset']:entry['offset'] + entry['length']]
+        if entry['channels'] == 0:
+            return data
+        return data.reshape(entry['height'], entry['width'], entry['channels'])
+
+    def changes_for_frame(self, i: int) -> List[Dict]:
+        """Settings changes that take effect at frame i"""
+        return [change['changes'] for change in self.settings_changes if change['frame'] == i]
+
+
+class ReplaySource(FrameSource):
+    """Feed a recorded session back through the pipeline.
+
+    With ``realtime=True`` frames are delivered on their recorded schedule;
+    otherwise as fast as they are read. ``on_settings`` is called with each
+    recorded settings change just before the frame it applies to is
+    returned, so replays are deterministic regardless of speed.
+
+    Sessions recorded from a camera in raw mode hold MJPEG bitstreams;
+    ``raw_mjpeg`` is set for them and frames are returned undecoded, like
+    a raw-mode Camera.
+    """
+
+    def __init__(self, path: str, realtime: bool = True,
+                 on_settings: Optional[Callable[[Dict], None]] = None):
+        super().__init__(paced=False, loop=False)
+        self.session = Session(path)
+        self.realtime = realtime
+        self.on_settings = on_settings
+        self.replay_start = None
+        first = self.session.index[0] if len(self.session) else None
+        self.raw_mjpeg = first is not None and first['channels'] == 0
+        if first is not None and first['channels']:
+            self.resolution = (int(first['width']), int(first['height']))
+        elif self.session.settings.get('resolution'):
+            # Encoded frames carry no shape in the index; the camera was set to this
+            self.resolution = parse_size(self.session.settings['resolution'])
+        if len(self.session) > 1:
+            duration = self.session.index['time'][-1] - self.session.index['time'][0]
+            if duration > 0:
+                self.fps = (len(self.session) - 1) / duration
+
+    def start(self):
+        super().start()
+        self.replay_start = time.monotonic()
+        if self.on_settings is not None and self.session.settings:
+            self.on_settings(dict(self.session.settings))
+
+    def _next_frame(self) -> Optional[np.ndarray]:
+        i = self.frame_index
+        if i >= len(self.session):
+            return None
+        if self.realtime:
+            due = self.replay_start + self.session.index['time'][i] - self.session.index['time'][0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if self.on_settings is not None:
+            for changes in self.session.changes_for_frame(i):
+                self.on_settings(changes)
+        return self.session.frame(i)
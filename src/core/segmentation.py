@@ -0,0 +1,459 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Landscape selfie segmenter for the Tasks API, same network as the legacy model_selection=1
+DEFAULT_MODEL = 'selfie_segmenter_landscape.tflite'
+
+MODEL_URL = ('https://storage.googleapis.com/mediapipe-models/image_segmenter/'
+             'selfie_segmenter_landscape/float16/latest/selfie_segmenter_landscape.tflite')
+
+
+def model_url(name: str) -> str:
+    """Download URL of a MediaPipe selfie segmenter model"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return MODEL_URL.replace('selfie_segmenter_landscape', stem)
+
+# Person segmentation model for the ONNX Runtime / OpenCV DNN backends: the
+# same selfie network exported to ONNX (NHWC 256x256 RGB in [0, 1])
+DEFAULT_ONNX_MODEL = 'selfie_segmentation.onnx'
+
+
+def model_dirs() -> List[str]:
+    """Directories searched for model files, in order"""
+    dirs = []
+    if os.environ.get('VIDMASK_MODEL_DIR'):
+        dirs.append(os.environ['VIDMASK_MODEL_DIR'])
+    dirs.append(os.path.expanduser('~/.local/share/vidmask/models'))
+    dirs.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models'))
+    return dirs
+
+
+def find_model(name: str = DEFAULT_MODEL) -> Optional[str]:
+    """Path of a model file, or None if it isn't installed"""
+    if os.path.isabs(name):
+        return name if os.path.isfile(name) else None
+    for directory in model_dirs():
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class SegmentationBackend(ABC):
+    """Person segmentation producing a float32 mask (1.0 = person).
+
+    ``submit()`` hands over an RGB frame tagged with a strictly increasing
+    timestamp in ms and may return before inference finishes; ``result()``
+    waits for the mask of that timestamp. This lets the caller do other
+    work for the frame while inference runs. Masks may be at a lower
+    resolution than the frame.
+    """
+
+    name = 'base'
+
+    # Frames segment_batch() runs as one inference
+    max_batch = 1
+
+    @abstractmethod
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        """Start inference on a frame; the mask is collected with result()"""
+
+    @abstractmethod
+    def result(self, timestamp_ms: int, timeout: float = 1.0) -> Optional[np.ndarray]:
+        """Mask for the frame submitted with timestamp_ms, or None if it was dropped"""
+
+    def segment(self, frame_rgb: np.ndarray, timestamp_ms: int) -> Optional[np.ndarray]:
+        """Synchronous submit() + result()"""
+        self.submit(frame_rgb, timestamp_ms)
+        return self.result(timestamp_ms)
+
+    def segment_batch(self, frames_rgb: List[np.ndarray], timestamps_ms: List[int]) -> List[Optional[np.ndarray]]:
+        """Masks for several frames; one by one unless the backend can batch them"""
+        return [self.segment(frame_rgb, timestamp_ms) for frame_rgb, timestamp_ms in zip(frames_rgb, timestamps_ms)]
+
+    def close(self):
+        pass
+
+
+class LegacySelfieBackend(SegmentationBackend):
+    """mp.solutions.selfie_segmentation; runs inference inside submit()"""
+
+    name = 'legacy'
+
+    def __init__(self, model_selection: int = 1):
+        import mediapipe as mp
+        if not hasattr(mp, 'solutions'):
+            raise RuntimeError(f"This MediaPipe ({mp.__version__}) has no legacy solutions; "
+                               f"install {DEFAULT_MODEL} to use the Tasks segmenter ({MODEL_URL})")
+        self.segmentation = mp.solutions.selfie_segmentation.SelfieSegmentation(model_selection=model_selection)
+        self.timestamp = None
+        self.mask = None
+
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        results = self.segmentation.process(frame_rgb)
+        self.timestamp = timestamp_ms
+        self.mask = results.segmentation_mask
+
+    def result(self, timestamp_ms: int, timeout: float = 1.0) -> Optional[np.ndarray]:
+        return self.mask if timestamp_ms == self.timestamp else None
+
+    def close(self):
+        if self.segmentation is not None:
+            self.segmentation.close()
+            self.segmentation = None
+
+
+class TasksSegmenterBackend(SegmentationBackend):
+    """MediaPipe Tasks ImageSegmenter in LIVE_STREAM mode.
+
+    Frames are queued with ``segment_async()`` and masks arrive on a
+    MediaPipe thread through the result callback, keyed by timestamp.
+    When the graph is busy it may skip frames; ``result()`` notices that
+    a later timestamp has completed and returns None instead of waiting
+    for a result that will never come.
+    """
+
+    name = 'tasks'
+
+    # Completed results kept for callers that fall behind
+    MAX_PENDING = 8
+
+    def __init__(self, model_path: str):
+        import mediapipe as mp
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision
+
+        self.mp = mp
+        self.results: Dict[int, np.ndarray] = {}
+        self.latest_completed = -1
+        self.condition = threading.Condition()
+        options = vision.ImageSegmenterOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            output_confidence_masks=True,
+            output_category_mask=False,
+            result_callback=self._on_result,
+        )
+        self.segmenter = vision.ImageSegmenter.create_from_options(options)
+        self.last_timestamp = -1
+
+    def _on_result(self, result, image, timestamp_ms: int):
+        mask = None
+        if result.confidence_masks:
+            # Person confidence is the last mask; copy out of MediaPipe's buffer
+            mask = np.array(result.confidence_masks[-1].numpy_view(), dtype=np.float32)
+            if mask.ndim == 3:
+                mask = mask[:, :, 0]
+        with self.condition:
+            self.results[timestamp_ms] = mask
+            self.latest_completed = max(self.latest_completed, timestamp_ms)
+            while len(self.results) > self.MAX_PENDING:
+                del self.results[min(self.results)]
+            self.condition.notify_all()
+
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        if timestamp_ms <= self.last_timestamp:
+            raise ValueError(f"Timestamps must increase: {timestamp_ms} after {self.last_timestamp}")
+        self.last_timestamp = timestamp_ms
+        image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=np.ascontiguousarray(frame_rgb))
+        self.segmenter.segment_async(image, timestamp_ms)
+
+    def result(self, timestamp_ms: int, timeout: float = 1.0) -> Optional[np.ndarray]:
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while timestamp_ms not in self.results and self.latest_completed < timestamp_ms:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.results.pop(timestamp_ms, None)
+
+    def close(self):
+        if self.segmenter is not None:
+            self.segmenter.close()
+            self.segmenter = None
+
+
+class OnnxModelBackend(SegmentationBackend):
+    """Shared preprocessing for ONNX models run on the CPU.
+
+    The input tensor is allocated once; each frame is resized into a
+    preallocated uint8 buffer and normalized into the tensor in place, so
+    steady-state preprocessing does no allocation. Inference runs on a
+    worker thread (both runtimes release the GIL), so ``submit()`` returns
+    as soon as the tensor is filled. Models with a dynamic batch
+    dimension take up to ``MAX_BATCH`` frames per ``segment_batch()``.
+    """
+
+    MAX_BATCH = 4
+
+    def __init__(self, model_path: str, input_shape: Sequence[Optional[int]],
+                 input_size: Tuple[int, int] = (256, 256),
+                 mean: Sequence[float] = (0.0, 0.0, 0.0), std: Sequence[float] = (1.0, 1.0, 1.0)):
+        self.model_path = model_path
+        # Channels-first if dimension 1 is the 3 colour channels
+        self.channels_first = len(input_shape) == 4 and input_shape[1] == 3
+        dims = input_shape[2:4] if self.channels_first else input_shape[1:3]
+        height, width = (d if isinstance(d, int) and d > 0 else None for d in dims)
+        self.input_size = (width or input_size[0], height or input_size[1])
+        width, height = self.input_size
+        self.resized = np.empty((height, width, 3), dtype=np.uint8)
+        shape = (1, 3, height, width) if self.channels_first else (1, height, width, 3)
+        self.tensor = np.empty(shape, dtype=np.float32)
+        batch = input_shape[0] if input_shape else 1
+        if not (isinstance(batch, int) and batch > 0):
+            self.max_batch = self.MAX_BATCH
+        self.batch_tensors: Dict[int, np.ndarray] = {}
+        # x / 255 then (x - mean) / std, folded into one multiply-add
+        std = np.asarray(std, dtype=np.float32)
+        self.gain = (1.0 / (255.0 * std)).astype(np.float32)
+        self.bias = (-np.asarray(mean, dtype=np.float32) / std).astype(np.float32)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vidmask-inference')
+        self.pending: Optional[Future] = None
+        self.pending_timestamp = None
+
+    def preprocess(self, frame_rgb: np.ndarray, sample: Optional[np.ndarray] = None):
+        """Fill one sample of an input tensor (the single-frame tensor by default)"""
+        import cv2
+        sample = self.tensor[0] if sample is None else sample
+        cv2.resize(frame_rgb, self.input_size, dst=self.resized, interpolation=cv2.INTER_AREA)
+        if self.channels_first:
+            for channel in range(3):
+                plane = sample[channel]
+                np.multiply(self.resized[:, :, channel], self.gain[channel], out=plane)
+                plane += self.bias[channel]
+        else:
+            np.multiply(self.resized, self.gain, out=sample)
+            sample += self.bias
+
+    @abstractmethod
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        """Model output for an input tensor"""
+
+    def _infer(self) -> Optional[np.ndarray]:
+        return person_mask(self.run(self.tensor), self.channels_first)
+
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        if self.pending is not None:
+            # The tensor is still in use by the previous frame
+            self.pending.result()
+        self.preprocess(frame_rgb)
+        self.pending = self.executor.submit(self._infer)
+        self.pending_timestamp = timestamp_ms
+
+    def result(self, timestamp_ms: int, timeout: float = 1.0) -> Optional[np.ndarray]:
+        if self.pending is None or self.pending_timestamp != timestamp_ms:
+            return None
+        try:
+            return self.pending.result(timeout)
+        except TimeoutError:
+            return None
+        finally:
+            if self.pending.done():
+                self.pending = None
+
+    def segment_batch(self, frames_rgb: List[np.ndarray], timestamps_ms: List[int]) -> List[Optional[np.ndarray]]:
+        if len(frames_rgb) == 1 or len(frames_rgb) > self.max_batch:
+            return super().segment_batch(frames_rgb, timestamps_ms)
+        if self.pending is not None:
+            self.pending.result()
+            self.pending = None
+        count = len(frames_rgb)
+        tensor = self.batch_tensors.get(count)
+        if tensor is None:
+            tensor = self.batch_tensors[count] = np.empty((count,) + self.tensor.shape[1:], dtype=np.float32)
+        for i, frame_rgb in enumerate(frames_rgb):
+            self.preprocess(frame_rgb, tensor[i])
+        output = self.executor.submit(self.run, tensor).result()
+        return [person_mask(output[i:i + 1], self.channels_first) for i in range(count)]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def person_mask(output: np.ndarray, channels_first: bool) -> Optional[np.ndarray]:
+    """Person probability from a model output of shape (1, [C,] H, W[, C])"""
+    output = output[0]
+    if output.ndim == 3:
+        if not channels_first and output.shape[-1] <= 4:
+            output = np.moveaxis(output, -1, 0)
+        if output.shape[0] == 2:
+            # Background/person logits
+            shifted = np.exp(output - output.max(axis=0))
+            output = shifted[1] / shifted.sum(axis=0)
+        else:
+            output = output[-1]
+    if output.min() < 0.0 or output.max() > 1.0:
+        # Single-channel logits
+        output = 1.0 / (1.0 + np.exp(-output))
+    return np.ascontiguousarray(output, dtype=np.float32)
+
+
+class OnnxRuntimeBackend(OnnxModelBackend):
+    """ONNX Runtime CPU session with explicit thread counts.
+
+    ``intra_op_threads`` parallelizes single operators and
+    ``inter_op_threads`` runs independent graph branches concurrently;
+    0 leaves the choice to ONNX Runtime.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0, **kwargs):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1
+                                  else ort.ExecutionMode.ORT_SEQUENTIAL)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        super().__init__(model_path, model_input.shape, **kwargs)
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        return self.session.run([self.output_name], {self.input_name: tensor})[0]
+
+
+class OpenCvDnnBackend(OnnxModelBackend):
+    """OpenCV DNN on the CPU; thread count is process-wide (cv2.setNumThreads)"""
+
+    name = 'dnn'
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0, **kwargs):
+        import cv2
+
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        if intra_op_threads > 0:
+            cv2.setNumThreads(intra_op_threads)
+        super().__init__(model_path, _onnx_input_shape(model_path), **kwargs)
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        self.net.setInput(tensor)
+        return self.net.forward()
+
+
+def _onnx_input_shape(model_path: str) -> Sequence[Optional[int]]:
+    """Input shape declared in an ONNX file (None for dynamic dimensions)"""
+    try:
+        import onnx
+    except ImportError:
+        # Without the onnx package assume the default NHWC selfie model layout
+        return (1, None, None, 3)
+    model = onnx.load(model_path, load_external_data=False)
+    initializers = {init.name for init in model.graph.initializer}
+    model_input = next(i for i in model.graph.input if i.name not in initializers)
+    return tuple(d.dim_value or None for d in model_input.type.tensor_type.shape.dim)
+
+
+def quantized_model(model_path: str) -> str:
+    """int8 version of an ONNX model, quantized on first use and cached next to the user's models"""
+    stem, ext = os.path.splitext(os.path.basename(model_path))
+    if stem.endswith('_int8'):
+        return model_path
+    name = f'{stem}_int8{ext}'
+    existing = find_model(name)
+    if existing is not None:
+        return existing
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    target = os.path.join(os.path.expanduser('~/.local/share/vidmask/models'), name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    logger.info(f"Quantizing {model_path} to int8")
+    quantize_dynamic(model_path, target, weight_type=QuantType.QUInt8)
+    return target
+
+
+def create_backend(name: str = 'auto', model_path: Optional[str] = None,
+                   intra_op_threads: int = 0, inter_op_threads: int = 0,
+                   int8: bool = False, model_selection: int = 1) -> SegmentationBackend:
+    """Create a backend by name.
+
+    'tasks' and 'legacy' are MediaPipe; 'onnx' (ONNX Runtime) and 'dnn'
+    (OpenCV DNN) run an ONNX model with the given thread counts, int8
+    quantized if requested. 'auto' is tasks if its model is installed,
+    else legacy. ``model_selection`` picks the legacy model (0 general,
+    1 landscape).
+    """
+    if name in ('onnx', 'dnn'):
+        path = find_model(model_path or DEFAULT_ONNX_MODEL)
+        if path is None:
+            raise RuntimeError(f"Segmentation model not found: {model_path or DEFAULT_ONNX_MODEL} "
+                               f"(searched {', '.join(model_dirs())})")
+        if int8:
+            path = quantized_model(path)
+        backend_class = OnnxRuntimeBackend if name == 'onnx' else OpenCvDnnBackend
+        backend = backend_class(path, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+        logger.info(f"Segmentation: {name} ({path}, {backend.input_size[0]}x{backend.input_size[1]}, "
+                    f"threads {intra_op_threads or 'auto'}/{inter_op_threads or 'auto'})")
+        return backend
+
+    if name in ('auto', 'tasks'):
+        path = find_model(model_path or DEFAULT_MODEL)
+        if path is not None:
+            try:
+                backend = TasksSegmenterBackend(path)
+                logger.info(f"Segmentation: MediaPipe Tasks ({path})")
+                return backend
+            except (ImportError, RuntimeError, ValueError) as e:
+                if name == 'tasks':
+                    raise
+                logger.warning(f"MediaPipe Tasks segmenter unavailable, using legacy: {e}")
+        elif name == 'tasks':
+            raise RuntimeError(f"Segmentation model not found: {model_path or DEFAULT_MODEL} "
+                               f"(searched {', '.join(model_dirs())}; "
+                               f"download from {model_url(model_path or DEFAULT_MODEL)})")
+    elif name != 'legacy':
+        raise ValueError(f"Unknown segmentation backend: {name}")
+
+    backend = LegacySelfieBackend(model_selection)
+    logger.info(f"Segmentation: MediaPipe legacy selfie segmentation (model {model_selection})")
+    return backend
+
+
+class ModelSpec(NamedTuple):
+    """A segmentation model on a specific backend.
+
+    ``accuracy`` only ranks models against each other (higher is better);
+    equal values mean the same network on different runtimes.
+    """
+    name: str
+    backend: str
+    model: Optional[str]
+    accuracy: int
+    input_size: Tuple[int, int]
+    model_selection: int = 1
+
+    def create(self, intra_op_threads: int = 0, inter_op_threads: int = 0,
+               int8: bool = False) -> SegmentationBackend:
+        return create_backend(self.backend, self.model, intra_op_threads, inter_op_threads,
+                              int8, self.model_selection)
+
+
+# Models the automatic selection chooses from, most accurate first
+MODELS = (
+    ModelSpec('selfie-general', 'tasks', 'selfie_segmenter.tflite', 2, (256, 256)),
+    ModelSpec('selfie-general-onnx', 'onnx', DEFAULT_ONNX_MODEL, 2, (256, 256)),
+    ModelSpec('selfie-general-dnn', 'dnn', DEFAULT_ONNX_MODEL, 2, (256, 256)),
+    ModelSpec('legacy-general', 'legacy', None, 2, (256, 256), model_selection=0),
+    ModelSpec('selfie-landscape', 'tasks', DEFAULT_MODEL, 1, (256, 144)),
+    ModelSpec('legacy-landscape', 'legacy', None, 1, (256, 144), model_selection=1),
+)
+
+
+def model_spec(name: str) -> Optional[ModelSpec]:
+    return next((spec for spec in MODELS if spec.name == name), None)
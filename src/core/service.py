@@ -0,0 +1,273 @@
+from typing import Dict, Optional
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from .engine import DEFAULT_SETTINGS, PipelineEngine
+from .ipc import ControlClient, ControlServer, PreviewSlot, default_socket_path
+from .metrics_server import metrics_server_from_env
+from .settings import SettingsStore
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineService:
+    """Pipeline process controlled over a Unix socket.
+
+    Runs a PipelineEngine and publishes its output to a shared-memory
+    PreviewSlot. Clients (the GUI, ``vidmask ctl``) only send commands
+    and read the slot, so a client that hangs or exits has no effect on
+    the virtual camera. The service exits once the engine is stopped and
+    no client has been connected for ``linger`` seconds.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, socket_path: Optional[str] = None,
+                 linger: float = 5.0):
+        self.settings = SettingsStore(dict(DEFAULT_SETTINGS, show_preview=True, **(settings or {})))
+        self.socket_path = socket_path or default_socket_path()
+        self.linger = linger
+        self.engine = PipelineEngine(self.settings)
+        self.engine.on_error = self.handle_error
+        self.engine.prewarm()
+        self.preview_slot = PreviewSlot(create=True)
+        self.last_error = None
+        self.running = False
+        self.server = ControlServer(self.socket_path, {
+            'status': self.cmd_status,
+            'set': self.cmd_set,
+            'start': self.cmd_start,
+            'stop': self.cmd_stop,
+            'metrics': self.cmd_metrics,
+            'trace': self.cmd_trace,
+            'record': self.cmd_record,
+            'shutdown': self.cmd_shutdown,
+        })
+        self.update_preview_target()
+
+    def handle_error(self, message: str):
+        self.last_error = message
+
+    def update_preview_target(self):
+        self.engine.preview_queue = self.preview_slot if self.settings.snapshot().get('show_preview') else None
+
+    def cmd_status(self, request: Dict) -> Dict:
+        return {
+            'running': self.engine.running,
+            'error': self.last_error,
+            'preview': self.preview_slot.name,
+            'pid': os.getpid(),
+            'settings': self.settings.snapshot().as_dict(),
+        }
+
+    def cmd_set(self, request: Dict) -> Dict:
+        self.settings.update(request.get('settings', {}))
+        self.update_preview_target()
+        return {}
+
+    def cmd_start(self, request: Dict) -> Dict:
+        if 'settings' in request:
+            self.cmd_set(request)
+        self.last_error = None
+        self.engine.start()
+        return self.cmd_status(request)
+
+    def cmd_stop(self, request: Dict) -> Dict:
+        self.engine.stop(wait=True)
+        return self.cmd_status(request)
+
+    def cmd_metrics(self, request: Dict) -> Dict:
+        return {
+            'summary': self.engine.metrics.summary(),
+            'thread_ids': dict(self.engine.metrics.thread_ids),
+            'pid': os.getpid(),
+        }
+
+    def cmd_trace(self, request: Dict) -> Dict:
+        action = request.get('action')
+        tracer = self.engine.tracer
+        if action == 'start':
+            tracer.start()
+        elif action == 'stop':
+            tracer.stop()
+        elif action == 'dump':
+            return {'spans': tracer.dump(request['path'])}
+        else:
+            raise ValueError(f"Unknown trace action: {action}")
+        return {}
+
+    def cmd_record(self, request: Dict) -> Dict:
+        action = request.get('action')
+        if action == 'start':
+            self.engine.start_recording(request['path'], request.get('settings'))
+        elif action == 'stop':
+            self.engine.stop_recording()
+        elif action == 'settings':
+            self.engine.record_settings(request['changes'])
+        elif action == 'start_output':
+            self.engine.start_output_recording(request['path'])
+        elif action == 'stop_output':
+            self.engine.stop_output_recording()
+        else:
+            raise ValueError(f"Unknown record action: {action}")
+        return {}
+
+    def cmd_shutdown(self, request: Dict) -> Dict:
+        self.running = False
+        return {}
+
+    def serve(self):
+        """Handle commands until shut down, or until stopped and unattended"""
+        server_thread = threading.Thread(target=self.server.serve_forever, name='vidmask-control', daemon=True)
+        server_thread.start()
+        metrics_server = metrics_server_from_env({'main': self.engine.metrics})
+        if metrics_server is not None:
+            try:
+                metrics_server.start()
+            except OSError as e:
+                logger.error(f"Error starting metrics endpoint: {e}")
+                metrics_server = None
+        logger.info(f"Pipeline service listening on {self.socket_path}")
+
+        self.running = True
+        unattended_since = None
+        try:
+            while self.running:
+                time.sleep(0.2)
+                if self.engine.running or self.server.clients:
+                    unattended_since = None
+                elif unattended_since is None:
+                    unattended_since = time.monotonic()
+                elif time.monotonic() - unattended_since > self.linger:
+                    logger.info("No clients and not running, exiting")
+                    break
+        finally:
+            self.engine.stop(wait=True)
+            self.engine.stop_recording()
+            self.engine.close()
+            self.server.shutdown()
+            self.server.server_close()
+            if metrics_server is not None:
+                metrics_server.stop()
+            self.preview_slot.close()
+
+
+def launch_service(socket_path: Optional[str] = None, timeout: float = 10.0) -> ControlClient:
+    """Connect to the pipeline service, starting it in its own session if needed"""
+    socket_path = socket_path or default_socket_path()
+    try:
+        return ControlClient(socket_path)
+    except OSError:
+        pass
+
+    main_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+    log_dir = os.path.expanduser('~/.cache/vidmask')
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, 'service.log'), 'ab') as log:
+        # New session: closing the GUI or its terminal doesn't signal the pipeline
+        subprocess.Popen(
+            [sys.executable, main_path, 'serve', '--socket', socket_path, '--verbose'],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True
+        )
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return ControlClient(socket_path)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Pipeline service did not start (see {log_dir}/service.log)")
+            time.sleep(0.05)
+
+
+class RemoteMetrics:
+    """PipelineMetrics stand-in that reads the service's metrics"""
+
+    def __init__(self, client: ControlClient):
+        self.client = client
+        self.thread_ids: Dict[str, int] = {}
+        self.pid = None
+
+    def summary(self) -> dict:
+        try:
+            reply = self.client.request('metrics')
+        except (OSError, RuntimeError):
+            return {'enabled': False, 'frames': 0, 'fps': 0.0, 'stages': {},
+                    'frame_ms': {}, 'latency_ms': {}, 'counters': {}, 'gauges': {}}
+        self.thread_ids = reply['thread_ids']
+        self.pid = reply['pid']
+        return reply['summary']
+
+
+class RemoteTracer:
+    """TraceRecorder stand-in; the trace is written by the service"""
+
+    def __init__(self, client: ControlClient):
+        self.client = client
+
+    def start(self):
+        self.client.request('trace', action='start')
+
+    def stop(self):
+        self.client.request('trace', action='stop')
+
+    def dump(self, path: str) -> int:
+        return self.client.request('trace', action='dump', path=os.path.abspath(path))['spans']
+
+
+class RemoteEngine:
+    """Client side of PipelineService with the PipelineEngine interface the GUI uses"""
+
+    def __init__(self, client: ControlClient):
+        self.client = client
+        self.metrics = RemoteMetrics(client)
+        self.tracer = RemoteTracer(client)
+        self.preview_slot = None
+        self.status = {}
+        self.sent_settings = None
+        self.sync()
+
+    @property
+    def running(self) -> bool:
+        return bool(self.status.get('running'))
+
+    def sync(self, settings: Optional[Dict] = None) -> Dict:
+        """Push settings (if changed) and refresh the cached status"""
+        if settings is not None and settings != self.sent_settings:
+            self.client.request('set', settings=settings)
+            self.sent_settings = settings
+        self.status = self.client.request('status')
+        if self.preview_slot is None or self.preview_slot.name != self.status['preview']:
+            self.preview_slot = PreviewSlot(self.status['preview'])
+        return self.status
+
+    def start(self):
+        self.status = self.client.request('start')
+
+    def stop(self):
+        self.status = self.client.request('stop')
+
+    def read_preview(self):
+        return self.preview_slot.read() if self.preview_slot is not None else None
+
+    def start_recording(self, path: str, settings: Optional[Dict] = None):
+        self.client.request('record', action='start', path=os.path.abspath(path), settings=settings)
+
+    def stop_recording(self):
+        self.client.request('record', action='stop')
+
+    def record_settings(self, changes: Dict):
+        self.client.request('record', action='settings', changes=changes)
+
+    def start_output_recording(self, path: str):
+        self.client.request('record', action='start_output', path=os.path.abspath(path))
+
+    def stop_output_recording(self):
+        self.client.request('record', action='stop_output')
+
+    def close(self):
+        """Disconnect; the service keeps running if the camera is on"""
+        if self.preview_slot is not None:
+            self.preview_slot.close()
+        self.client.close()
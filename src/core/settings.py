@@ -0,0 +1,52 @@
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+import threading
+
+
+class SettingsSnapshot:
+    """Immutable set of settings values with the version it was published as"""
+
+    __slots__ = ('version', 'values')
+
+    def __init__(self, version: int, values: Dict[str, Any]):
+        self.version = version
+        self.values = MappingProxyType(dict(values))
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.values)
+
+
+class SettingsStore:
+    """Latest settings, shared between a front end and the pipeline thread.
+
+    Writers (Tk variable traces, control commands) call ``update()``, which
+    publishes a new snapshot with the version incremented. The pipeline
+    calls ``snapshot()`` once per frame; that is a single reference read,
+    so it never blocks and always sees one consistent set of values.
+    Comparing versions tells it when derived values need recomputing.
+    """
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None):
+        self._snapshot = SettingsSnapshot(0, values or {})
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> SettingsSnapshot:
+        return self._snapshot
+
+    def update(self, changes: Dict[str, Any]) -> SettingsSnapshot:
+        """Publish a new snapshot with changes applied (no-op if nothing changed)"""
+        with self._lock:
+            current = self._snapshot
+            if all(current.values.get(key, _MISSING) == value for key, value in changes.items()):
+                return current
+            self._snapshot = SettingsSnapshot(current.version + 1, dict(current.values, **changes))
+            return self._snapshot
+
+
+_MISSING = object()
@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+import glob
+import logging
+import os
+import time
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class Pacer:
+    """Sleep so that consecutive frames are delivered at a fixed rate"""
+
+    def __init__(self, fps: Optional[float]):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_time = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_time is None:
+            self.next_time = now
+        delay = self.next_time - now
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -self.interval:
+            # Fell behind by more than a frame; don't burst to catch up
+            self.next_time = now
+        self.next_time += self.interval
+
+
+class FrameSource(ABC):
+    """Input that can stand in for Camera: start(), stop(), read_frame().
+
+    With ``paced=True`` frames are delivered at ``fps`` like a real camera;
+    otherwise as fast as the consumer reads them, for throughput tests.
+    """
+
+    def __init__(self, fps: float = 20.0, paced: bool = True, loop: bool = True):
+        self.fps = fps
+        self.paced = paced
+        self.loop = loop
+        self.running = False
+        self.resolution = (1280, 720)
+        self.frame_index = 0
+        self.pacer = None
+
+    def start(self):
+        """Start delivering frames"""
+        self.frame_index = 0
+        self.pacer = Pacer(self.fps if self.paced else None)
+        self.running = True
+
+    def stop(self):
+        """Stop delivering frames"""
+        self.running = False
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        """Read the next frame, or None at end of input"""
+        if not self.running:
+            return None
+        self.pacer.wait()
+        frame = self._next_frame()
+        if frame is None:
+            self.running = False
+            return None
+        self.frame_index += 1
+        return frame
+
+    @abstractmethod
+    def _next_frame(self) -> Optional[np.ndarray]:
+        """The next frame, or None at end of input"""
+
+    def get_current_resolution(self) -> Tuple[int, int]:
+        """Get source resolution"""
+        return self.resolution
+
+
+class VideoFileSource(FrameSource):
+    """Frames from a video file, optionally looped"""
+
+    def __init__(self, path: str, fps: Optional[float] = None, paced: bool = True, loop: bool = True):
+        super().__init__(fps or 20.0, paced, loop)
+        self.path = path
+        self.cap = None
+        self.use_file_fps = fps is None
+
+    def start(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            self.cap = None
+            raise RuntimeError(f"Failed to open video file: {self.path}")
+        if self.use_file_fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+        self.resolution = (
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        )
+        logger.info(f"Opened video file {self.path}: {self.resolution[0]}x{self.resolution[1]} @ {self.fps}fps")
+        super().start()
+
+    def stop(self):
+        super().stop()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _next_frame(self) -> Optional[np.ndarray]:
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.frame_index > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return frame if ret else None
+
+
+class ImageSequenceSource(FrameSource):
+    """Frames from a directory of images or a glob pattern, in name order"""
+
+    def __init__(self, pattern: str, fps: float = 20.0, paced: bool = True, loop: bool = True):
+        super().__init__(fps, paced, loop)
+        self.pattern = pattern
+        self.paths: List[str] = []
+        self.position = 0
+
+    def start(self):
+        if os.path.isdir(self.pattern):
+            paths = [os.path.join(self.pattern, name) for name in os.listdir(self.pattern)]
+        else:
+            paths = glob.glob(self.pattern)
+        self.paths = sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise RuntimeError(f"No images found: {self.pattern}")
+        first = cv2.imread(self.paths[0])
+        if first is None:
+            raise RuntimeError(f"Failed to read image: {self.paths[0]}")
+        self.resolution = (first.shape[1], first.shape[0])
+        self.position = 0
+        super().start()
+
+    def _next_frame(self) -> Optional[np.ndarray]:
+        if self.position >= len(self.paths):
+            if not self.loop:
+                return None
+            self.position = 0
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        return frame
+
+
+class SyntheticSource(FrameSource):
+    """Generated test pattern with a moving person-like shape.
+
+    Frames are deterministic for a given size and frame index, and
+    ``person_mask()`` gives the exact mask of the shape, which makes the
+    source usable as ground truth as well as for throughput tests.
+    """
+
+    def __init__(self, resolution: Tuple[int, int] = (1280, 720), fps: float = 20.0,
+                 paced: bool = True, frames: Optional[int] = None, seed: int = 0):
+        super().__init__(fps, paced, loop=frames is None)
+        self.resolution = resolution
+        self.frames = frames
+        width, height = resolution
+        rng = np.random.default_rng(seed)
+        # Smooth texture so the background isn't trivially compressible
+        self.background = cv2.resize(
+            rng.integers(0, 255, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8),
+            (width, height),
+            interpolation=cv2.INTER_CUBIC
+        )
+
+    def _shape_position(self, index: int) -> Tuple[int, int]:
+        width, height = self.resolution
+        # Sway left and right with a slight bob, one cycle every ~5 seconds
+        phase = index / 100.0 * 2 * np.pi
+        center_x = int(width * (0.5 + 0.15 * np.sin(phase)))
+        head_y = int(height * (0.33 + 0.02 * np.sin(phase * 2)))
+        return center_x, head_y
+
+    def _draw(self, image: np.ndarray, index: int, color_head, color_body):
+        width, height = self.resolution
+        center_x, head_y = self._shape_position(index)
+        head_radius = max(1, height // 8)
+        cv2.ellipse(image, (center_x, height), (width // 5, height - head_y - head_radius // 2),
+                    0, 180, 360, color_body, -1)
+        cv2.rectangle(image, (center_x - head_radius // 3, head_y),
+                      (center_x + head_radius // 3, head_y + head_radius * 2), color_body, -1)
+        cv2.circle(image, (center_x, head_y), head_radius, color_head, -1)
+
+    def frame_at(self, index: int) -> np.ndarray:
+        """Render the frame with the given index"""
+        frame = self.background.copy()
+        self._draw(frame, index, (140, 170, 220), (90, 60, 40))
+        return frame
+
+    def person_mask(self, index: int) -> np.ndarray:
+        """Exact float mask (0..1) of the person shape in frame index"""
+        width, height = self.resolution
+        mask = np.zeros((height, width), dtype=np.uint8)
+        self._draw(mask, index, 255, 255)
+        return mask.astype(np.float32) / 255.0
+
+    def _next_frame(self) -> Optional[np.ndarray]:
+        if self.frames is not None and self.frame_index >= self.frames:
+            return None
+        return self.frame_at(self.frame_index)
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    width, height = map(int, text.lower().split('x'))
+    return width, height
+
+
+def is_video_file(spec: str) -> bool:
+    """True if spec names a video file, which plays at its own frame rate"""
+    return os.path.isfile(spec) and not spec.startswith('/dev/')
+
+
+def open_source(spec: str, fps: Optional[float] = None, paced: bool = True,
+                resolution: Tuple[int, int] = (1280, 720),
+                on_settings: Optional[Callable[[Dict], None]] = None):
+    """Create an input from a spec string.
+
+    ``synthetic`` or ``synthetic:WIDTHxHEIGHT`` for the test pattern, a
+    ``.vmrec`` session recording, an image directory or glob for a sequence,
+    a video file path, and anything else (e.g. ``/dev/video0``) is opened as
+    a camera. ``on_settings`` receives a recording's settings changes.
+    """
+    if spec.startswith('synthetic'):
+        _, _, size = spec.partition(':')
+        return SyntheticSource(parse_size(size) if size else resolution, fps or 20.0, paced)
+    if spec.rstrip('/').endswith('.vmrec'):
+        from .recording import ReplaySource
+        return ReplaySource(spec, realtime=paced, on_settings=on_settings)
+    if os.path.isdir(spec) or any(ch in spec for ch in '*?['):
+        return ImageSequenceSource(spec, fps or 20.0, paced)
+    if is_video_file(spec):
+        return VideoFileSource(spec, fps, paced)
+
+    from .camera import Camera
+    camera = Camera()
+    # GUI device names ("Name (/dev/videoN)"), GSTREAMER and indexes pass through
+    if spec.startswith('/dev/'):
+        spec = f"Camera ({spec})"
+    camera.set_input_device(spec)
+    camera.set_resolution(f"{resolution[0]}x{resolution[1]}")
+    if fps:
+        camera.set_fps(fps)
+    return camera
@@ -0,0 +1,126 @@
+from typing import Dict
+import itertools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class TraceRecorder:
+    """Bounded recorder of per-stage, per-thread spans for timeline profiling.
+
+    Events go into preallocated arrays used as a ring buffer, so recording
+    a span is a couple of array stores with no allocation. ``dump()``
+    writes the spans from the last ``window_seconds`` as Chrome trace-event
+    JSON, which can be opened in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, capacity: int = 65536, window_seconds: float = 10.0):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.enabled = False
+
+        self.starts = np.zeros(capacity, dtype=np.float64)
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.name_ids = np.full(capacity, -1, dtype=np.int32)
+        self.thread_ids = np.zeros(capacity, dtype=np.int64)
+
+        self.names: Dict[str, int] = {}
+        self.thread_names: Dict[int, str] = {}
+        self._next_slot = itertools.count()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start recording"""
+        self.enabled = True
+
+    def stop(self):
+        """Stop recording (recorded events are kept until cleared)"""
+        self.enabled = False
+
+    def clear(self):
+        """Drop all recorded events"""
+        self.name_ids.fill(-1)
+
+    def _name_id(self, name: str) -> int:
+        name_id = self.names.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self.names.setdefault(name, len(self.names))
+        return name_id
+
+    def record(self, name: str, start: float, end: float):
+        """Record a span; start/end are time.perf_counter() values"""
+        if not self.enabled:
+            return
+        # next() on itertools.count is atomic under the GIL
+        slot = next(self._next_slot) % self.capacity
+        tid = threading.get_native_id()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        self.name_ids[slot] = -1
+        self.starts[slot] = start
+        self.durations[slot] = end - start
+        self.thread_ids[slot] = tid
+        self.name_ids[slot] = self._name_id(name)
+
+    def span(self, name: str):
+        """Context manager recording the enclosed block"""
+        return _Span(self, name)
+
+    def events(self) -> list:
+        """Chrome trace events for the recorded window"""
+        valid = self.name_ids >= 0
+        starts = self.starts[valid]
+        durations = self.durations[valid]
+        name_ids = self.name_ids[valid]
+        thread_ids = self.thread_ids[valid]
+
+        cutoff = time.perf_counter() - self.window_seconds
+        recent = starts >= cutoff
+        order = np.argsort(starts[recent])
+        names = {name_id: name for name, name_id in self.names.items()}
+        pid = os.getpid()
+
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self.thread_names.items()
+        ]
+        for start, duration, name_id, tid in zip(
+            starts[recent][order], durations[recent][order],
+            name_ids[recent][order], thread_ids[recent][order]
+        ):
+            events.append({
+                'name': names.get(int(name_id), '?'),
+                'cat': 'vidmask',
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': duration * 1e6,
+                'pid': pid,
+                'tid': int(tid),
+            })
+        return events
+
+    def dump(self, path: str) -> int:
+        """Write the recorded window to path, returning the number of spans"""
+        events = self.events()
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return sum(1 for event in events if event['ph'] == 'X')
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder: TraceRecorder, name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, self.start, time.perf_counter())
+        return False
@@ -5,14 +5,16 @@ from .preview_frame import PreviewFrame
 from ..locales import TRANSLATIONS, LANGUAGE_NAMES
 import os
 import json
-import mediapipe as mp
-import re
-import cv2
-import subprocess
-import queue
-import numpy as np
 from src.version import VERSION
 from ..utils.theme import ThemeManager
+from ..core.metrics import PipelineMetrics
+from ..core.metrics_server import metrics_server_from_env
+
+# Settings whose changes are kept in session recordings
+SESSION_SETTINGS = (
+    'scale', 'x_offset', 'y_offset', 'flip_h', 'flip_v',
+    'smooth_kernel', 'smooth_sigma', 'fps', 'background_path'
+)
 
 class MainWindow(ttk.Frame):
     def __init__(self, root):
@@ -38,6 +40,7 @@ class MainWindow(ttk.Frame):
         self.create_frames()
         self.create_menu()
         self.create_bindings()
+        self.create_session_traces()
         
         # Load and apply settings last
         self.load_settings()
@@ -50,6 +53,18 @@ class MainWindow(ttk.Frame):
         # Load camera devices
         self.settings_frame.load_camera_devices()
         
+        # Optional Prometheus endpoint (VIDMASK_METRICS_ADDR); a separate
+        # pipeline process serves its own
+        self.metrics_server = None
+        if isinstance(self.preview_frame.metrics, PipelineMetrics):
+            self.metrics_server = metrics_server_from_env({'main': self.preview_frame.metrics})
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                print(f"Error starting metrics endpoint: {e}")
+                self.metrics_server = None
+        
         print("GUI created")
 
     def create_frames(self):
@@ -75,6 +90,9 @@ class MainWindow(ttk.Frame):
         self.file_menu.add_separator()
         self.file_menu.add_command(label=self.tr('save_settings'), command=self.save_settings, accelerator='Ctrl+S')
         self.file_menu.add_separator()
+        self.file_menu.add_checkbutton(label=self.tr('record_session'), variable=self.session_recording)
+        self.file_menu.add_checkbutton(label=self.tr('record_output'), variable=self.output_recording)
+        self.file_menu.add_separator()
         self.file_menu.add_command(label=self.tr('reset_settings'), command=self.reset_settings)
         self.file_menu.add_separator()
         self.file_menu.add_command(label=self.tr('exit'), command=self.root.quit, accelerator='Ctrl+Q')
@@ -109,6 +127,19 @@ class MainWindow(ttk.Frame):
                 command=lambda t=theme_option: self.theme_manager.set_theme(t)
             )
         
+        # Performance panel toggle
+        self.view_menu.add_separator()
+        self.view_menu.add_checkbutton(
+            label=self.tr('performance_panel'),
+            variable=self.show_performance,
+            accelerator='Ctrl+P'
+        )
+        self.view_menu.add_checkbutton(
+            label=self.tr('record_trace'),
+            variable=self.trace_enabled
+        )
+        self.view_menu.add_command(label=self.tr('save_trace'), command=self.save_trace, accelerator='Ctrl+T')
+        
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label=self.tr('help'), menu=help_menu)
@@ -182,7 +213,10 @@ class MainWindow(ttk.Frame):
                     self.output_device.set(settings.get('output_device', '/dev/video2'))
                     self.background_path.set(settings.get('background_path', ''))
                     self.show_preview.set(settings.get('show_preview', True))
+                    self.show_performance.set(settings.get('show_performance', False))
                     self.resolution.set(settings.get('resolution', '1280x720'))
+                    self.buffer_size.set(int(settings.get('buffer_size', 1)))
+                    self.fast_decode.set(settings.get('fast_decode', False))
                     self.language.set(settings.get('language', 'en'))
                     self.theme.set(settings.get('theme', 'system'))
                     
@@ -195,26 +229,33 @@ class MainWindow(ttk.Frame):
         except Exception as e:
             print(f"Error loading settings: {e}")
 
+    def get_settings(self):
+        """Collect current settings into a dict"""
+        return {
+            'input_device': self.settings_frame.input_device.get(),
+            'output_device': self.settings_frame.output_device.get(),
+            'background_path': self.settings_frame.background_path.get(),
+            'fps': self.settings_frame.fps.get(),
+            'scale': self.settings_frame.scale.get(),
+            'show_preview': self.show_preview.get(),
+            'show_performance': self.show_performance.get(),
+            'smooth_kernel': self.settings_frame.smooth_kernel.get(),
+            'smooth_sigma': self.settings_frame.smooth_sigma.get(),
+            'resolution': self.settings_frame.resolution.get(),
+            'buffer_size': self.settings_frame.buffer_size.get(),
+            'fast_decode': self.settings_frame.fast_decode.get(),
+            'x_offset': self.settings_frame.x_offset.get(),
+            'y_offset': self.settings_frame.y_offset.get(),
+            'flip_h': self.settings_frame.flip_h.get(),
+            'flip_v': self.settings_frame.flip_v.get(),
+            'language': self.language.get(),
+            'theme': self.theme.get()
+        }
+
     def save_settings(self):
         """Save current settings to config file"""
         try:
-            settings = {
-                'input_device': self.settings_frame.input_device.get(),
-                'output_device': self.settings_frame.output_device.get(),
-                'background_path': self.settings_frame.background_path.get(),
-                'fps': self.settings_frame.fps.get(),
-                'scale': self.settings_frame.scale.get(),
-                'show_preview': self.show_preview.get(),
-                'smooth_kernel': self.settings_frame.smooth_kernel.get(),
-                'smooth_sigma': self.settings_frame.smooth_sigma.get(),
-                'resolution': self.settings_frame.resolution.get(),
-                'x_offset': self.settings_frame.x_offset.get(),
-                'y_offset': self.settings_frame.y_offset.get(),
-                'flip_h': self.settings_frame.flip_h.get(),
-                'flip_v': self.settings_frame.flip_v.get(),
-                'language': self.language.get(),
-                'theme': self.theme.get()
-            }
+            settings = self.get_settings()
             
             os.makedirs(self.config_dir, exist_ok=True)
             with open(self.config_file, 'w') as f:
@@ -231,24 +272,7 @@ class MainWindow(ttk.Frame):
         )
         if filename:
             try:
-                settings = {
-                    'input_device': self.settings_frame.input_device.get(),
-                    'output_device': self.settings_frame.output_device.get(),
-                    'background_path': self.settings_frame.background_path.get(),
-                    'fps': self.settings_frame.fps.get(),
-                    'scale': self.settings_frame.scale.get(),
-                    'show_preview': self.preview_frame.show_preview.get(),
-                    'smooth_kernel': self.settings_frame.smooth_kernel.get(),
-                    'smooth_sigma': self.settings_frame.smooth_sigma.get(),
-                    'resolution': self.settings_frame.resolution.get(),
-                    'x_offset': self.settings_frame.x_offset.get(),
-                    'y_offset': self.settings_frame.y_offset.get(),
-                    'flip_h': self.settings_frame.flip_h.get(),
-                    'flip_v': self.settings_frame.flip_v.get(),
-                    # Add theme and language settings
-                    'language': self.language.get(),
-                    'theme': self.theme.get()
-                }
+                settings = self.get_settings()
                 with open(filename, 'w') as f:
                     json.dump(settings, f, indent=4)
                 messagebox.showinfo("Success", "Settings exported successfully")
@@ -275,6 +299,8 @@ class MainWindow(ttk.Frame):
                 self.settings_frame.smooth_kernel.set(settings.get('smooth_kernel', 21))
                 self.settings_frame.smooth_sigma.set(settings.get('smooth_sigma', 10.0))
                 self.settings_frame.resolution.set(settings.get('resolution', '1280x720'))
+                self.settings_frame.buffer_size.set(int(settings.get('buffer_size', 1)))
+                self.settings_frame.fast_decode.set(settings.get('fast_decode', False))
                 self.language.set(settings.get('language', 'en'))
                 self.theme.set(settings.get('theme', 'light'))
                 self.settings_frame.x_offset.set(settings.get('x_offset', 0.5))
@@ -288,6 +314,86 @@ class MainWindow(ttk.Frame):
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to import settings: {e}")
 
+    def toggle_tracing(self):
+        """Start or stop recording pipeline trace events"""
+        if self.trace_enabled.get():
+            self.preview_frame.tracer.start()
+        else:
+            self.preview_frame.tracer.stop()
+
+    def save_trace(self):
+        """Save the last seconds of pipeline trace events as Chrome trace JSON"""
+        if not self.trace_enabled.get():
+            # Start recording so the next save has something to show
+            self.trace_enabled.set(True)
+            messagebox.showinfo(self.tr('save_trace'), self.tr('trace_started'))
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            initialfile="vidmask-trace.json",
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            try:
+                count = self.preview_frame.tracer.dump(filename)
+                messagebox.showinfo(self.tr('success'), self.tr('trace_saved').format(count))
+            except Exception as e:
+                messagebox.showerror(self.tr('error'), str(e))
+
+    def create_session_traces(self):
+        """Forward settings changes to the session recorder"""
+        for name in SESSION_SETTINGS:
+            variable = getattr(self.settings_frame, name)
+            variable.trace_add('write', lambda *_, n=name, v=variable: self.record_setting_change(n, v))
+
+    def record_setting_change(self, name, variable):
+        """Record a settings change if a session is being recorded"""
+        if self.session_recording.get():
+            try:
+                self.preview_frame.engine.record_settings({name: variable.get()})
+            except tk.TclError:
+                pass  # Half-typed value, the next write will be recorded
+
+    def toggle_session_recording(self):
+        """Start or stop recording raw input and settings changes"""
+        engine = self.preview_frame.engine
+        if self.session_recording.get():
+            path = filedialog.asksaveasfilename(
+                initialfile="vidmask-session.vmrec",
+                filetypes=[("VidMask session", "*.vmrec"), ("All files", "*.*")]
+            )
+            if not path:
+                self.session_recording.set(False)
+                return
+            if not path.endswith('.vmrec'):
+                path += '.vmrec'
+            try:
+                engine.start_recording(path, self.get_settings())
+            except Exception as e:
+                messagebox.showerror(self.tr('error'), str(e))
+                self.session_recording.set(False)
+        else:
+            engine.stop_recording()
+
+    def toggle_output_recording(self):
+        """Start or stop recording the processed output to a video file"""
+        engine = self.preview_frame.engine
+        if self.output_recording.get():
+            if not engine.running:
+                messagebox.showerror(self.tr('error'), self.tr('record_output_needs_camera'))
+                self.output_recording.set(False)
+                return
+            path = filedialog.asksaveasfilename(
+                initialfile="vidmask-recording.mp4",
+                filetypes=[("Video", "*.mp4 *.mkv"), ("All files", "*.*")]
+            )
+            if not path:
+                self.output_recording.set(False)
+                return
+            engine.start_output_recording(path)
+        else:
+            engine.stop_output_recording()
+
     def apply_loaded_settings(self):
         """Apply loaded settings to GUI elements"""
         # Update language
@@ -302,138 +408,6 @@ class MainWindow(ttk.Frame):
         if hasattr(self, 'preview_frame'):
             self.preview_frame.update_values()
 
-    def process_camera(self):
-        # Initialize MediaPipe with fixed landscape model
-        mp_selfie_segmentation = mp.solutions.selfie_segmentation
-        selfie_segmentation = mp_selfie_segmentation.SelfieSegmentation(model_selection=1)
-
-        try:
-            # Extract device number from path
-            input_device = re.search(r"\((/dev/video\d+)\)", self.input_device.get()).group(1)
-            output_device = re.search(r"\((/dev/video\d+)\)", self.output_device.get()).group(1)
-            device_num = int(input_device.replace('/dev/video', ''))
-
-            # Open camera
-            cap = cv2.VideoCapture(device_num, cv2.CAP_V4L2)
-            if not cap.isOpened():
-                messagebox.showerror("Error", f"Could not open camera {input_device}")
-                self.is_running = False
-                return
-
-            # Set initial resolution
-            width, height = map(int, self.resolution_combo.get().split('x'))
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            
-            # Get actual camera resolution
-            actual_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            actual_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            if actual_width != width or actual_height != height:
-                print(f"Warning: Camera using {actual_width}x{actual_height} instead of requested {width}x{height}")
-                width, height = actual_width, actual_height
-
-            # Load and store original background image
-            original_background = cv2.imread(self.background_path.get())
-            if original_background is None:
-                messagebox.showerror("Error", "Could not load background image")
-                self.is_running = False
-                return
-            
-            # Get initial background size
-            background_image = cv2.resize(original_background, (width, height))
-            last_scale = self.scale.get()
-
-            # Initialize FFmpeg process
-            ffmpeg_process = None
-            def create_ffmpeg_process(w, h):
-                command = [
-                    'ffmpeg',
-                    '-f', 'rawvideo',
-                    '-pix_fmt', 'bgr24',
-                    '-s', f'{w}x{h}',
-                    '-r', str(self.fps.get()),
-                    '-i', '-',
-                    '-f', 'v4l2',
-                    output_device
-                ]
-                return subprocess.Popen(command, stdin=subprocess.PIPE)
-
-            ffmpeg_process = create_ffmpeg_process(width, height)
-            self.frame_queue = queue.Queue(maxsize=2)
-
-            while self.is_running:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                # Ensure frame matches target dimensions
-                frame = cv2.resize(frame, (width, height))
-                
-                # Check if scale changed
-                if last_scale != self.scale.get():
-                    scaled_width = int(width * self.scale.get())
-                    scaled_height = int(height * self.scale.get())
-                    # Resize from original background to maintain quality
-                    background_image = cv2.resize(original_background, (scaled_width, scaled_height))
-                    last_scale = self.scale.get()
-                    frame = cv2.resize(frame, (scaled_width, scaled_height))
-                    width, height = scaled_width, scaled_height
-
-                    # Restart FFmpeg process with new dimensions
-                    if ffmpeg_process:
-                        ffmpeg_process.stdin.close()
-                        ffmpeg_process.wait()
-                    ffmpeg_process = create_ffmpeg_process(width, height)
-
-                # Process frame
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = selfie_segmentation.process(frame_rgb)
-
-                try:
-                    # Create and smooth mask
-                    kernel_size = int(self.smooth_kernel.get())
-                    if kernel_size % 2 == 0:
-                        kernel_size += 1
-                    kernel_tuple = (kernel_size, kernel_size)
-                    
-                    mask = results.segmentation_mask
-                    mask = cv2.GaussianBlur(
-                        mask,
-                        kernel_tuple,
-                        sigmaX=float(self.smooth_sigma.get()),
-                        sigmaY=float(self.smooth_sigma.get())
-                    )
-                    mask = np.stack((mask,) * 3, axis=-1)
-
-                    # Combine foreground and background
-                    output_frame = (frame * mask + background_image * (1 - mask)).astype(np.uint8)
-
-                    # Update preview if enabled
-                    if self.show_preview.get():
-                        try:
-                            self.frame_queue.put_nowait(output_frame)
-                        except queue.Full:
-                            pass
-
-                    # Write to FFmpeg
-                    ffmpeg_process.stdin.write(output_frame.tobytes())
-
-                except Exception as e:
-                    print(f"Error processing frame: {e}")
-                    continue
-
-            # Cleanup
-            cap.release()
-            ffmpeg_process.stdin.close()
-            ffmpeg_process.wait()
-            selfie_segmentation.close()
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Camera error: {str(e)}")
-            self.is_running = False
-            return
-
     def create_variables(self):
         """Initialize all variables"""
         # Theme and language
@@ -453,7 +427,16 @@ class MainWindow(ttk.Frame):
         self.output_device = tk.StringVar(value='/dev/video2')
         self.background_path = tk.StringVar()
         self.show_preview = tk.BooleanVar(value=True)
+        self.show_performance = tk.BooleanVar(value=False)
+        self.trace_enabled = tk.BooleanVar(value=False)
+        self.session_recording = tk.BooleanVar(value=False)
+        self.session_recording.trace_add('write', lambda *_: self.toggle_session_recording())
+        self.output_recording = tk.BooleanVar(value=False)
+        self.output_recording.trace_add('write', lambda *_: self.toggle_output_recording())
+        self.trace_enabled.trace_add('write', lambda *_: self.toggle_tracing())
         self.resolution = tk.StringVar(value='1280x720')
+        self.buffer_size = tk.IntVar(value=1)
+        self.fast_decode = tk.BooleanVar(value=False)
         
         # Position controls
         self.x_offset = tk.DoubleVar(value=0.5)
@@ -467,6 +450,8 @@ class MainWindow(ttk.Frame):
         self.root.bind('<Control-i>', lambda e: self.import_settings())
         self.root.bind('<Control-e>', lambda e: self.export_settings())
         self.root.bind('<Control-q>', lambda e: self.root.quit())
+        self.root.bind('<Control-t>', lambda e: self.save_trace())
+        self.root.bind('<Control-p>', lambda e: self.show_performance.set(not self.show_performance.get()))
         self.root.bind('<space>', lambda e: self.preview_frame.toggle_camera())
         self.root.bind('<r>', lambda e: self.reset_settings())
         self.root.bind('<Escape>', lambda e: self.preview_frame.stop_camera())
\ No newline at end of file
@@ -0,0 +1,78 @@
+import tkinter as tk
+from tkinter import ttk
+from ..core.governor import LEVELS
+from ..core.metrics import STAGES, ThreadCpuSampler
+
+# Refresh interval of the panel; independent of the pipeline frame rate
+REFRESH_MS = 500
+
+class PerformanceFrame(ttk.LabelFrame):
+    """Live pipeline statistics, refreshed from the metrics counters.
+
+    Only ever reads the PipelineMetrics ring buffers from the Tk thread,
+    so the pipeline does no GUI work per frame.
+    """
+
+    def __init__(self, master, app, metrics):
+        super().__init__(master, text=app.tr('performance'))
+        self.app = app
+        self.metrics = metrics
+        self.cpu_sampler = ThreadCpuSampler()
+        self.refresh_job = None
+
+        self.summary_label = ttk.Label(self, justify=tk.LEFT, font='TkFixedFont')
+        self.summary_label.pack(side=tk.LEFT, fill=tk.X, padx=5, pady=5)
+        self.stages_label = ttk.Label(self, justify=tk.LEFT, font='TkFixedFont')
+        self.stages_label.pack(side=tk.LEFT, fill=tk.X, padx=5, pady=5)
+
+    def start(self):
+        """Start periodic refresh"""
+        if self.refresh_job is None:
+            self.refresh()
+
+    def stop(self):
+        """Stop periodic refresh"""
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+
+    def refresh(self):
+        """Update labels from the latest metrics summary"""
+        summary = self.metrics.summary()
+        counters = summary['counters']
+        gauges = summary.get('gauges', {})
+        cpu = self.cpu_sampler.sample(self.metrics.thread_ids, self.metrics.pid)
+        latency = summary['latency_ms']
+        level = gauges.get('quality_level', 0)
+
+        lines = [
+            self.app.tr('perf_fps').format(summary['fps'], self.app.settings_frame.fps.get()),
+            self.app.tr('perf_latency').format(latency.get('p50', 0.0), latency.get('p95', 0.0)),
+            self.app.tr('perf_cpu').format(sum(cpu.values())),
+            self.app.tr('perf_dropped').format(
+                gauges.get('capture_skipped', 0),
+                counters.get('preview_drops', 0),
+                counters.get('duplicates_reused', 0)
+            ),
+            self.app.tr('perf_startup').format(gauges.get('first_frame_ms', 0), gauges.get('input_open_ms', 0)),
+            self.app.tr('perf_quality_reduced').format(level, len(LEVELS) - 1, LEVELS[level].name)
+            if level else self.app.tr('perf_quality_full'),
+        ]
+        if not summary['enabled']:
+            lines = [self.app.tr('perf_disabled')]
+        self.summary_label.configure(text='\n'.join(lines))
+
+        stage_lines = [f"{'':<16}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        for stage in STAGES:
+            values = summary['stages'].get(stage)
+            if values:
+                stage_lines.append(
+                    f"{stage:<16}{values['p50']:7.1f}{values['p95']:7.1f}{values['p99']:7.1f}"
+                )
+        self.stages_label.configure(text='\n'.join(stage_lines))
+
+        self.refresh_job = self.after(REFRESH_MS, self.refresh)
+
+    def update_labels(self):
+        """Update labels to current language"""
+        self.configure(text=self.app.tr('performance'))
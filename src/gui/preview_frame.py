@@ -1,13 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import cv2
-import mediapipe as mp
-import numpy as np
 from PIL import Image, ImageTk
-import threading
 import queue
-import re
-import subprocess
+import os
+from ..core.engine import PipelineEngine
+from ..core.service import RemoteEngine, launch_service
+from ..core.settings import SettingsStore
+from .performance_frame import PerformanceFrame
+
+# How often settings are pushed to the pipeline process and its state read
+ENGINE_POLL_MS = 200
+
+# Settings frame variables the pipeline reads
+PIPELINE_SETTINGS = (
+    'input_device', 'output_device', 'background_path', 'resolution', 'fps',
+    'buffer_size', 'fast_decode', 'scale', 'smooth_kernel', 'smooth_sigma',
+    'x_offset', 'y_offset', 'flip_h', 'flip_v'
+)
 
 class PreviewFrame(ttk.LabelFrame):
     def __init__(self, master):
@@ -15,8 +25,12 @@ class PreviewFrame(ttk.LabelFrame):
         self.master = master
         
         # Initialize runtime variables
-        self.is_running = False
-        self.frame_queue = queue.Queue(maxsize=2)
+        self.settings_store = self.create_settings_store()
+        self.engine = self.create_engine()
+        self.metrics = self.engine.metrics
+        self.tracer = self.engine.tracer
+        self.poll_job = None
+        self.last_error = None
         
         # Use master's variables
         self.show_preview = master.show_preview
@@ -29,11 +43,64 @@ class PreviewFrame(ttk.LabelFrame):
         
         # Create control buttons
         self.create_controls()
+        
+        # Performance panel, shown on demand
+        self.performance_frame = PerformanceFrame(self, master, self.metrics)
+        self.show_performance = master.show_performance
+        self.show_performance.trace_add('write', self.handle_performance_toggle)
+
+        # Keep the remote pipeline in sync with the settings
+        if isinstance(self.engine, RemoteEngine):
+            self.poll_engine()
+
+    def create_engine(self):
+        """Connect to the pipeline process, or run the pipeline in-process"""
+        if os.environ.get('VIDMASK_INPROCESS') != '1':
+            try:
+                return RemoteEngine(launch_service())
+            except Exception as e:
+                print(f"Pipeline process unavailable, running in-process: {e}")
+        engine = PipelineEngine(self.settings_store)
+        engine.preview_queue = queue.Queue(maxsize=2)
+        engine.on_error = self.handle_engine_error
+        engine.on_stopped = self.handle_engine_stopped
+        engine.prewarm()
+        return engine
+
+    def poll_engine(self):
+        """Push settings to the pipeline process and pick up its state"""
+        was_running = self.engine.running
+        try:
+            status = self.engine.sync(self.settings_store.snapshot().as_dict())
+        except (OSError, RuntimeError) as e:
+            print(f"Lost connection to pipeline process: {e}")
+            self.poll_job = None
+            return
+        if status.get('error') and status['error'] != self.last_error:
+            self.handle_engine_error(status['error'])
+        self.last_error = status.get('error')
+        if was_running != self.engine.running:
+            self.update_values()
+            if self.engine.running and self.show_preview.get():
+                self.update_preview()
+        self.poll_job = self.master.after(ENGINE_POLL_MS, self.poll_engine)
+
+    def close(self):
+        """Disconnect from the pipeline process; the camera keeps running"""
+        if self.poll_job is not None:
+            self.master.after_cancel(self.poll_job)
+            self.poll_job = None
+        if isinstance(self.engine, RemoteEngine):
+            self.engine.close()
+        else:
+            self.engine.stop(wait=True)
+            self.engine.close()
 
     def create_controls(self):
         # Control buttons frame
         control_frame = ttk.Frame(self)
         control_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.control_frame = control_frame
         
         # Start/Stop button
         self.start_button = ttk.Button(
@@ -51,6 +118,10 @@ class PreviewFrame(ttk.LabelFrame):
         )
         self.preview_check.pack(side=tk.LEFT)
 
+    @property
+    def is_running(self):
+        return self.engine.running
+
     def toggle_camera(self):
         """Toggle camera on/off"""
         if not self.is_running:
@@ -63,192 +134,60 @@ class PreviewFrame(ttk.LabelFrame):
                 return
             
             # Start camera
-            self.is_running = True
+            if isinstance(self.engine, RemoteEngine):
+                self.engine.sync(self.settings_store.snapshot().as_dict())
+            self.engine.start()
             self.start_button.configure(text=self.master.tr('stop_camera'))
-            self.camera_thread = threading.Thread(target=self.camera_loop)
-            self.camera_thread.daemon = True
-            self.camera_thread.start()
             
             # Start preview updates if enabled
             if self.show_preview.get():
                 self.update_preview()
         else:
             # Stop camera
-            self.is_running = False
+            self.engine.stop()
             self.start_button.configure(text=self.master.tr('start_camera'))
 
-    def camera_loop(self):
-        # Initialize MediaPipe
-        mp_selfie_segmentation = mp.solutions.selfie_segmentation
-        selfie_segmentation = mp_selfie_segmentation.SelfieSegmentation(model_selection=1)
-
+    def stop_camera(self):
+        """Stop camera if running"""
+        if self.is_running:
+            self.toggle_camera()
+
+    def create_settings_store(self):
+        """Settings for the engine, kept current by traces on the GUI variables"""
+        store = SettingsStore(self.pipeline_settings())
+        variables = [(name, getattr(self.master.settings_frame, name)) for name in PIPELINE_SETTINGS]
+        variables.append(('show_preview', self.master.show_preview))
+        for name, variable in variables:
+            variable.trace_add('write', lambda *_, n=name, v=variable: self.publish_setting(n, v))
+        return store
+
+    def publish_setting(self, name, variable):
+        """Publish a changed GUI variable as a new settings snapshot"""
         try:
-            # Get device paths
-            input_path = re.search(r"\((/dev/video\d+)\)", 
-                self.master.settings_frame.input_device.get()).group(1)
-            output_path = re.search(r"\((/dev/video\d+)\)", 
-                self.master.settings_frame.output_device.get()).group(1)
-            
-            # Open input camera
-            cap = cv2.VideoCapture(input_path)
-            if not cap.isOpened():
-                raise Exception(f"Could not open input device: {input_path}")
-            
-            # Set resolution
-            width, height = map(int, self.master.settings_frame.resolution.get().split('x'))
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            
-            # Track last FPS value
-            last_fps = self.master.settings_frame.fps.get()
-            
-            # Create FFmpeg process
-            def create_ffmpeg_process():
-                command = [
-                    'ffmpeg',
-                    '-f', 'rawvideo',
-                    '-pix_fmt', 'bgr24',
-                    '-s', f'{width}x{height}',
-                    '-r', str(self.master.settings_frame.fps.get()),
-                    '-i', '-',
-                    '-f', 'v4l2',
-                    '-pix_fmt', 'yuv420p',
-                    output_path
-                ]
-                return subprocess.Popen(command, stdin=subprocess.PIPE)
-            
-            self.ffmpeg_process = create_ffmpeg_process()
-            
-            # Load and store original background at original resolution
-            original_background = cv2.imread(self.master.settings_frame.background_path.get())
-            if original_background is None:
-                messagebox.showerror("Error", "Could not load background image")
-                self.is_running = False
-                return
-            
-            # Initial resize to match frame dimensions
-            background_image = cv2.resize(original_background, (width, height))
-
-            while self.is_running:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                # Ensure frame matches target dimensions
-                frame = cv2.resize(frame, (width, height))
-                
-                # Process frame
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = selfie_segmentation.process(frame_rgb)
-                
-                # Create and smooth mask
-                mask = results.segmentation_mask
-                
-                # Get kernel size and ensure it's odd
-                kernel_size = max(3, self.master.settings_frame.smooth_kernel.get())
-                if kernel_size % 2 == 0:
-                    kernel_size += 1
-                kernel_tuple = (kernel_size, kernel_size)
-                
-                mask = cv2.GaussianBlur(
-                    mask.astype(np.float32),
-                    kernel_tuple,
-                    sigmaX=float(self.master.settings_frame.smooth_sigma.get()),
-                    sigmaY=float(self.master.settings_frame.smooth_sigma.get())
-                )
-
-                # Extract person and apply flips before positioning
-                person_only = frame.copy()
-                if self.master.settings_frame.flip_h.get():
-                    person_only = cv2.flip(person_only, 1)
-                    mask = cv2.flip(mask, 1)  # Also flip the mask
-                if self.master.settings_frame.flip_v.get():
-                    person_only = cv2.flip(person_only, 0)
-                    mask = cv2.flip(mask, 0)  # Also flip the mask
-
-                # Continue with positioning and scaling...
-
-                # Check if FPS changed
-                current_fps = self.master.settings_frame.fps.get()
-                if current_fps != last_fps:
-                    # Restart FFmpeg process with new FPS
-                    self.ffmpeg_process.stdin.close()
-                    self.ffmpeg_process.wait()
-                    self.ffmpeg_process = create_ffmpeg_process()
-                    last_fps = current_fps
-
-                # Get current scale
-                current_scale = self.master.settings_frame.scale.get()
-                
-                # Get current scale and position
-                scaled_width = int(width * current_scale)
-                scaled_height = int(height * current_scale)
-                
-                # Calculate position based on offset settings
-                x_pos = int((width * (self.master.settings_frame.x_offset.get() * 2 - 1)))
-                y_pos = int((height * (self.master.settings_frame.y_offset.get() * 2 - 1)))
-                
-                # Create output frame with background
-                output_frame = background_image.copy()
-                
-                # Scale person and mask if needed
-                if current_scale != 1.0:
-                    scaled_person = cv2.resize(person_only, (scaled_width, scaled_height))
-                    scaled_mask = cv2.resize(mask, (scaled_width, scaled_height))
-                else:
-                    scaled_person = person_only
-                    scaled_mask = mask
-                
-                # Create a full-size mask with the person at offset position
-                full_mask = np.zeros((height, width))
-                
-                # Ensure we don't exceed image boundaries
-                y_start = max(0, y_pos)
-                y_end = min(height, y_pos + scaled_height)
-                x_start = max(0, x_pos)
-                x_end = min(width, x_pos + scaled_width)
-                
-                # Calculate source region for person
-                src_y_start = max(0, -y_pos)
-                src_x_start = max(0, -x_pos)
-                
-                # Place person and mask
-                full_mask[y_start:y_end, x_start:x_end] = \
-                    scaled_mask[src_y_start:src_y_start + (y_end - y_start),
-                              src_x_start:src_x_start + (x_end - x_start)]
-                output_frame[y_start:y_end, x_start:x_end] = \
-                    scaled_person[src_y_start:src_y_start + (y_end - y_start),
-                                src_x_start:src_x_start + (x_end - x_start)]
-                
-                # Stack mask for final composition
-                full_mask = np.stack((full_mask,) * 3, axis=-1)
-                
-                # Combine with background
-                output_frame = (output_frame * full_mask + 
-                               background_image * (1 - full_mask)).astype(np.uint8)
-                
-                # Write to FFmpeg
-                self.ffmpeg_process.stdin.write(output_frame.tobytes())
-                
-                # Update preview
-                try:
-                    self.frame_queue.put_nowait(output_frame)
-                except queue.Full:
-                    pass
-
-            # Cleanup
-            cap.release()
-            self.ffmpeg_process.stdin.close()
-            self.ffmpeg_process.wait()
-            selfie_segmentation.close()
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Camera error: {str(e)}")
-            self.is_running = False
+            self.settings_store.update({name: variable.get()})
+        except tk.TclError:
+            pass  # Half-typed value, the next write will be published
+
+    def pipeline_settings(self):
+        """Current settings for the engine, read from the GUI variables"""
+        settings_frame = self.master.settings_frame
+        settings = {name: getattr(settings_frame, name).get() for name in PIPELINE_SETTINGS}
+        settings['show_preview'] = self.master.show_preview.get()
+        return settings
+
+    def handle_engine_error(self, message):
+        """Called from the pipeline thread when it fails"""
+        self.master.after(0, lambda: messagebox.showerror(
+            self.master.tr('error'), f"Camera error: {message}"
+        ))
+
+    def handle_engine_stopped(self):
+        """Called from the pipeline thread when it ends"""
+        self.master.after(0, self.update_values)
 
     def update_preview(self):
-        if not self.frame_queue.empty() and self.show_preview.get():
-            frame = self.frame_queue.get_nowait()
+        frame = self.engine.read_preview() if self.show_preview.get() else None
+        if frame is not None:
             image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
             photo = ImageTk.PhotoImage(image=image)
             self.preview_label.configure(image=photo)
@@ -272,6 +211,7 @@ class PreviewFrame(ttk.LabelFrame):
             else self.master.tr('start_camera')
         )
         self.preview_check.configure(text=self.master.tr('show_preview'))
+        self.performance_frame.update_labels()
 
     def update_values(self):
         """Update all widget values from settings"""
@@ -280,6 +220,9 @@ class PreviewFrame(ttk.LabelFrame):
             text=self.master.tr('stop_camera') if self.is_running 
             else self.master.tr('start_camera')
         )
+        # An output recording ends with the run
+        if not self.is_running and self.master.output_recording.get():
+            self.master.output_recording.set(False)
 
     def handle_preview_toggle(self, *args):
         """Handle changes to show_preview variable"""
@@ -290,3 +233,12 @@ class PreviewFrame(ttk.LabelFrame):
         elif self.is_running:
             # Restart preview updates if camera is running
             self.update_preview()
+
+    def handle_performance_toggle(self, *args):
+        """Show or hide the performance panel"""
+        if self.show_performance.get():
+            self.performance_frame.pack(fill=tk.X, padx=5, before=self.control_frame)
+            self.performance_frame.start()
+        else:
+            self.performance_frame.stop()
+            self.performance_frame.pack_forget()
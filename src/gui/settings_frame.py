@@ -19,6 +19,8 @@ class SettingsFrame(ttk.LabelFrame):
         self.scale = tk.DoubleVar(value=1.0)
         self.smooth_kernel = tk.IntVar(value=21)
         self.smooth_sigma = tk.DoubleVar(value=10.0)
+        self.buffer_size = tk.IntVar(value=1)
+        self.fast_decode = tk.BooleanVar(value=False)
         
         # Position control variables
         self.x_offset = tk.DoubleVar(value=0.5)
@@ -94,6 +96,30 @@ class SettingsFrame(ttk.LabelFrame):
         )
         self.resolution_combo.pack(side=tk.RIGHT, fill=tk.X, expand=True)
 
+        # V4L2 capture buffer count
+        buffer_frame = ttk.Frame(self)
+        buffer_frame.pack(fill=tk.X, pady=(0, 10))
+        self.buffer_label = ttk.Label(buffer_frame, text=self.master.tr('buffer_count'))
+        self.buffer_label.pack(side=tk.LEFT)
+        self.buffer_spin = ttk.Spinbox(
+            buffer_frame,
+            from_=1,
+            to=8,
+            increment=1,
+            width=5,
+            textvariable=self.buffer_size,
+            state='readonly'
+        )
+        self.buffer_spin.pack(side=tk.RIGHT)
+
+        # Reduced-scale MJPEG decode for inference
+        self.fast_decode_check = ttk.Checkbutton(
+            self,
+            text=self.master.tr('fast_decode'),
+            variable=self.fast_decode
+        )
+        self.fast_decode_check.pack(anchor=tk.W, pady=(0, 10))
+
         # FPS slider
         self.fps_frame = ttk.Frame(self)
         self.fps_frame.pack(fill=tk.X, pady=(0, 10))
@@ -397,6 +423,8 @@ class SettingsFrame(ttk.LabelFrame):
         self.resolution.set('1280x720')
         self.smooth_kernel.set(21)
         self.smooth_sigma.set(10.0)
+        self.buffer_size.set(1)
+        self.fast_decode.set(False)
         
         # Update labels
         self.fps_label.configure(text="20.0")
@@ -415,6 +443,8 @@ class SettingsFrame(ttk.LabelFrame):
         self.bg_label.configure(text=self.master.tr('background'))
         self.bg_button.configure(text=self.master.tr('select_background'))
         self.resolution_label.configure(text=self.master.tr('resolution'))
+        self.buffer_label.configure(text=self.master.tr('buffer_count'))
+        self.fast_decode_check.configure(text=self.master.tr('fast_decode'))
         self.fps_text_label.configure(text=self.master.tr('fps'))
         self.scale_text_label.configure(text=self.master.tr('scale'))
         self.smooth_frame.configure(text=self.master.tr('smoothing'))
@@ -468,6 +498,8 @@ class SettingsFrame(ttk.LabelFrame):
         self.smooth_kernel.set(int(self.master.smooth_kernel.get()))
         self.smooth_sigma.set(float(self.master.smooth_sigma.get()))
         self.resolution.set(self.master.resolution.get())
+        self.buffer_size.set(int(self.master.buffer_size.get()))
+        self.fast_decode.set(self.master.fast_decode.get())
         
         # Update position controls
         self.x_offset.set(float(self.master.x_offset.get()))
@@ -59,6 +59,25 @@ TRANSLATIONS = {
         'flip_h': 'Flip Horizontal',
         'flip_v': 'Flip Vertical',
         'reset_position': 'Reset to Center',
+        'buffer_count': 'Camera Buffers:',
+        'fast_decode': 'Fast MJPEG Decode',
+        'performance': 'Performance',
+        'performance_panel': 'Performance Panel',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Latency: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'Pipeline CPU: {0:.0f}%',
+        'perf_dropped': 'Dropped: {0} stale, {1} preview, {2} repeated',
+        'perf_disabled': 'Instrumentation disabled (VIDMASK_METRICS=0)',
+        'perf_startup': 'Start: {0} ms to first frame (input {1} ms)',
+        'perf_quality_full': 'Quality: full',
+        'perf_quality_reduced': 'Quality: reduced, level {0}/{1} ({2})',
+        'record_trace': 'Record Trace',
+        'save_trace': 'Save Trace...',
+        'trace_started': 'Trace recording started. Press Ctrl+T again to save the last 10 seconds.',
+        'trace_saved': 'Saved {0} trace events',
+        'record_session': 'Record Session',
+        'record_output': 'Record Output',
+        'record_output_needs_camera': 'Start the camera before recording its output',
         'about_title': 'About VidMask',
         'about_text': '''VidMask v{version}
 
@@ -127,6 +146,25 @@ License: MIT''',
         'flip_h': 'Překlopit vodorovně',
         'flip_v': 'Překlopit svisle',
         'reset_position': 'Vycentrovat',
+        'buffer_count': 'Vyrovnávací paměti kamery:',
+        'fast_decode': 'Rychlé dekódování MJPEG',
+        'performance': 'Výkon',
+        'performance_panel': 'Panel výkonu',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Latence: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'CPU zpracování: {0:.0f}%',
+        'perf_dropped': 'Zahozeno: {0} zastaralých, {1} náhled, {2} opakovaných',
+        'perf_disabled': 'Měření vypnuto (VIDMASK_METRICS=0)',
+        'perf_startup': 'Start: {0} ms do prvního snímku (vstup {1} ms)',
+        'perf_quality_full': 'Kvalita: plná',
+        'perf_quality_reduced': 'Kvalita: snížená, úroveň {0}/{1} ({2})',
+        'record_trace': 'Nahrávat trasování',
+        'save_trace': 'Uložit trasování...',
+        'trace_started': 'Nahrávání trasování spuštěno. Stiskněte znovu Ctrl+T pro uložení posledních 10 sekund.',
+        'trace_saved': 'Uloženo {0} událostí trasování',
+        'record_session': 'Nahrávat relaci',
+        'record_output': 'Nahrávat výstup',
+        'record_output_needs_camera': 'Před nahráváním výstupu spusťte kameru',
         'about_title': 'O aplikaci VidMask',
         'about_text': '''VidMask v{version}
 
@@ -193,6 +231,25 @@ Licence: MIT''',
         'flip_h': 'Horizontal spiegeln',
         'flip_v': 'Vertikal spiegeln',
         'reset_position': 'Zurücksetzen auf den Mittelpunkt',
+        'buffer_count': 'Kamerapuffer:',
+        'fast_decode': 'Schnelle MJPEG-Dekodierung',
+        'performance': 'Leistung',
+        'performance_panel': 'Leistungsanzeige',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Latenz: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'Pipeline-CPU: {0:.0f}%',
+        'perf_dropped': 'Verworfen: {0} veraltet, {1} Vorschau, {2} wiederholt',
+        'perf_disabled': 'Messung deaktiviert (VIDMASK_METRICS=0)',
+        'perf_startup': 'Start: {0} ms bis zum ersten Bild (Eingang {1} ms)',
+        'perf_quality_full': 'Qualität: voll',
+        'perf_quality_reduced': 'Qualität: reduziert, Stufe {0}/{1} ({2})',
+        'record_trace': 'Trace aufzeichnen',
+        'save_trace': 'Trace speichern...',
+        'trace_started': 'Trace-Aufzeichnung gestartet. Erneut Strg+T drücken, um die letzten 10 Sekunden zu speichern.',
+        'trace_saved': '{0} Trace-Ereignisse gespeichert',
+        'record_session': 'Sitzung aufzeichnen',
+        'record_output': 'Ausgabe aufzeichnen',
+        'record_output_needs_camera': 'Starten Sie die Kamera, bevor Sie ihre Ausgabe aufzeichnen',
         'about_title': 'Über VidMask',
         'about_text': '''VidMask v{version}
 
@@ -259,6 +316,25 @@ Lizenz: MIT''',
         'flip_h': 'Відзеркалити горизонтально',
         'flip_v': 'Відзеркалити вертикально',
         'reset_position': 'Центрувати',
+        'buffer_count': 'Буфери камери:',
+        'fast_decode': 'Швидке декодування MJPEG',
+        'performance': 'Продуктивність',
+        'performance_panel': 'Панель продуктивності',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Затримка: {0:.1f} мс (p95 {1:.1f} мс)',
+        'perf_cpu': 'CPU обробки: {0:.0f}%',
+        'perf_dropped': 'Відкинуто: {0} застарілих, {1} попередній перегляд, {2} повторених',
+        'perf_disabled': 'Вимірювання вимкнено (VIDMASK_METRICS=0)',
+        'perf_startup': 'Запуск: {0} мс до першого кадру (вхід {1} мс)',
+        'perf_quality_full': 'Якість: повна',
+        'perf_quality_reduced': 'Якість: знижена, рівень {0}/{1} ({2})',
+        'record_trace': 'Записувати трасування',
+        'save_trace': 'Зберегти трасування...',
+        'trace_started': 'Запис трасування розпочато. Натисніть Ctrl+T ще раз, щоб зберегти останні 10 секунд.',
+        'trace_saved': 'Збережено {0} подій трасування',
+        'record_session': 'Записувати сеанс',
+        'record_output': 'Записувати вихід',
+        'record_output_needs_camera': 'Запустіть камеру перед записом її виходу',
         'about_title': 'Про VidMask',
         'about_text': '''VidMask v{version}
 
@@ -325,6 +401,25 @@ Lizenz: MIT''',
         'flip_h': 'Voltear horizontal',
         'flip_v': 'Voltear vertical',
         'reset_position': 'Centrar',
+        'buffer_count': 'Búferes de cámara:',
+        'fast_decode': 'Decodificación MJPEG rápida',
+        'performance': 'Rendimiento',
+        'performance_panel': 'Panel de rendimiento',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Latencia: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'CPU del proceso: {0:.0f}%',
+        'perf_dropped': 'Descartados: {0} obsoletos, {1} vista previa, {2} repetidos',
+        'perf_disabled': 'Medición desactivada (VIDMASK_METRICS=0)',
+        'perf_startup': 'Inicio: {0} ms hasta el primer fotograma (entrada {1} ms)',
+        'perf_quality_full': 'Calidad: completa',
+        'perf_quality_reduced': 'Calidad: reducida, nivel {0}/{1} ({2})',
+        'record_trace': 'Grabar traza',
+        'save_trace': 'Guardar traza...',
+        'trace_started': 'Grabación de traza iniciada. Pulse Ctrl+T de nuevo para guardar los últimos 10 segundos.',
+        'trace_saved': 'Se guardaron {0} eventos de traza',
+        'record_session': 'Grabar sesión',
+        'record_output': 'Grabar salida',
+        'record_output_needs_camera': 'Inicie la cámara antes de grabar su salida',
         'about_title': 'Acerca de VidMask',
         'about_text': '''VidMask v{version}
 
@@ -391,6 +486,25 @@ Licencia: MIT''',
         'flip_h': 'Odbij poziomo',
         'flip_v': 'Odbij pionowo',
         'reset_position': 'Wycentruj',
+        'buffer_count': 'Bufory kamery:',
+        'fast_decode': 'Szybkie dekodowanie MJPEG',
+        'performance': 'Wydajność',
+        'performance_panel': 'Panel wydajności',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Opóźnienie: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'CPU przetwarzania: {0:.0f}%',
+        'perf_dropped': 'Odrzucone: {0} nieaktualne, {1} podgląd, {2} powtórzone',
+        'perf_disabled': 'Pomiary wyłączone (VIDMASK_METRICS=0)',
+        'perf_startup': 'Start: {0} ms do pierwszej klatki (wejście {1} ms)',
+        'perf_quality_full': 'Jakość: pełna',
+        'perf_quality_reduced': 'Jakość: obniżona, poziom {0}/{1} ({2})',
+        'record_trace': 'Nagrywaj ślad',
+        'save_trace': 'Zapisz ślad...',
+        'trace_started': 'Rozpoczęto nagrywanie śladu. Naciśnij ponownie Ctrl+T, aby zapisać ostatnie 10 sekund.',
+        'trace_saved': 'Zapisano {0} zdarzeń śladu',
+        'record_session': 'Nagrywaj sesję',
+        'record_output': 'Nagrywaj wyjście',
+        'record_output_needs_camera': 'Uruchom kamerę przed nagrywaniem jej wyjścia',
         'about_title': 'O VidMask',
         'about_text': '''VidMask v{version}
 
@@ -457,6 +571,25 @@ Licencja: MIT''',
         'flip_h': 'Inversare orizontală',
         'flip_v': 'Inversare verticală',
         'reset_position': 'Centrare',
+        'buffer_count': 'Buffere cameră:',
+        'fast_decode': 'Decodare MJPEG rapidă',
+        'performance': 'Performanță',
+        'performance_panel': 'Panou de performanță',
+        'perf_fps': 'FPS: {0:.1f} / {1:.1f}',
+        'perf_latency': 'Latență: {0:.1f} ms (p95 {1:.1f} ms)',
+        'perf_cpu': 'CPU procesare: {0:.0f}%',
+        'perf_dropped': 'Aruncate: {0} învechite, {1} previzualizare, {2} repetate',
+        'perf_disabled': 'Măsurare dezactivată (VIDMASK_METRICS=0)',
+        'perf_startup': 'Pornire: {0} ms până la primul cadru (intrare {1} ms)',
+        'perf_quality_full': 'Calitate: completă',
+        'perf_quality_reduced': 'Calitate: redusă, nivelul {0}/{1} ({2})',
+        'record_trace': 'Înregistrează urmărirea',
+        'save_trace': 'Salvează urmărirea...',
+        'trace_started': 'Înregistrarea urmăririi a pornit. Apăsați din nou Ctrl+T pentru a salva ultimele 10 secunde.',
+        'trace_saved': 'S-au salvat {0} evenimente',
+        'record_session': 'Înregistrează sesiunea',
+        'record_output': 'Înregistrează ieșirea',
+        'record_output_needs_camera': 'Porniți camera înainte de a-i înregistra ieșirea',
         'about_title': 'Despre VidMask',
         'about_text': '''VidMask v{version}
 
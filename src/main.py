@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 
-import tkinter as tk
-from tkinter import ttk
 import sys
 import os
 
 # Add the project root directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-print("Starting application...")
-
 def main():
+    # Headless commands (e.g. "vidmask run ...") never load Tk or the GUI
+    if len(sys.argv) > 1:
+        from src.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    import tkinter as tk
+
+    print("Starting application...")
     root = tk.Tk()
     
     # Set simple window title
@@ -29,5 +33,8 @@ def main():
     app = MainWindow(root)
     root.mainloop()
 
+    # The pipeline process keeps the virtual camera running if it's on
+    app.preview_frame.close()
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Stand-ins shared by the tests: a segmentation backend that needs no
+model, and an output command that needs no ffmpeg."""
+import sys
+import time
+import cv2
+import numpy as np
+from src.core import daemon, engine, outputs
+from src.core.segmentation import SegmentationBackend
+
+# Reads raw frames from stdin and discards them, in place of ffmpeg
+DISCARD_COMMAND = [sys.executable, '-c', 'import sys\nwhile sys.stdin.buffer.read(1 << 16): pass']
+
+
+class FakeSegmentation(SegmentationBackend):
+    """Marks the whole frame as person"""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.timestamp = None
+        self.mask = None
+
+    def submit(self, frame_rgb: np.ndarray, timestamp_ms: int):
+        self.timestamp = timestamp_ms
+        self.mask = np.ones(frame_rgb.shape[:2], dtype=np.float32)
+
+    def result(self, timestamp_ms: int, timeout: float = 1.0):
+        return self.mask if timestamp_ms == self.timestamp else None
+
+
+def discard_command(*args, **kwargs) -> list:
+    return list(DISCARD_COMMAND)
+
+
+def install_fakes(patch):
+    """Replace inference and ffmpeg; patch is monkeypatch.setattr, or setattr in a subprocess"""
+    patch(engine, 'segmentation_model', lambda settings: None)
+    patch(engine, 'create_segmentation', lambda settings, model=None: FakeSegmentation())
+    patch(outputs, 'output_command', discard_command)
+    patch(daemon, 'output_command', discard_command)
+
+
+def write_background(path, size=(320, 240)) -> str:
+    cv2.imwrite(str(path), np.full((size[1], size[0], 3), 64, dtype=np.uint8))
+    return str(path)
+
+
+def pipeline_settings(background_path: str) -> dict:
+    return dict(engine.DEFAULT_SETTINGS, input_device='synthetic:320x240', output_device='/tmp/vidmask-test-output',
+                resolution='320x240', background_path=background_path)
+
+
+def wait_for(condition, timeout: float = 10.0, interval: float = 0.02) -> bool:
+    """Poll condition until it is true or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+def run_service(socket_path: str, background_path: str):
+    """Entry point of the service subprocess in test_service"""
+    from src.core.service import PipelineService
+    install_fakes(setattr)
+    PipelineService(pipeline_settings(background_path), socket_path, linger=30.0).serve()
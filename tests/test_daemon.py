@@ -0,0 +1,51 @@
+import threading
+import pytest
+from src.core.daemon import ManualConsumerDetector, PipelineDaemon
+from .helpers import install_fakes, pipeline_settings, wait_for, write_background
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    install_fakes(monkeypatch.setattr)
+    detector = ManualConsumerDetector()
+    pipeline_daemon = PipelineDaemon(pipeline_settings(write_background(tmp_path / 'bg.png')),
+                                     detector=detector, grace_period=0.2, startup_timeout=5.0,
+                                     poll_interval=0.02)
+    thread = threading.Thread(target=pipeline_daemon.run, daemon=True)
+    thread.start()
+    yield pipeline_daemon, detector
+    pipeline_daemon.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_pipeline_follows_consumers(daemon):
+    pipeline_daemon, detector = daemon
+    assert wait_for(lambda: pipeline_daemon.idle_process is not None)
+    assert not pipeline_daemon.engine.running
+    assert pipeline_daemon.activations == 0
+
+    detector.present = True
+    assert wait_for(lambda: pipeline_daemon.engine.running and pipeline_daemon.engine.frames_output > 0)
+    assert pipeline_daemon.activations == 1
+    assert pipeline_daemon.idle_process is None
+
+    # Stops once the consumer has been gone for the grace period
+    detector.present = False
+    assert wait_for(lambda: not pipeline_daemon.engine.running)
+    assert wait_for(lambda: pipeline_daemon.idle_process is not None)
+
+    detector.present = True
+    assert wait_for(lambda: pipeline_daemon.activations == 2 and pipeline_daemon.engine.frames_output > 0)
+
+
+def test_short_absence_keeps_pipeline_running(daemon):
+    pipeline_daemon, detector = daemon
+    pipeline_daemon.grace_period = 5.0
+    assert wait_for(lambda: pipeline_daemon.idle_process is not None)
+    detector.present = True
+    assert wait_for(lambda: pipeline_daemon.engine.running and pipeline_daemon.engine.frames_output > 0)
+    detector.present = False
+    assert not wait_for(lambda: not pipeline_daemon.engine.running, timeout=0.5)
+    detector.present = True
+    assert pipeline_daemon.activations == 1
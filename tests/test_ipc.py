@@ -0,0 +1,87 @@
+import threading
+import time
+import numpy as np
+import pytest
+from src.core.ipc import PreviewSlot
+
+
+@pytest.fixture
+def slot():
+    # One handle serves both sides; attaching twice in one process would
+    # unregister the segment from the resource tracker
+    preview_slot = PreviewSlot(create=True, max_size=(64, 48))
+    yield preview_slot
+    preview_slot.close()
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+class TornView:
+    """Frame buffer that publishes another frame while the reader copies out of it"""
+
+    def __init__(self, data: np.ndarray, interrupt):
+        self.data = data
+        self.interrupt = interrupt
+
+    def __getitem__(self, index):
+        view = self.data[index]
+        if self.interrupt is not None:
+            interrupt, self.interrupt = self.interrupt, None
+            interrupt()
+        return view
+
+    def __setitem__(self, index, value):
+        self.data[index] = value
+
+
+def test_frame_is_read_once(slot):
+    assert slot.read() is None
+    slot.put_nowait(frame(7))
+    result = slot.read()
+    assert result.shape == (48, 64, 3)
+    assert (result == 7).all()
+    assert slot.read() is None
+
+
+def test_frame_being_written_is_skipped(slot):
+    slot.put_nowait(frame(1))
+    # Counter left odd, as while the writer copies a frame in
+    slot.seq[0] += 1
+    assert slot.read() is None
+    slot.seq[0] += 1
+    assert (slot.read() == 1).all()
+
+
+def test_frame_overwritten_while_copying_is_dropped(slot):
+    slot.put_nowait(frame(1))
+    slot.data = TornView(slot.data, lambda: slot.put_nowait(frame(2)))
+    # The copy may mix both frames; the moved counter rejects it
+    assert slot.read() is None
+    assert (slot.read() == 2).all()
+
+
+def test_concurrent_reader_sees_only_whole_frames(slot):
+    stop = threading.Event()
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            slot.put_nowait(frame(i % 256))
+            i += 1
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        seen = 0
+        deadline = time.monotonic() + 10
+        while seen < 20 and time.monotonic() < deadline:
+            result = slot.read()
+            if result is not None:
+                assert (result == result.flat[0]).all()
+                seen += 1
+    finally:
+        stop.set()
+        thread.join()
+    assert seen == 20
@@ -0,0 +1,76 @@
+import re
+import urllib.error
+import urllib.request
+import pytest
+from src.core.metrics import HISTOGRAM_BUCKETS, PipelineMetrics
+from src.core.metrics_server import CONTENT_TYPE, MetricsServer
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+
+@pytest.fixture
+def server():
+    metrics = PipelineMetrics(enabled=True)
+    for _ in range(3):
+        metrics.begin_frame()
+        metrics.mark('capture')
+        metrics.mark('inference')
+        metrics.end_frame()
+    metrics.count('inference_drops', 2)
+    metrics.set_gauge('quality_level', 1)
+    metrics.set_gauge('first_frame_ms', 250)
+    metrics_server = MetricsServer('127.0.0.1:0', {'main': metrics})
+    metrics_server.start()
+    yield metrics_server
+    metrics_server.stop()
+
+
+def scrape(url: str):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.headers['Content-Type'], response.read().decode('utf-8')
+
+
+def types(body: str) -> dict:
+    return dict(line.split()[2:4] for line in body.splitlines() if line.startswith('# TYPE'))
+
+
+def test_exposition_format(server):
+    content_type, body = scrape(server.url)
+    assert content_type == CONTENT_TYPE
+    assert body.endswith('\n')
+    for line in body.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) [a-z_]+ .+$', line), line
+        else:
+            assert SAMPLE.match(line), line
+    assert 'vidmask_frames_total{pipeline="main"} 3' in body.splitlines()
+
+
+def test_counter_and_gauge_types(server):
+    _, body = scrape(server.url)
+    kinds = types(body)
+    assert kinds['vidmask_frames_total'] == 'counter'
+    assert kinds['vidmask_inference_drops_total'] == 'counter'
+    assert kinds['vidmask_fps'] == 'gauge'
+    assert kinds['vidmask_quality_level'] == 'gauge'
+    assert kinds['vidmask_first_frame_ms'] == 'gauge'
+    assert kinds['vidmask_stage_seconds'] == 'histogram'
+    assert 'vidmask_quality_level_total' not in body
+    assert 'vidmask_quality_level{pipeline="main"} 1' in body.splitlines()
+
+
+def test_histogram_buckets_are_cumulative(server):
+    _, body = scrape(server.url)
+    stage = 'pipeline="main",stage="frame"'
+    counts = [int(line.rsplit(' ', 1)[1]) for line in body.splitlines()
+              if line.startswith(f'vidmask_stage_seconds_bucket{{{stage},')]
+    assert len(counts) == len(HISTOGRAM_BUCKETS) + 1
+    assert counts == sorted(counts)
+    assert counts[-1] == 3
+    assert f'vidmask_stage_seconds_count{{{stage}}} 3' in body.splitlines()
+
+
+def test_unknown_path(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        scrape(server.url.replace('/metrics', '/other'))
+    assert error.value.code == 404
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+import pytest
+from src.core.ipc import ControlClient
+from src.core.service import RemoteEngine
+from .helpers import wait_for, write_background
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVE = 'import sys; from tests.helpers import run_service; run_service(sys.argv[1], sys.argv[2])'
+
+
+def connect(socket_path: str, timeout: float = 15.0) -> ControlClient:
+    clients = []
+
+    def attempt():
+        try:
+            clients.append(ControlClient(socket_path))
+            return True
+        except OSError:
+            return False
+
+    if not wait_for(attempt, timeout):
+        pytest.fail(f"Service did not listen on {socket_path}")
+    return clients[0]
+
+
+@pytest.fixture
+def service(tmp_path):
+    socket_path = str(tmp_path / 'vidmask.sock')
+    background = write_background(tmp_path / 'bg.png')
+    process = subprocess.Popen([sys.executable, '-c', SERVE, socket_path, background], cwd=ROOT)
+    try:
+        yield process, socket_path
+    finally:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def test_remote_engine_controls_service(service):
+    process, socket_path = service
+    engine = RemoteEngine(connect(socket_path))
+    try:
+        assert not engine.running
+        assert engine.status['pid'] == process.pid
+
+        engine.start()
+        assert engine.running
+        frames = []
+        assert wait_for(lambda: frames.append(engine.read_preview()) or frames[-1] is not None)
+        assert frames[-1].shape == (240, 320, 3)
+        assert wait_for(lambda: engine.metrics.summary()['frames'] > 0)
+
+        engine.stop()
+        assert not engine.running
+        assert engine.sync()['error'] is None
+    finally:
+        engine.client.request('shutdown')
+        engine.close()
+    assert process.wait(timeout=15) == 0
+
+
+def test_settings_reach_service(service):
+    _, socket_path = service
+    engine = RemoteEngine(connect(socket_path))
+    try:
+        settings = dict(engine.status['settings'], flip_h=True, scale=0.5)
+        status = engine.sync(settings)
+        assert status['settings']['flip_h'] is True
+        assert status['settings']['scale'] == 0.5
+        with pytest.raises(RuntimeError):
+            engine.client.request('no-such-command')
+    finally:
+        engine.client.request('shutdown')
+        engine.close()